@@ -0,0 +1,410 @@
+# === api_server.py（計算 API サーバー） ===
+#
+# 使い方（mhws_project/ で実行）:
+#   python api_server.py --port 8080 --processes 4
+#
+# logic/ の計算を JSON の HTTP API として公開する（Discord ボットや配信オーバーレイ向け）。
+#   GET  /health      生存確認
+#   GET  /stats       リクエスト数・まとめた数・拒否数・タイムアウト数・計算中の件数
+#   POST /v1/dps      {"weapon", "monster", "part", "combo", "skills", "fight_time"?} → compute_dps の結果
+#   POST /v1/batch    {"scenarios": [上と同じ形, ...]} → 構成ごとの結果（logic/batch.py で一括計算）
+#   POST /v1/sweep    {"weapon", "monster", "part", "combo", "skills", "sweep": {"攻撃": [0, 1, 2, 3, 4]},
+#                      "objective": "dps" | "time_to_kill", "top": 20}
+#                     → sweep のスキル Lv の全組み合わせを評価して上位を返す（time_to_kill は logic/hunt.py。体力が仮の値なら hp_placeholder: true）
+# part は部位名か {部位: 重み}、skills は batch_cli.py と同じ書式（{"攻撃": [3, 1.0]} / "攻撃Lv3(100%)|..."）。
+#
+# 計算はプロセスプールで行い（イベントループは止めない）、
+#   - 同じ内容のリクエストが計算中なら、新しく計算せずにその結果を一緒に返す（まとめ）
+#   - 計算中の件数が max_pending を超えたら 503（Retry-After つき）ですぐ断る（背圧）
+#   - timeout 秒で返せなければ 504（計算自体は続け、まとめた他のリクエストには結果を返す）
+# 入力の誤り（存在しない武器など）は 400 と {"error": 理由}。
+#
+# ソケットなしで試すには LocalClient を使う:
+#   service = CalculationService(executor=ThreadPoolExecutor(1))
+#   status, body = await LocalClient(service).post("/v1/dps", {...})
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import product
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from batch_cli import parse_part, parse_skills
+
+MAX_BODY = 1 << 20          # リクエスト本文の上限（バイト）
+HEADER_TIMEOUT = 10.0       # ヘッダー・本文を受け取るまでの秒数
+DEFAULT_TIMEOUT = 30.0      # 計算結果を待つ秒数
+DEFAULT_MAX_PENDING = 64    # 同時に計算する（まとめた後の）件数の上限
+MAX_BATCH = 10000           # /v1/batch の1リクエストあたりの構成数
+MAX_SWEEP = 100000          # /v1/sweep の組み合わせ数
+
+STATUS_TEXT = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout",
+}
+
+
+# ── ワーカー（プロセスプールで実行。引数・戻り値は pickle / JSON にできる形） ──
+
+def _scenario(body: Mapping) -> Tuple[str, str, Any, str, Dict[str, Tuple[int, float]]]:
+    """リクエストの1構成 → compute_dps の引数"""
+    missing = [key for key in ("weapon", "monster", "part", "combo") if key not in body]
+    if missing:
+        raise ValueError(f"必要な項目がありません: {missing}")
+    return body["weapon"], body["monster"], parse_part(body["part"]), body["combo"], parse_skills(body.get("skills"))
+
+
+def work_dps(body: Mapping) -> Dict:
+    from logic.calculation_interface import compute_dps
+    from utils.memo import get_result_cache
+
+    weapon, monster, part, combo, skills = _scenario(body)
+    # 同じワーカーに来た同じ構成は結果キャッシュから返す
+    result = dict(get_result_cache().get_or_compute(
+        weapon, monster, part, combo, skills, compute_dps, body.get("fight_time")
+    ))
+    result["スキル"] = skills
+    return result
+
+
+def _evaluate(scenarios: List[Tuple]) -> List[Dict]:
+    """
+    構成のリストを logic/batch.py で1回にまとめて計算する。
+    {部位: 重み} の構成は部位ごとの行に展開し、重み付き和で戻す（部位によらない値はそのまま、
+    合計・DPS・有効値は compute_dps の複数部位と同じ重み付き平均になる）。
+    """
+    import numpy as np
+    from logic.batch import run_batch_dps_calculation
+    from logic.calculation_interface import normalize_part_weights
+
+    rows = []
+    owner = []
+    weights = []
+    for i, (weapon, monster, part, combo, skills) in enumerate(scenarios):
+        parts = {part: 1.0} if isinstance(part, str) else normalize_part_weights(monster, part)
+        for name, weight in parts.items():
+            rows.append((weapon, monster, name, combo, skills))
+            owner.append(i)
+            weights.append(weight)
+    weapons, monsters, parts, combos, skill_inputs = zip(*rows)
+    results = run_batch_dps_calculation(weapons, monsters, parts, combos, skill_inputs=skill_inputs)
+    owner = np.array(owner)
+    weights = np.array(weights)
+    blended = {
+        key: np.bincount(owner, weights=weights * values, minlength=len(scenarios)).tolist()
+        for key, values in results.items()
+    }
+    return [{key: values[i] for key, values in blended.items()} for i in range(len(scenarios))]
+
+
+def _check_names(weapon: str, monster: str, part, combo: str) -> Optional[str]:
+    """計算できない構成なら理由を返す"""
+    from utils.data_compiler import get_data_index
+
+    index = get_data_index()
+    if weapon not in index["ids"]["weapons"]:
+        return f"武器「{weapon}」がありません"
+    if monster not in index["ids"]["monsters"]:
+        return f"モンスター「{monster}」がありません"
+    if combo not in index["ids"]["combos"]:
+        return f"コンボ「{combo}」がありません"
+    for name in [part] if isinstance(part, str) else part:
+        if name not in index["part_elements"][monster]:
+            return f"部位「{monster} / {name}」がありません"
+    return None
+
+
+def work_batch(body: Mapping) -> Dict:
+    scenarios = body.get("scenarios")
+    if not isinstance(scenarios, list):
+        raise ValueError("scenarios（構成のリスト）が必要です")
+    if len(scenarios) > MAX_BATCH:
+        raise ValueError(f"構成が多すぎます（{len(scenarios)} > {MAX_BATCH}）")
+
+    results: List[Dict] = [{} for _ in scenarios]
+    valid = []
+    for i, scenario in enumerate(scenarios):
+        try:
+            args = _scenario(scenario)
+            reason = _check_names(*args[:4])
+        except (KeyError, ValueError, TypeError) as e:
+            reason = str(e.args[0]) if e.args else type(e).__name__
+        if reason:
+            results[i] = {"エラー": reason}
+        else:
+            valid.append((i, args))
+    if valid:
+        for (i, _), result in zip(valid, _evaluate([args for _, args in valid])):
+            results[i] = result
+    return {"results": results}
+
+
+def work_sweep(body: Mapping) -> Dict:
+    weapon, monster, part, combo, skills = _scenario(body)
+    reason = _check_names(weapon, monster, part, combo)
+    if reason:
+        raise KeyError(reason)
+    sweep = body.get("sweep") or {}
+    if not isinstance(sweep, dict) or not sweep:
+        raise ValueError("sweep（{スキル名: [Lv, ...]}）が必要です")
+    size = 1
+    for levels in sweep.values():
+        size *= len(levels)
+    if size > MAX_SWEEP:
+        raise ValueError(f"組み合わせが多すぎます（{size} > {MAX_SWEEP}）")
+    objective = body.get("objective", "dps")
+    top = int(body.get("top", 20))
+
+    names = list(sweep)
+    candidates = []
+    for levels in product(*(sweep[name] for name in names)):
+        candidate = dict(skills)
+        for name, lv in zip(names, levels):
+            if int(lv) > 0:
+                candidate[name] = (int(lv), skills.get(name, (0, 1.0))[1])
+            else:
+                candidate.pop(name, None)
+        candidates.append(candidate)
+
+    if objective == "time_to_kill":
+        from logic.hunt import is_placeholder_hp, rank_by_time_to_kill
+
+        weights = {part: 1.0} if isinstance(part, str) else part
+        ranked = rank_by_time_to_kill(weapon, monster, weights, body.get("rotation") or combo, candidates, top=top)
+        return {"objective": objective, "count": len(candidates), "results": ranked,
+                "hp_placeholder": is_placeholder_hp(monster)}
+    if objective != "dps":
+        raise ValueError(f"objective は dps か time_to_kill です: {objective}")
+
+    results = _evaluate([(weapon, monster, part, combo, candidate) for candidate in candidates])
+    order = sorted(range(len(candidates)), key=lambda i: -results[i]["DPS"])[:top]
+    return {
+        "objective": objective,
+        "count": len(candidates),
+        "results": [
+            {"順位": rank + 1, "DPS": results[i]["DPS"], "合計ダメージ": results[i]["合計ダメージ"],
+             "スキル": candidates[i]}
+            for rank, i in enumerate(order)
+        ],
+    }
+
+
+def _warmup() -> None:
+    """ワーカー起動時にゲームデータと検証済みインデックスを読み込んでおく"""
+    from utils import loader
+    from utils.data_compiler import get_data_index
+
+    for filename in loader.GAME_DATA_FILES:
+        loader.load_data(filename)
+    get_data_index()
+
+
+ROUTES = {"/v1/dps": work_dps, "/v1/batch": work_batch, "/v1/sweep": work_sweep}
+
+
+# ── サービス本体（HTTP に依存しない部分） ──
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def _json_default(value):
+    # numpy の数値・配列
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"JSON にできない値: {type(value).__name__}")
+
+
+def _retrieve(future: asyncio.Future) -> None:
+    # 待っている人がいなくなった（タイムアウトした）計算の例外を「未処理」にしない
+    if not future.cancelled():
+        future.exception()
+
+
+class CalculationService:
+    """
+    リクエスト（メソッド, パス, 本文）→ (ステータス, JSON, 追加ヘッダー)。
+    executor 省略時は processes 個のワーカープロセスを作る。
+    """
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        timeout: float = DEFAULT_TIMEOUT,
+        executor: Optional[Executor] = None
+    ):
+        self.executor = executor or ProcessPoolExecutor(max_workers=processes)
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"requests": 0, "computed": 0, "coalesced": 0, "rejected": 0, "timeouts": 0, "errors": 0}
+
+    def warmup(self) -> None:
+        workers = getattr(self.executor, "_max_workers", 1)
+        for future in [self.executor.submit(_warmup) for _ in range(workers)]:
+            future.result()
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def handle(self, method: str, path: str, body: bytes) -> Tuple[int, Any, Dict[str, str]]:
+        self.stats["requests"] += 1
+        try:
+            return 200, await self._dispatch(method, path, body), {}
+        except HttpError as e:
+            return e.status, {"error": str(e)}, e.headers
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Any:
+        if path == "/health":
+            return {"status": "ok"}
+        if path == "/stats":
+            return {**self.stats, "inflight": len(self._inflight)}
+        worker = ROUTES.get(path)
+        if worker is None:
+            raise HttpError(404, f"{path} はありません")
+        if method != "POST":
+            raise HttpError(405, f"{path} は POST のみです", {"Allow": "POST"})
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError as e:
+            raise HttpError(400, f"JSON を読めません: {e}")
+        if not isinstance(payload, dict):
+            raise HttpError(400, "本文は JSON オブジェクトにしてください")
+
+        # 同じパス・同じ内容（キーの順序は問わない）のリクエストは1つの計算にまとめる
+        key = path + json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        future = self._inflight.get(key)
+        if future is None:
+            if len(self._inflight) >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise HttpError(503, "混み合っています。少し待ってから再送してください", {"Retry-After": "1"})
+            future = asyncio.get_running_loop().run_in_executor(self.executor, worker, payload)
+            self._inflight[key] = future
+            future.add_done_callback(lambda _, key=key: self._inflight.pop(key, None))
+            future.add_done_callback(_retrieve)
+            self.stats["computed"] += 1
+        else:
+            self.stats["coalesced"] += 1
+
+        try:
+            # shield: このリクエストがタイムアウトしても、まとめた他のリクエストのために計算は続ける
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise HttpError(504, f"{self.timeout:g} 秒以内に計算できませんでした")
+        except (KeyError, ValueError, TypeError) as e:
+            self.stats["errors"] += 1
+            raise HttpError(400, str(e.args[0]) if e.args else type(e).__name__)
+        except Exception as e:
+            self.stats["errors"] += 1
+            raise HttpError(500, f"{type(e).__name__}: {e}")
+
+
+class LocalClient:
+    """ソケットを使わずに CalculationService を呼ぶ代役のクライアント（テスト・ローカル確認用）"""
+
+    def __init__(self, service: CalculationService):
+        self.service = service
+
+    async def get(self, path: str) -> Tuple[int, Any]:
+        status, body, _ = await self.service.handle("GET", path, b"")
+        return status, json.loads(json.dumps(body, ensure_ascii=False, default=_json_default))
+
+    async def post(self, path: str, payload: Any) -> Tuple[int, Any]:
+        raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        status, body, _ = await self.service.handle("POST", path, raw)
+        return status, json.loads(json.dumps(body, ensure_ascii=False, default=_json_default))
+
+
+# ── HTTP/1.1（keep-alive 対応の最小限の実装） ──
+
+def _response(status: int, body: Any, headers: Mapping[str, str], keep_alive: bool) -> bytes:
+    data = json.dumps(body, ensure_ascii=False, default=_json_default).encode("utf-8")
+    lines = [
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+        "Content-Type: application/json; charset=utf-8",
+        f"Content-Length: {len(data)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ] + [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + data
+
+
+async def _serve_connection(service: CalculationService, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), HEADER_TIMEOUT)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+                return
+            request_line, *header_lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+            try:
+                method, target, version = request_line.split(" ", 2)
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+            except ValueError:
+                writer.write(_response(400, {"error": "リクエストを読めません"}, {}, False))
+                return
+            if length > MAX_BODY:
+                writer.write(_response(413, {"error": f"本文が大きすぎます（上限 {MAX_BODY} バイト）"}, {}, False))
+                return
+            try:
+                body = await asyncio.wait_for(reader.readexactly(length), HEADER_TIMEOUT) if length else b""
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                return
+
+            status, payload, extra = await service.handle(method, target.split("?", 1)[0], body)
+            keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            writer.write(_response(status, payload, extra, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                return
+    finally:
+        writer.close()
+
+
+async def serve(service: CalculationService, host: str, port: int) -> None:
+    server = await asyncio.start_server(
+        lambda reader, writer: _serve_connection(service, reader, writer), host, port
+    )
+    addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+    print(f"計算 API を起動しました: {addresses}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="DPS計算の HTTP API サーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                        help="同時に計算する件数の上限（超えたら 503）")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="計算結果を待つ秒数（超えたら 504）")
+    args = parser.parse_args(argv)
+
+    service = CalculationService(max(1, args.processes), args.max_pending, args.timeout)
+    try:
+        service.warmup()
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,344 @@
+# === batch_cli.py（シナリオ一括計算のコマンドライン版） ===
+#
+# 使い方（mhws_project/ で実行）:
+#   python batch_cli.py scenarios.jsonl -o results.jsonl --processes 8
+#   python batch_cli.py scenarios.csv -o results.parquet --chunk-size 500
+#   python batch_cli.py scenarios.jsonl -o results.csv --resume
+#
+# 入力は1行1シナリオの JSONL か CSV（"-" なら標準入力の JSONL）。
+#   JSONL: {"weapon": ..., "monster": ..., "part": ..., "combo": ..., "skills": {"攻撃": [3, 1.0]}}
+#   CSV  : weapon,monster,part,combo,skills の列。skills は JSON か
+#          "攻撃Lv3(100%)|見切りLv2(50%)"（results/dps_log.csv と同じ書式）
+#   part は部位名か、複数部位に分けて当てる場合の {"頭": 60, "脚": 40}（CSV では JSON 文字列）
+# 列名は 武器 / モンスター / 部位 / コンボ / スキル でもよい。
+#
+# シナリオは chunk_size 件ずつワーカーへ渡し、終わった順ではなく入力順に書き出す。
+# 同時に抱えるチャンク数を制限しているので、入力が大きくてもメモリは一定。
+# 各行には入力中の位置「番号」を付けるので、止まったところから --start / --resume で再開できる。
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from logic.calculation_interface import compute_dps
+
+FORMATS = ("jsonl", "csv", "parquet")
+DEFAULT_CHUNK_SIZE = 200
+
+# 入力の列名 → 内部名
+FIELD_ALIASES = {
+    "weapon": "weapon", "武器": "weapon",
+    "monster": "monster", "モンスター": "monster",
+    "part": "part", "部位": "part",
+    "combo": "combo", "コンボ": "combo",
+    "skills": "skills", "スキル": "skills",
+}
+
+_SKILL_PATTERN = re.compile(r"^(.+?)Lv(\d+)(?:\((\d+(?:\.\d+)?)%\))?$")
+
+
+def parse_part(value):
+    """部位指定（部位名 or {部位: 重み}。CSV では JSON 文字列）"""
+    if isinstance(value, str) and value.strip().startswith("{"):
+        return json.loads(value)
+    return value
+
+
+def parse_skills(value) -> Dict[str, Tuple[int, float]]:
+    """スキル指定を {スキル名: (Lv, 発動率)} にする"""
+    if not value:
+        return {}
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith("{"):
+            value = json.loads(value)
+        else:
+            skills = {}
+            for token in filter(None, value.split("|")):
+                m = _SKILL_PATTERN.match(token.strip())
+                if not m:
+                    raise ValueError(f"スキル指定を読めません: {token}")
+                name, lv, rate = m.groups()
+                skills[name] = (int(lv), float(rate) / 100 if rate is not None else 1.0)
+            return skills
+    if not isinstance(value, Mapping):
+        raise ValueError(f"スキル指定は {{スキル名: Lv}} か文字列にしてください: {value!r}")
+    skills = {}
+    for name, spec in value.items():
+        if isinstance(spec, (int, float)):
+            skills[name] = (int(spec), 1.0)
+        else:
+            lv, rate = (list(spec) + [1.0])[:2]
+            skills[name] = (int(lv), float(rate))
+    return skills
+
+
+def format_skills(skills: Dict[str, Tuple[int, float]]) -> str:
+    return "|".join(f"{name}Lv{lv}({int(rate*100)}%)" for name, (lv, rate) in skills.items())
+
+
+def _guess_format(path: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext in ("json", "ndjson"):
+        return "jsonl"
+    if ext not in FORMATS:
+        raise ValueError(f"形式が分かりません（--format で指定してください）: {path}")
+    return ext
+
+
+def iter_scenarios(path: str, fmt: Optional[str] = None) -> Iterator[Dict]:
+    """入力ファイルを1シナリオずつ読む（全体をメモリに載せない）"""
+    if path == "-":
+        rows = (json.loads(line) for line in sys.stdin if line.strip())
+        yield from ({FIELD_ALIASES.get(k, k): v for k, v in row.items()} for row in rows)
+        return
+    fmt = _guess_format(path, fmt)
+    with open(path, encoding="utf-8", newline="") as f:
+        if fmt == "jsonl":
+            rows = (json.loads(line) for line in f if line.strip())
+        elif fmt == "csv":
+            rows = csv.DictReader(f)
+        else:
+            raise ValueError(f"入力に使えない形式です: {fmt}")
+        for row in rows:
+            yield {FIELD_ALIASES.get(k, k): v for k, v in row.items()}
+
+
+def _flatten(offset: int, result: Dict) -> Dict:
+    """計算結果を1行分の平らな dict にする（タイムラインはゲージ全体のDPSだけ残す）"""
+    row = {"番号": offset}
+    for key, value in result.items():
+        if key == "スキル":
+            row[key] = format_skills(value)
+        elif key == "切れ味タイムライン":
+            row["ゲージ全体DPS"] = value["DPS"] if value else None
+        elif key in ("部位重み", "部位内訳"):
+            row[key] = json.dumps(value, ensure_ascii=False)
+        else:
+            row[key] = value
+    # 1部位の行にも同じ列を作る（CSV の列は最初の行で決まるため）
+    row.setdefault("部位重み", None)
+    row.setdefault("部位内訳", None)
+    return row
+
+
+def evaluate_chunk(chunk: List[Tuple[int, Dict]], fight_time: Optional[float] = None):
+    """
+    チャンク内のシナリオを計算する（ワーカープロセスで実行）。
+    戻り値: (結果行のリスト, [(番号, エラーメッセージ), ...])
+    """
+    rows = []
+    errors = []
+    for offset, scenario in chunk:
+        try:
+            result = compute_dps(
+                scenario["weapon"], scenario["monster"], parse_part(scenario["part"]), scenario["combo"],
+                parse_skills(scenario.get("skills")),
+                fight_time=fight_time
+            )
+        except (KeyError, ValueError, TypeError) as e:
+            errors.append((offset, f"{type(e).__name__}: {e}"))
+            continue
+        rows.append(_flatten(offset, result))
+    return rows, errors
+
+
+# ── 出力先 ──
+
+class JsonlWriter:
+    def __init__(self, path: str, append: bool = False):
+        self.file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, rows: List[Dict]) -> None:
+        for row in rows:
+            self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class CsvWriter:
+    def __init__(self, path: str, append: bool = False):
+        fieldnames = None
+        if append and os.path.exists(path):
+            with open(path, encoding="utf-8", newline="") as f:
+                fieldnames = next(csv.reader(f), None)
+        self.file = open(path, "a" if fieldnames else "w", encoding="utf-8", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames) if fieldnames else None
+
+    def write(self, rows: List[Dict]) -> None:
+        if not rows:
+            return
+        if self.writer is None:
+            # ヘッダーは最初の行から決める
+            self.writer = csv.DictWriter(self.file, list(rows[0]))
+            self.writer.writeheader()
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class ParquetWriter:
+    """pyarrow が必要。チャンクごとに row group として書き足す"""
+
+    def __init__(self, path: str, append: bool = False):
+        if append:
+            raise ValueError("Parquet への追記（--resume）はできません。--start で別ファイルに出力してください")
+        try:
+            import pyarrow  # noqa: F401
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ImportError("Parquet で出力するには pyarrow をインストールしてください（pip install pyarrow）")
+        self.path = path
+        self.writer = None
+
+    def write(self, rows: List[Dict]) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if not rows:
+            return
+        if self.writer is None:
+            table = pa.Table.from_pylist(rows)
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        else:
+            table = pa.Table.from_pylist(rows, schema=self.writer.schema)
+        self.writer.write_table(table)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+WRITERS = {"jsonl": JsonlWriter, "csv": CsvWriter, "parquet": ParquetWriter}
+
+
+def last_offset(path: str, fmt: str) -> int:
+    """既存の出力ファイルの最後の「番号」（なければ -1）"""
+    if not os.path.exists(path):
+        return -1
+    last = -1
+    with open(path, encoding="utf-8", newline="") as f:
+        if fmt == "jsonl":
+            for line in f:
+                if line.strip():
+                    last = int(json.loads(line)["番号"])
+        elif fmt == "csv":
+            for row in csv.DictReader(f):
+                last = int(row["番号"])
+        else:
+            raise ValueError(f"{fmt} は --resume に対応していません")
+    return last
+
+
+def _chunks(scenarios: Iterable[Dict], start: int, chunk_size: int) -> Iterator[List[Tuple[int, Dict]]]:
+    numbered = islice(enumerate(scenarios), start, None)
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_scenarios(
+    scenarios: Iterable[Dict],
+    writer,
+    processes: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    start: int = 0,
+    fight_time: Optional[float] = None,
+    progress: bool = True
+) -> Dict[str, int]:
+    """
+    シナリオを計算して writer に入力順で書き出す。
+    戻り値: {"件数": 計算できた件数, "エラー": 失敗した件数}
+    """
+    done = 0
+    failed = 0
+    started = time.perf_counter()
+
+    def flush(rows, errors):
+        nonlocal done, failed
+        writer.write(rows)
+        done += len(rows)
+        failed += len(errors)
+        for offset, message in errors:
+            print(f"\n[番号 {offset}] 計算できませんでした: {message}", file=sys.stderr)
+        if progress:
+            elapsed = time.perf_counter() - started
+            rate = (done + failed) / elapsed if elapsed > 0 else 0.0
+            print(f"\r{done + failed} 件処理（エラー {failed}） {rate:.0f} 件/秒", end="", file=sys.stderr, flush=True)
+
+    chunks = _chunks(scenarios, start, chunk_size)
+    if processes > 1:
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            for chunk in chunks:
+                pending.append(pool.submit(evaluate_chunk, chunk, fight_time))
+                # 先読みは processes の2倍まで
+                if len(pending) >= processes * 2:
+                    flush(*pending.popleft().result())
+            while pending:
+                flush(*pending.popleft().result())
+    else:
+        for chunk in chunks:
+            flush(*evaluate_chunk(chunk, fight_time))
+
+    if progress:
+        print(file=sys.stderr)
+    return {"件数": done, "エラー": failed}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="シナリオファイルを一括でDPS計算する")
+    parser.add_argument("input", help="シナリオの JSONL / CSV（- で標準入力の JSONL）")
+    parser.add_argument("-o", "--output", required=True, help="出力先（.jsonl / .csv / .parquet）")
+    parser.add_argument("--input-format", choices=("jsonl", "csv"))
+    parser.add_argument("--format", choices=FORMATS, help="出力形式（省略時は拡張子から判定）")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--start", type=int, default=0, help="この番号のシナリオから計算する")
+    parser.add_argument("--resume", action="store_true", help="出力ファイルの続きから再開する（jsonl / csv）")
+    parser.add_argument("--fight-time", type=float, help="切れ味タイムラインを打ち切る秒数")
+    parser.add_argument("--quiet", action="store_true", help="進捗を表示しない")
+    args = parser.parse_args(argv)
+
+    fmt = _guess_format(args.output, args.format)
+    start = args.start
+    if args.resume:
+        start = max(start, last_offset(args.output, fmt) + 1)
+
+    writer = WRITERS[fmt](args.output, append=args.resume)
+    try:
+        summary = run_scenarios(
+            iter_scenarios(args.input, args.input_format),
+            writer,
+            processes=max(1, args.processes),
+            chunk_size=max(1, args.chunk_size),
+            start=start,
+            fight_time=args.fight_time,
+            progress=not args.quiet
+        )
+    finally:
+        writer.close()
+
+    print(f"完了: {summary['件数']} 件（エラー {summary['エラー']} 件）→ {args.output}", file=sys.stderr)
+    return 1 if summary["エラー"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
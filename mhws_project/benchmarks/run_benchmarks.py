@@ -0,0 +1,359 @@
+# === run_benchmarks.py（計算・GUI再実行のベンチマーク） ===
+#
+# 使い方（mhws_project/ で実行）:
+#   python benchmarks/run_benchmarks.py                      # 全部測って表示
+#   python benchmarks/run_benchmarks.py --save-baseline      # benchmarks/baseline.json に保存
+#   python benchmarks/run_benchmarks.py --only single,micro  # GUI を除く
+#
+# baseline.json があれば各項目の最小値（--stat で median も可）を比べ、threshold（既定 25%）
+# より遅くなった項目を回帰として表示して終了コード 1 を返す。最小値はほかのプロセスの
+# 影響を受けにくいので既定にしている。マシンが変わったら baseline は取り直すこと。
+#
+#   single/*: run_full_dps_calculation（キャッシュなし初回・結果キャッシュあり・ログあり/なし）
+#   micro/*:  calculate_combo_damage（コンボ長別）と apply_skill_modifiers（スキル数別）
+#   gui/*:    Streamlit AppTest での初回表示と「計算する」押下時の再実行
+#   startup/*: 新しい Python プロセスを起動して最初の結果が出るまで（コールドスタート）
+# ログありの計測・GUI の計測は一時ディレクトリに書くので results/ は変わらない。
+#
+# startup/* には baseline と別に目標時間（STARTUP_TARGETS）があり、超えたら失敗扱い。
+# 計測は「プロセス起動 → import → データ読み込み → 最初の計算 / 初回表示」までの全体。
+# データのスナップショット（utils/loader.py）は計測前に作っておく（デプロイ時と同じ状態）。
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(BENCH_DIR, "..")))
+
+import numpy as np
+
+from logic.calculation_interface import compute_dps, run_full_dps_calculation
+from logic.combo import calculate_combo_damage
+from logic.skill import apply_skill_modifiers
+from utils import loader
+from utils.history import HistoryStore
+from utils.memo import ResultCache, get_result_cache
+from utils.result_logger import HistoryResultSink, NullSink, set_default_sink
+
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+GUI_SCRIPT = os.path.join(BENCH_DIR, "..", "gui", "app_streamlit_gui_connected.py")
+DEFAULT_THRESHOLD = 0.25
+SUITES = ("single", "micro", "gui", "startup")
+
+# コールドスタートの目標（秒）
+STARTUP_TARGETS = {
+    "startup/calc_first_result": 0.15,
+    "startup/gui_first_run": 1.2,
+}
+
+_STARTUP_CALC = """
+import sys
+sys.path.append({root!r})
+from logic.calculation_interface import compute_dps
+from utils import loader
+weapon = next(iter(loader.get_weapons()))
+monster, monster_data = next(iter(loader.get_monsters().items()))
+compute_dps(weapon, monster, next(iter(monster_data["parts"])), next(iter(loader.get_combos())), {{}})
+"""
+
+_STARTUP_GUI = """
+import sys
+sys.path.append({root!r})
+from streamlit.testing.v1 import AppTest
+from utils.history import HistoryStore
+from utils.result_logger import HistoryResultSink, set_default_sink
+set_default_sink(HistoryResultSink(HistoryStore({history!r})))
+app = AppTest.from_file({script!r}, default_timeout=120)
+app.run()
+if app.exception:
+    raise SystemExit(str(app.exception))
+"""
+
+COMBO_LENGTHS = (1, 4, 16, 64)
+SKILL_COUNTS = (0, 3, 8, None)  # None = skills.json の全スキル
+
+
+def _summary(samples: List[float], number: int = 1) -> Dict[str, float]:
+    per_call = [s / number for s in samples]
+    return {
+        "median": statistics.median(per_call),
+        "min": min(per_call),
+        "mean": statistics.fmean(per_call),
+        "repeat": len(per_call),
+        "number": number,
+    }
+
+
+def measure(fn: Callable[[], object], repeat: int, setup: Optional[Callable[[], object]] = None) -> Dict[str, float]:
+    """1回ずつ計測（setup は計測に含めない）"""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return _summary(samples)
+
+
+def measure_micro(fn: Callable[[], object], repeat: int, min_time: float = 0.02) -> Dict[str, float]:
+    """短い処理は合計 min_time 秒以上になる回数をまとめて計測し、1回あたりに直す"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start >= min_time:
+            break
+        number *= 2
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append(time.perf_counter() - start)
+    return _summary(samples, number)
+
+
+def _default_case():
+    """ベンチマーク用の構成（データの先頭の武器・モンスター・部位・コンボ）"""
+    weapon = next(iter(loader.get_weapons()))
+    monster, monster_data = next(iter(loader.get_monsters().items()))
+    part = next(iter(monster_data["parts"]))
+    combo = next(iter(loader.get_combos()))
+    skills = {name: (1, 1.0) for name in list(loader.get_skills())[:6]}
+    return weapon, monster, part, combo, skills
+
+
+def _clear_caches() -> None:
+    # ビューが作り直されるので、コンパイル済みコンボ・スキル表も作り直しになる
+    loader.clear_cache()
+    get_result_cache().clear()
+
+
+def bench_single(repeat: int) -> Dict[str, Dict]:
+    case = _default_case()
+    null = NullSink()
+    results = {}
+    results["single/cold"] = measure(lambda: run_full_dps_calculation(*case, sink=null), repeat, setup=_clear_caches)
+
+    run_full_dps_calculation(*case, sink=null)
+    results["single/warm_cached"] = measure_micro(lambda: run_full_dps_calculation(*case, sink=null), repeat)
+
+    no_cache = ResultCache(maxsize=0)
+    results["single/warm_nolog"] = measure_micro(
+        lambda: run_full_dps_calculation(*case, sink=null, cache=no_cache), repeat
+    )
+    results["single/compute_only"] = measure_micro(lambda: compute_dps(*case), repeat)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sink = HistoryResultSink(HistoryStore(os.path.join(tmp, "history.sqlite3")),
+                                 batch_size=10 ** 9, flush_interval=3600)
+        results["single/warm_log_async"] = measure_micro(
+            lambda: run_full_dps_calculation(*case, sink=sink, cache=no_cache), repeat
+        )
+        sink.flush()
+
+        def click_with_flush():
+            run_full_dps_calculation(*case, sink=sink, cache=no_cache)
+            sink.flush()
+        results["single/warm_log_flush"] = measure_micro(click_with_flush, repeat)
+        sink.close()
+        sink.store.close()
+    return results
+
+
+def bench_micro(repeat: int) -> Dict[str, Dict]:
+    motions = loader.get_motion_values()
+    plain_motions = loader.thaw(motions)  # 読み取り専用ビューでないとコンパイル結果はキャッシュされない
+    move_names = [name for name in motions if "motion" in motions[name]]
+    skill_names = list(loader.get_skills())
+    results = {}
+
+    for length in COMBO_LENGTHS:
+        moves = [move_names[i % len(move_names)] for i in range(length)]
+        results[f"micro/combo_damage/len{length}/cached"] = measure_micro(
+            lambda: calculate_combo_damage(moves, motions, 300.0, 20.0, affinity=20.0), repeat
+        )
+        results[f"micro/combo_damage/len{length}/uncached"] = measure_micro(
+            lambda: calculate_combo_damage(moves, plain_motions, 300.0, 20.0, affinity=20.0), repeat
+        )
+
+    for count in SKILL_COUNTS:
+        names = skill_names if count is None else skill_names[:count]
+        skills = {name: (1, 0.8) for name in names}
+        label = "all" if count is None else count
+        results[f"micro/apply_skill_modifiers/n{label}"] = measure_micro(
+            lambda: apply_skill_modifiers(300.0, 5.0, 200.0, skills), repeat
+        )
+    return results
+
+
+def bench_gui(repeat: int) -> Dict[str, Dict]:
+    from streamlit.testing.v1 import AppTest
+
+    first_run = []
+    rerun = []
+    with tempfile.TemporaryDirectory() as tmp:
+        previous = set_default_sink(HistoryResultSink(HistoryStore(os.path.join(tmp, "history.sqlite3"))))
+        try:
+            for _ in range(repeat):
+                get_result_cache().clear()
+                app = AppTest.from_file(GUI_SCRIPT, default_timeout=120)
+                start = time.perf_counter()
+                app.run()
+                first_run.append(time.perf_counter() - start)
+                if app.exception:
+                    raise RuntimeError(f"GUI の実行に失敗しました: {app.exception}")
+
+                button = next(b for b in app.sidebar.button if b.label == "計算する")
+                start = time.perf_counter()
+                button.click().run()
+                rerun.append(time.perf_counter() - start)
+                if app.exception:
+                    raise RuntimeError(f"GUI の実行に失敗しました: {app.exception}")
+        finally:
+            sink = set_default_sink(previous)
+            sink.close()
+            sink.store.close()
+    return {"gui/first_run": _summary(first_run), "gui/rerun_calculate": _summary(rerun)}
+
+
+def _time_process(code: str) -> float:
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"起動の計測に失敗しました:\n{proc.stderr}")
+    return elapsed
+
+
+def bench_startup(repeat: int) -> Dict[str, Dict]:
+    root = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+    loader.build_snapshot()
+    with tempfile.TemporaryDirectory() as tmp:
+        codes = {
+            "startup/calc_first_result": _STARTUP_CALC.format(root=root),
+            "startup/gui_first_run": _STARTUP_GUI.format(
+                root=root, history=os.path.join(tmp, "history.sqlite3"), script=os.path.abspath(GUI_SCRIPT)
+            ),
+        }
+        return {name: _summary([_time_process(code) for _ in range(repeat)]) for name, code in codes.items()}
+
+
+def check_targets(current: Dict, stat: str = "min") -> List[Dict]:
+    """STARTUP_TARGETS と比べる（計測した項目だけ）"""
+    rows = []
+    for name, target in STARTUP_TARGETS.items():
+        now = current["results"].get(name)
+        if now is not None:
+            rows.append({"name": name, "target": target, "current": now[stat], "ok": now[stat] <= target})
+    return rows
+
+
+def run(suites, repeat: int, gui_repeat: int) -> Dict:
+    results = {}
+    if "single" in suites:
+        results.update(bench_single(repeat))
+    if "micro" in suites:
+        results.update(bench_micro(repeat))
+    if "gui" in suites:
+        results.update(bench_gui(gui_repeat))
+    if "startup" in suites:
+        results.update(bench_startup(gui_repeat))
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "data_version": loader.data_version(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float, stat: str = "min") -> List[Dict]:
+    """両方にある項目の stat（min / median）を比べる。戻り値は項目ごとの比較結果"""
+    rows = []
+    for name, now in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            continue
+        ratio = now[stat] / before[stat] if before[stat] > 0 else float("inf")
+        rows.append({"name": name, "baseline": before[stat], "current": now[stat],
+                     "ratio": ratio, "regression": ratio > 1 + threshold})
+    return rows
+
+
+def _format_time(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:9.1f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:9.2f} ms"
+    return f"{seconds:9.3f} s "
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="DPS計算とGUI再実行のベンチマーク")
+    parser.add_argument("--only", default=",".join(SUITES), help=f"実行する種類（{','.join(SUITES)} のカンマ区切り）")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--gui-repeat", type=int, default=3, help="GUI・起動時間の計測回数")
+    parser.add_argument("--output", help="結果を書き出す JSON")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="比較する baseline の JSON")
+    parser.add_argument("--save-baseline", action="store_true", help="結果を baseline として保存する")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="回帰とみなす遅れの割合")
+    parser.add_argument("--stat", choices=("min", "median"), default="min", help="比較に使う値")
+    args = parser.parse_args(argv)
+
+    suites = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"不明な種類: {', '.join(sorted(unknown))}")
+
+    current = run(suites, args.repeat, args.gui_repeat)
+    for name, r in current["results"].items():
+        print(f"{name:45s} median {_format_time(r['median'])}  min {_format_time(r['min'])}")
+
+    targets = check_targets(current, args.stat)
+    if targets:
+        print(f"\n起動時間の目標（{args.stat}）")
+        for row in targets:
+            mark = "OK" if row["ok"] else "  <-- 目標超過"
+            print(f"{row['name']:45s} {_format_time(row['current'])} / 目標 {_format_time(row['target'])}  {mark}")
+    missed_target = any(not row["ok"] for row in targets)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"baseline を保存しました: {args.baseline}")
+        return 1 if missed_target else 0
+
+    if not os.path.exists(args.baseline):
+        print("baseline がないので比較しません（--save-baseline で作成）")
+        return 1 if missed_target else 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare(current, baseline, args.threshold, args.stat)
+    print(f"\nbaseline との比較（{args.stat}、{args.threshold:.0%} 以上遅くなったら回帰）")
+    for row in rows:
+        mark = "  <-- 回帰" if row["regression"] else ""
+        print(f"{row['name']:45s} {row['ratio']:6.2f}x{mark}")
+    return 1 if missed_target or any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
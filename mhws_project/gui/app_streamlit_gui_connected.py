@@ -1,9 +1,6 @@
 import sys
 import os
 import streamlit as st
-import json
-import pandas as pd
-import altair as alt
 
 # === set_page_config は最初に呼ぶ必要あり ===
 st.set_page_config(page_title="モンハン片手剣DPS計算ツール", layout="wide")
@@ -14,27 +11,42 @@ st.set_page_config(page_title="モンハン片手剣DPS計算ツール", layout=
 # logic/utils参照用パス設定
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from logic.calculation_interface import run_full_dps_calculation
+from logic.calculation_interface import compute_dps, run_full_dps_calculation
+from logic.sharpness import get_sharpness_bar
 from gui import bookmarks  # bookmarks.py をインポート
-
-# ── データ読み込み ──
-DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
-
-def load_json(filename):
-    with open(os.path.join(DATA_DIR, filename), "r", encoding="utf-8") as f:
-        return json.load(f)
-
-weapons = load_json("weapons.json")
-monsters = load_json("monsters.json")
-combos = load_json("combos.json")
-skills_json = load_json("skills.json")
+from utils import loader, profiling, trace
+from utils.data_compiler import DataError, get_data_index
+from utils.history import get_history_store
+from utils.lazy import lazy_import
+from utils.result_logger import get_default_sink
+
+# 重いモジュール（pandas / altair / numpy を使う機能）は初めて使うときに読み込む（起動時間対策）
+pd = lazy_import("pandas")
+alt = lazy_import("altair")
+optimizer = lazy_import("logic.optimizer")
+sensitivity = lazy_import("logic.sensitivity")
+matrix_module = lazy_import("logic.matrix")
+simulator = lazy_import("utils.simulator")
+compare = lazy_import("logic.compare")
+combo_search = lazy_import("logic.combo_search")
+hunt = lazy_import("logic.hunt")
+
+# ── データ読み込み（プロセス共有キャッシュ。rerun ごとの再パースはしない） ──
+weapons = loader.get_weapons()
+monsters = loader.get_monsters()
+combos = loader.get_combos()
+skills_json = loader.get_skills()
 skill_names = sorted(skills_json.keys())
-skills_category = load_json("skills_category.json")
-
-# ── スキル自動分類 ──
+skills_category = loader.get_skills_category()
+try:
+    data_index = get_data_index()  # 検証済みの派生インデックス（データ更新時だけ作り直す）
+except DataError as e:
+    st.error(str(e))
+    st.stop()
+
+# ── スキル自動分類（分類はインデックスに作成済み。下で追加するのでリストにコピー） ──
 all_skills = set(skills_json.keys())
-categorized_skills = set(sum(skills_category.values(), []))
-uncategorized_skills = sorted(list(all_skills - categorized_skills))
+uncategorized_skills = list(data_index["uncategorized_skills"])
 
 # ── タイトル ──
 st.title("モンハンワイルズ DPS計算ツール（片手剣）")
@@ -54,9 +66,8 @@ if "combo_name" not in st.session_state:
 if "pending_reflect" in st.session_state:
     reflect_skills = st.session_state["pending_reflect"].get("skills", {})
     for skill_name in reflect_skills:
-        if skill_name not in skills_json:
-            skills_json[skill_name] = {}  # 存在しないスキルも追加
-            uncategorized_skills.append(skill_name)
+        if skill_name not in skills_json and skill_name not in uncategorized_skills:
+            uncategorized_skills.append(skill_name)  # 存在しないスキルも追加
 
 # ── pending_reflect を session_state に反映 ──
 if "pending_reflect" in st.session_state:
@@ -66,7 +77,7 @@ if "pending_reflect" in st.session_state:
     st.session_state["part_name"] = data["part_name"]
     st.session_state["combo_name"] = data["combo_name"]
     # すべてのスキルLv/発動率をリセット
-    for skill in skills_json.keys():
+    for skill in all_skills | set(uncategorized_skills):
         st.session_state[skill + "_lv"] = 0
         st.session_state[skill + "_rate"] = 1.0
 
@@ -80,6 +91,16 @@ weapon_name = st.sidebar.selectbox("武器", list(weapons.keys()), key="weapon_n
 monster_name = st.sidebar.selectbox("モンスター", list(monsters.keys()), key="monster_name")
 part_name = st.sidebar.selectbox("部位", list(monsters[monster_name]["parts"].keys()), key="part_name")
 combo_name = st.sidebar.selectbox("コンボ", list(combos.keys()), key="combo_name")
+# 複数部位に分けて当てる場合は {部位: 重み} を計算に渡す（重みは合計で割るので % でなくてもよい）
+part_target = part_name
+if st.sidebar.checkbox("複数の部位に分けて当てる", key="multi_part"):
+    with st.sidebar.expander("部位ごとに当てる割合", expanded=True):
+        part_weights = {
+            part: st.slider(part, 0, 100, 100 if part == part_name else 0, 5, key=f"part_weight_{monster_name}_{part}")
+            for part in monsters[monster_name]["parts"]
+        }
+    if any(part_weights.values()):
+        part_target = part_weights
 
 # ── スキル入力 ──
 st.sidebar.markdown("### スキル (Lv + 発動率)")
@@ -102,20 +123,43 @@ if uncategorized_skills:
             if lv > 0:
                 skills_input[name] = (lv, rate)
 
+# ── 処理時間の計測（オン/オフはこのセッションの計算だけ。集計はプロセス共通） ──
+with st.sidebar.expander("⏱️ 処理時間の計測"):
+    profiling.set_local(st.checkbox("計測する", key="profiling_enabled"))
+    if st.button("計測結果をリセット"):
+        profiling.reset()
+
+# ── ダメージ内訳の記録（このセッションの計算だけを記録。記録中はこのセッションだけ結果キャッシュを使わない） ──
+if "trace_buffer" not in st.session_state:
+    st.session_state["trace_buffer"] = trace.TraceBuffer()
+trace_buffer = st.session_state["trace_buffer"]
+with st.sidebar.expander("🔬 ダメージ内訳の記録"):
+    if st.checkbox("ヒットごとに記録する", key="trace_enabled"):
+        trace.enable(trace_buffer)
+    else:
+        trace.disable()
+    if st.button("記録をクリア"):
+        trace_buffer.clear()
+
 # ── 計算実行 ──
 if st.sidebar.button("計算する"):
     with st.spinner("計算中..."):
         result = run_full_dps_calculation(
-            weapon_name, monster_name, part_name, combo_name, skills_input
+            weapon_name, monster_name, part_target, combo_name, skills_input
         )
 
     st.session_state["last_result"] = {
         "weapon": weapon_name,
         "monster": monster_name,
         "part": part_name,
+        "part_weights": result.get("部位重み"),  # 複数部位のときだけ（比較は part の1部位で行う）
         "combo": combo_name,
         "skills": skills_input,
-        "dps": result["DPS"]
+        "dps": result["DPS"],
+        # 一括比較で「保存後のデータ更新による変化」を出すための保存時の値
+        "total_damage": result["合計ダメージ"],
+        "duration": result["維持秒数"],
+        "data_version": loader.data_version()
     }
 
     st.header("🟥 計算結果概要 🟥")
@@ -132,6 +176,13 @@ if st.sidebar.button("計算する"):
     st.write(f"物理有効値: {result['物理有効値']:.1f}")
     st.write(f"属性有効値: {result['属性有効値']:.1f}")
 
+    if "部位内訳" in result:
+        st.subheader("部位ごとの内訳")
+        st.caption(f"{result['部位']} で当てた場合。DPS はその部位だけに当て続けた場合、寄与DPS は割合を掛けた値")
+        st.table(pd.DataFrame(result["部位内訳"]).assign(重み=lambda df: (df["重み"] * 100).round(1)).rename(
+            columns={"重み": "割合(%)"}
+        ).round(2))
+
     st.subheader("✨ 切れ味持続評価 ✨")
     st.write(f"切れ味ヒット数: {result['切れ味Hit']}")
     st.write(f"実効ヒット数：{result['実効Hit']}")
@@ -142,6 +193,196 @@ if st.sidebar.button("計算する"):
     st.write(f"平均ヒットダメージ：{result['平均Hitダメージ']:.1f}")
     st.write(f"切れ味が続く間の合計ダメージ：**{result['合計ダメージ']:.1f}**")
 
+    timeline = result["切れ味タイムライン"]
+    if timeline and len(timeline["区間"]) > 1:
+        st.subheader("切れ味ゲージのタイムライン")
+        st.table(pd.DataFrame([
+            {
+                "色": s["色"],
+                "開始秒": round(s["開始秒"], 1),
+                "終了秒": round(s["終了秒"], 1),
+                "コンボ回数": round(s["コンボ回数"], 1),
+                "ダメージ": round(s["ダメージ"], 1),
+            }
+            for s in timeline["区間"]
+        ]))
+        st.write(f"ゲージ全体のDPS：{timeline['DPS']:.2f}（最上位の色が落ちるまで {timeline['切れ味持続秒']:.1f}秒）")
+
+# ── スキル構成の自動探索 ──
+with st.sidebar.expander("🔎 スキル構成の自動探索"):
+    opt_points = st.number_input("スキルLv合計の上限", 1, 60, 20, key="opt_points")
+    opt_objective = st.selectbox(
+        "評価基準", ["dps", "total_damage"],
+        format_func=lambda x: {"dps": "DPS", "total_damage": "切れ味が尽きるまでの合計ダメージ"}[x],
+        key="opt_objective"
+    )
+    opt_required = st.checkbox("入力中のスキルを必須にする", key="opt_required")
+    opt_run = st.button("探索する")
+
+if opt_run:
+    with st.spinner("探索中..."):
+        builds = optimizer.optimize_skills(
+            weapon_name, monster_name, part_name, combo_name,
+            max_total_points=int(opt_points),
+            required_skills={n: lv for n, (lv, _) in skills_input.items()} if opt_required else None,
+            fixed_uptimes={n: rate for n, (_, rate) in skills_input.items()},
+            objective=opt_objective,
+            top_k=5
+        )
+    st.header("🔎 スキル構成の探索結果")
+    st.table(pd.DataFrame([
+        {
+            "DPS": round(b["DPS"], 2),
+            "合計ダメージ": round(b["合計ダメージ"], 1),
+            "Lv合計": b["スキルポイント"],
+            "スキル": " / ".join(f"{n}Lv{lv}" for n, (lv, _) in b["スキル"].items()),
+        }
+        for b in builds
+    ]))
+
+# ── ばらつき（モンテカルロ） ──
+with st.sidebar.expander("🎲 DPSのばらつき（シミュレーション）"):
+    sim_trials = st.select_slider("試行回数", [1000, 5000, 10000, 50000], 10000, key="sim_trials")
+    sim_seed = st.number_input("乱数シード", 0, 2**31 - 1, 0, key="sim_seed")
+    sim_run = st.button("シミュレーションする")
+
+if sim_run:
+    with st.spinner("シミュレーション中..."):
+        sim = simulator.simulate_hunts(
+            weapon_name, monster_name, part_name, combo_name, skills_input,
+            trials=int(sim_trials), seed=int(sim_seed),
+            processes=2 if sim_trials >= 50000 else 1
+        )
+    st.header("🎲 DPSのばらつき")
+    st.table(pd.DataFrame({
+        key: {k: round(v, 2) for k, v in sim[key].items()}
+        for key in ("DPS", "合計ダメージ", "切れ味持続秒")
+    }))
+    chart_sim = alt.Chart(pd.DataFrame({"DPS": sim["samples"]["DPS"]})).mark_bar().encode(
+        x=alt.X("DPS:Q", bin=alt.Bin(maxbins=40), title="DPS"),
+        y=alt.Y("count():Q", title="試行数"),
+    )
+    st.altair_chart(chart_sim, use_container_width=True)
+
+# ── 討伐時間（体力・部位の狙い分け・研ぎ・フェーズ） ──
+with st.sidebar.expander("🕒 討伐時間シミュレーション"):
+    st.caption("部位ごとに当てる割合")
+    hunt_weights = {
+        part: st.slider(part, 0, 100, 100 if part == part_name else 0, 5, key=f"hunt_weight_{monster_name}_{part}")
+        for part in monsters[monster_name]["parts"]
+    }
+    hunt_combos = st.multiselect("コンボのローテーション（順に繰り返す）", list(combos.keys()),
+                                 default=[combo_name], key="hunt_combos")
+    hunt_colours = [colour for colour, _ in get_sharpness_bar(weapons[weapon_name])]
+    hunt_sharpen_below = st.selectbox("この色より下がったら研ぐ", hunt_colours, key="hunt_sharpen_below")
+    hunt_sharpen_time = st.number_input("研ぐのにかかる秒数", 0.0, 30.0, 3.0, 0.5, key="hunt_sharpen_time")
+    hunt_run = st.button("討伐時間を計算する")
+
+if hunt_run:
+    if "hp" not in monsters[monster_name]:
+        st.error(f"{monster_name} の体力（hp）が monsters.json にありません")
+    elif not hunt_combos or not any(hunt_weights.values()):
+        st.error("コンボと、当てる部位を1つ以上選んでください")
+    else:
+        ttk = hunt.simulate_hunt(
+            weapon_name, monster_name, hunt_weights, hunt_combos, skills_input,
+            sharpen_below=hunt_sharpen_below, sharpen_time=hunt_sharpen_time
+        )
+        st.header("🕒 討伐時間")
+        if hunt.is_placeholder_hp(monster_name):
+            st.warning(f"{monster_name} の体力・フェーズは出典のない仮の値です。討伐時間は目安としてご覧ください。")
+        minutes, seconds = divmod(ttk["討伐時間"], 60)
+        st.write(
+            f"{'討伐' if ttk['討伐'] else '時間切れ'}：**{int(minutes)}分{seconds:04.1f}秒**"
+            f"（体力 {monsters[monster_name]['hp']:,}{'（仮）' if hunt.is_placeholder_hp(monster_name) else ''}・平均DPS {ttk['平均DPS']:.2f}・"
+            f"研ぎ {ttk['研ぎ回数']}回 / {ttk['研ぎ時間']:.1f}秒）"
+        )
+        df_hunt = pd.DataFrame(ttk["区間"])
+        st.dataframe(df_hunt.round(1), hide_index=True)
+        chart_hunt = alt.Chart(df_hunt).mark_line(point=True).encode(
+            x=alt.X("終了秒:Q", title="経過秒"),
+            y=alt.Y("残り体力:Q", title="残り体力"),
+            tooltip=["フェーズ", "色", "開始秒", "終了秒", "残り体力"],
+        )
+        st.altair_chart(chart_hunt, use_container_width=True)
+
+# ── スキルの価値（感度分析） ──
+with st.sidebar.expander("📈 スキル1段階あたりの価値"):
+    sens_only_equipped = st.checkbox("装備中のスキルだけ表示", key="sens_only_equipped")
+    sens_run = st.button("分析する")
+
+if sens_run:
+    sens = sensitivity.skill_sensitivity(weapon_name, monster_name, part_name, combo_name, skills_input)
+    st.header("📈 スキル1段階あたりの価値")
+    crit = sens["会心"]
+    st.write(
+        f"基準DPS：{sens['基準']['DPS']:.2f} / 会心率：{crit['会心率']:.0f}%"
+        f"（上限まであと {crit['上限までの余裕']:.0f}%、会心率+1%で DPS {crit['会心率+1%あたりのΔDPS']:+.2f}）"
+    )
+    rows = [r for r in sens["スキル"] if not sens_only_equipped or r["スキル"] in skills_input]
+    st.dataframe(pd.DataFrame([
+        {
+            "スキル": r["スキル"],
+            "変更": r["変更"],
+            "ΔDPS": round(r["ΔDPS"], 2),
+            "Δ合計ダメージ": round(r["Δ合計ダメージ"], 1),
+            "会心率超過": round(r["会心率超過"], 1),
+        }
+        for r in rows
+    ]), hide_index=True)
+
+# ── 全武器 × 全部位のDPS表 ──
+with st.sidebar.expander("🗺️ 全武器 × 全部位のDPS表"):
+    st.caption("今のスキル構成・コンボで、全武器を全モンスターの全部位に当てた場合")
+    matrix_run = st.button("DPS表を作る")
+
+if matrix_run:
+    with st.spinner("計算中..."):
+        matrix = matrix_module.build_dps_matrix(combo_name, skills_input)
+    st.header("🗺️ 全武器 × 全部位のDPS")
+    df_matrix = pd.DataFrame(matrix.records())
+    df_matrix["対象"] = df_matrix["モンスター"] + " / " + df_matrix["部位"]
+    heatmap = alt.Chart(df_matrix).mark_rect().encode(
+        x=alt.X("対象:N", title="モンスター / 部位", sort=None),
+        y=alt.Y("武器:N", title="武器", sort=None),
+        color=alt.Color("DPS:Q", scale=alt.Scale(scheme="orangered")),
+        tooltip=["武器", "モンスター", "部位", alt.Tooltip("DPS:Q", format=".1f"), alt.Tooltip("合計ダメージ:Q", format=".0f")],
+    )
+    st.altair_chart(heatmap, use_container_width=True)
+
+    st.subheader("部位ごとのおすすめ武器")
+    st.table(pd.DataFrame([
+        {
+            "モンスター": monster,
+            "部位": part,
+            **{f"{rank}位": f"{name}（{value:.1f}）" for rank, (name, value) in enumerate(matrix.best_weapons(monster, part), start=1)},
+        }
+        for monster, part in matrix.targets
+    ]))
+
+# ── 最適コンボの探索 ──
+with st.sidebar.expander("🧮 最適コンボの探索"):
+    combo_mode = st.radio("条件", ["繰り返し（ループ）", "制限時間内"], key="combo_mode")
+    if combo_mode == "制限時間内":
+        combo_budget = st.number_input("制限時間（秒）", 0.5, 600.0, 10.0, step=0.5, key="combo_budget")
+    else:
+        combo_max_moves = st.slider("1周の最大手数", 1, 20, 8, key="combo_max_moves")
+    combo_run = st.button("コンボを探す")
+
+if combo_run:
+    if combo_mode == "制限時間内":
+        found = combo_search.search_combo_within(weapon_name, monster_name, part_name, skills_input, float(combo_budget))
+    else:
+        found = combo_search.search_combo_loop(weapon_name, monster_name, part_name, skills_input, int(combo_max_moves))
+    st.header("🧮 最適コンボの探索結果")
+    if not found.moves:
+        st.warning("条件に合う技の並びがありません（技の time / next が motion_values.json にあるか確認してください）")
+    else:
+        st.write(" → ".join(found.moves))
+        st.write(f"DPS：**{found.dps:.2f}**（{len(found.moves)}手・{found.time:.2f}秒・ダメージ {found.damage:.1f}）")
+        current = compute_dps(weapon_name, monster_name, part_name, combo_name, skills_input)["DPS"]
+        st.caption(f"選択中のコンボ「{combo_name}」の DPS：{current:.2f}（切れ味の消費は考慮していません）")
+
 
 # ── お気に入り登録 ──
 st.divider()
@@ -163,7 +404,7 @@ bookmark_list = bookmarks.load_bookmarks()
 if bookmark_list:
     st.subheader("お気に入りリスト")
     selected_name = st.selectbox("お気に入りを選択", [b["name"] for b in bookmark_list])
-    selected = next((b for b in bookmark_list if b["name"] == selected_name), None)
+    selected = bookmarks.get_bookmark(selected_name)
 
     if selected:
         with st.expander("📦 お気に入りの内容を表示／非表示", expanded=False):
@@ -184,6 +425,24 @@ if bookmark_list:
             st.success("削除しました。")
             st.rerun()
 
+    # ── お気に入りの一括比較 ──
+    with st.expander("⚖️ お気に入りをまとめて比較", expanded=False):
+        compare_names = st.multiselect(
+            "比較する構成（空なら全部）", [b["name"] for b in bookmark_list], key="compare_names"
+        )
+        compare_target = st.radio(
+            "評価する部位", ["保存時の部位", "いま選択中のモンスター・部位"], horizontal=True, key="compare_target"
+        )
+        if st.button("比較する"):
+            builds = [b for b in bookmark_list if not compare_names or b["name"] in compare_names]
+            if compare_target == "保存時の部位":
+                compared = compare.compare_builds(builds)
+            else:
+                compared = compare.compare_builds(builds, monster_name, part_name)
+            st.caption("Δ は保存時と同じ部位で計算し直した値 − 保存時の値（データ更新による変化）")
+            st.dataframe(pd.DataFrame(compared).sort_values("DPS", ascending=False, na_position="last"),
+                         hide_index=True)
+
     if st.button("すべてのお気に入りを削除"):
         bookmarks.clear_all_bookmarks()
         st.success("全て削除しました。")
@@ -192,51 +451,47 @@ else:
     st.info("お気に入りはまだありません。")
 
 # ── グラフ ──
-csv_path = os.path.join(os.path.dirname(__file__), "..", "results", "dps_log.csv")
-colnames = [
-    "武器","モンスター","部位","切れ味","スキル構成","コンボ名",
-    "補正攻撃力","会心率","補正属性","期待値攻撃",
-    "物理肉質後","属性肉質後","物理合計","属性合計",
-    "コンボ時間","DPS","元切れ味Hit","実効Hit","コンボ回数","維持秒数"
-]
-
-if os.path.exists(csv_path):
-    df_logs = pd.read_csv(csv_path, header=None)
-    df_logs.columns = colnames
-
-    max_n = min(5, len(df_logs))
-    n = st.slider("表示する構成数（最新から）", 0, max_n, max_n)
-
-    if n > 0:
-        latest_n = df_logs.tail(n).iloc[::-1].reset_index(drop=True)
-        labels = ["最新"] + [f"{i}つ前" for i in range(1, n)]
-        latest_n["構成ラベル"] = labels
-
-        # st.subheader("過去構成のDPS比較")
-        # chart_dps = alt.Chart(latest_n).mark_bar().encode(
-        #     x=alt.X("構成ラベル:N", title="構成", sort=labels),
-        #     y=alt.Y("DPS:Q", title="DPS"),
-        #     color=alt.value("red"),
-        # )
-        # st.altair_chart(chart_dps, use_container_width=True)
-
-        # st.subheader("過去構成の切れ味長さ比較")
-        # chart_len = alt.Chart(latest_n).mark_bar().encode(
-        #     x=alt.X("構成ラベル:N", title="構成", sort=labels),
-        #     y=alt.Y("実効Hit:Q", title="切れ味持続ヒット数"),
-        #     color=alt.value("yellow"),
-        # )
-        # st.altair_chart(chart_len, use_container_width=True)
-
-        # st.subheader("過去構成の切れ味持続時間比較")
-        # chart_time = alt.Chart(latest_n).mark_bar().encode(
-        #     x=alt.X("構成ラベル:N", title="構成", sort=labels),
-        #     y=alt.Y("維持秒数:Q", title="切れ味持続時間 (秒)"),
-        #     color=alt.value("lightgreen"),
-        # )
-        # st.altair_chart(chart_time, use_container_width=True)
+# 計算結果の履歴はバックグラウンドで書かれるので、読む前に書き出しておく
+log_sink = get_default_sink()
+log_sink.flush()
+history = getattr(log_sink, "store", None) or get_history_store()
+history_count = history.count()
+if history_count:
+    # グラフ（pandas / altair）は開いたときだけ作る
+    if st.toggle("📊 過去構成のDPS・切れ味グラフを表示", key="show_log_charts"):
+        max_n = min(5, history_count)
+        n = st.slider("表示する構成数（最新から）", 0, max_n, max_n)
+
+        if n > 0:
+            # グラフに使う列だけを新しい順に読む
+            latest_n = pd.DataFrame(history.query(["DPS", "実効Hit", "維持秒数"], limit=n, newest_first=True))
+            labels = ["最新"] + [f"{i}つ前" for i in range(1, n)]
+            latest_n["構成ラベル"] = labels
+
+            # st.subheader("過去構成のDPS比較")
+            # chart_dps = alt.Chart(latest_n).mark_bar().encode(
+            #     x=alt.X("構成ラベル:N", title="構成", sort=labels),
+            #     y=alt.Y("DPS:Q", title="DPS"),
+            #     color=alt.value("red"),
+            # )
+            # st.altair_chart(chart_dps, use_container_width=True)
+
+            # st.subheader("過去構成の切れ味長さ比較")
+            # chart_len = alt.Chart(latest_n).mark_bar().encode(
+            #     x=alt.X("構成ラベル:N", title="構成", sort=labels),
+            #     y=alt.Y("実効Hit:Q", title="切れ味持続ヒット数"),
+            #     color=alt.value("yellow"),
+            # )
+            # st.altair_chart(chart_len, use_container_width=True)
+
+            # st.subheader("過去構成の切れ味持続時間比較")
+            # chart_time = alt.Chart(latest_n).mark_bar().encode(
+            #     x=alt.X("構成ラベル:N", title="構成", sort=labels),
+            #     y=alt.Y("維持秒数:Q", title="切れ味持続時間 (秒)"),
+            #     color=alt.value("lightgreen"),
+            # )
+            # st.altair_chart(chart_time, use_container_width=True)
         
-        with st.expander("📊 過去構成のDPS・切れ味グラフ（クリックで表示）", expanded=False):
             st.subheader("過去構成のDPS比較")
             chart_dps = alt.Chart(latest_n).mark_bar().encode(
                 x=alt.X("構成ラベル:N", title="構成", sort=labels),
@@ -261,8 +516,80 @@ if os.path.exists(csv_path):
             )
             st.altair_chart(chart_time, use_container_width=True)
 
+        if history_count > max_n:
+            # 件数が多くても、区間ごとの要約（SQLite で集計）だけを読む
+            st.subheader("DPSの推移（全履歴）")
+            history_where = None
+            if st.checkbox("今の武器・モンスターだけ", key="history_current_only"):
+                history_where = {"武器": weapon_name, "モンスター": monster_name}
+            trend = pd.DataFrame(history.downsample("DPS", points=200, where=history_where))
+            if trend.empty:
+                st.info("該当する履歴はありません。")
+            else:
+                trend["時刻"] = pd.to_datetime(trend["時刻"], unit="s")
+                trend_x = alt.X("id:Q", title="計算の通し番号")
+                band = alt.Chart(trend).mark_area(opacity=0.3).encode(
+                    x=trend_x, y=alt.Y("最小:Q", title="DPS"), y2="最大:Q"
+                )
+                line = alt.Chart(trend).mark_line(color="red").encode(
+                    x=trend_x, y="平均:Q", tooltip=["時刻:T", "件数:Q", "平均:Q", "最小:Q", "最大:Q"]
+                )
+                st.altair_chart(band + line, use_container_width=True)
+                st.caption(f"{int(trend['件数'].sum()):,} 件を {len(trend)} 区間にまとめて表示（線は平均、帯は最小〜最大）")
+
 else:
-    st.write("ログファイルが見つかりません。")
+    st.write("計算結果の履歴はまだありません。")
+
+# ── 処理時間の内訳 ──
+profile = profiling.snapshot()
+if profile:
+    with st.expander("⏱️ 処理時間の内訳", expanded=False):
+        st.table(pd.DataFrame([
+            {
+                "段階": name,
+                "回数": entry["count"],
+                "合計(ms)": round(entry["total"] * 1e3, 3),
+                "平均(µs)": round(entry["mean"] * 1e6, 1),
+                "最小(µs)": round(entry["min"] * 1e6, 1),
+                "最大(µs)": round(entry["max"] * 1e6, 1),
+            }
+            for name, entry in sorted(profile.items(), key=lambda item: -item[1]["total"])
+        ]))
+        df_hist = pd.DataFrame([
+            {"段階": name, "上限(µs)": edge * 1e6, "回数": n}
+            for name, entry in profile.items()
+            for edge, n in entry["histogram"].items()
+        ])
+        chart_hist = alt.Chart(df_hist).mark_bar().encode(
+            x=alt.X("上限(µs):O", title="所要時間の上限 (µs)"),
+            y=alt.Y("回数:Q", title="回数"),
+            color=alt.Color("段階:N"),
+            tooltip=["段階", "上限(µs)", "回数"],
+        )
+        st.altair_chart(chart_hist, use_container_width=True)
+        st.download_button("ヒストグラムをJSONで保存", profiling.export_json(),
+                           file_name="profile.json", mime="application/json")
+
+# ── ヒットごとのダメージ内訳 ──
+trace_calls = {call["計算"]: call for call in trace_buffer.calls()}
+if trace_calls:
+    with st.expander("🔬 ヒットごとのダメージ内訳", expanded=False):
+        labels = {
+            call["計算"]: f'#{call["計算"]} {call["武器"]} / {call["モンスター"]} {call["部位"]} / {call["コンボ"]}（{call["切れ味"]}）'
+            for call in trace_calls.values()
+        }
+        calc = st.selectbox("計算", list(labels)[::-1], format_func=labels.get, key="trace_calc")
+        df_hits = pd.DataFrame(trace_buffer.columns())
+        df_hits = df_hits[df_hits["計算"] == calc].drop(columns="計算")
+        call = trace_calls[calc]
+        st.write(f'物理合計 {call["物理合計"]:.2f} ／ 属性合計 {call["属性合計"]:.2f}（1コンボあたり）')
+        st.subheader("技ごと")
+        st.dataframe(
+            df_hits.groupby("技", sort=False)[["モーション値", "属性モーション値", "物理", "属性"]].sum().round(2),
+            use_container_width=True,
+        )
+        st.subheader("ヒットごと")
+        st.dataframe(df_hits.round(2), use_container_width=True, hide_index=True)
 
 st.markdown("---")
 st.markdown("##  チャンネル・SNSリンク")
@@ -1,42 +1,232 @@
 import json
 import os
-from typing import List, Dict
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 # BOOKMARKS_FILE = "data/bookmarks.json"
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 BOOKMARKS_FILE = os.path.join(BASE_DIR, "..", "data", "bookmarks.json")
-MAX_BOOKMARKS = 10
+
+# 変更履歴（1行1操作の追記専用）。これだけ溜まったら bookmarks.json にまとめ直す
+COMPACT_EVERY = 50
+# 読み込み中にファイルが消えたとき、ロックなしで読み直す回数
+REFRESH_RETRIES = 3
+
+# bookmarks.json は最後にまとめ直した時点の全件（新しい順）、
+# bookmarks.json.journal はそれ以降の操作:
+#   {"op": "put", "entry": {...}} / {"op": "delete", "name": ...} / {"op": "clear"}
+# 書き込みは .lock ファイルのロック中に行うので、複数プロセスから同時に呼んでも壊れない。
+# 読み込みはファイルの更新を検知したときだけ行い、履歴が追記されただけなら増えた行だけ読む。
+# 読み込みはロックを取らないので、stat してから開くまでに他のプロセスがまとめ直す（履歴を消す）ことがある。
+# そのときは全件を読み直し、それでも間に合わなければ共有ロックを取って読む。
+
+
+def _stamp(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class BookmarkStore:
+    def __init__(self, path: str = BOOKMARKS_FILE, compact_every: int = COMPACT_EVERY):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.lock_path = path + ".lock"
+        self.compact_every = compact_every
+
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()  # 名前 → お気に入り（古い順）
+        self._list: List[Dict] = []
+        self._snapshot_stamp = None
+        self._journal_stamp = None
+        self._journal_offset = 0
+        self._journal_ops = 0
+        self._mutex = threading.Lock()  # 同じプロセス内のスレッド同士
+
+    # ── ロック ──
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False):
+        """プロセス間のロック（shared=True は読み込み用の共有ロック。Windows では排他）"""
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        with open(self.lock_path, "a+b") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    @contextmanager
+    def _locked(self):
+        with self._mutex:
+            with self._file_lock():
+                yield
+
+    # ── 読み込み ──
+
+    def _apply(self, op: Dict) -> None:
+        kind = op.get("op")
+        if kind == "put":
+            entry = op["entry"]
+            self._entries[entry["name"]] = entry
+            self._entries.move_to_end(entry["name"])
+        elif kind == "delete":
+            self._entries.pop(op["name"], None)
+        elif kind == "clear":
+            self._entries.clear()
+
+    def _read_journal(self, offset: int) -> None:
+        with open(self.journal_path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        # 書きかけの最終行（改行なし）は次回に回す
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+                self._journal_ops += 1
+        self._journal_offset = offset + end
+
+    def _refresh(self) -> None:
+        """ファイルが変わっていれば読み直す（変わっていなければ stat 2回だけ）"""
+        for _ in range(REFRESH_RETRIES):
+            try:
+                self._reload()
+                return
+            except FileNotFoundError:
+                # stat の後に他のプロセスがまとめ直した → 次は全件読み直す
+                self._snapshot_stamp = self._journal_stamp = None
+        with self._file_lock(shared=True):
+            self._reload()
+
+    def _reload(self) -> None:
+        snapshot_stamp = _stamp(self.path)
+        journal_stamp = _stamp(self.journal_path)
+        if snapshot_stamp == self._snapshot_stamp and journal_stamp == self._journal_stamp:
+            return
+
+        appended = (
+            snapshot_stamp == self._snapshot_stamp
+            and journal_stamp is not None and self._journal_stamp is not None
+            and journal_stamp[0] == self._journal_stamp[0]
+            and journal_stamp[2] >= self._journal_offset
+        )
+        if appended:
+            self._read_journal(self._journal_offset)
+        else:
+            self._entries.clear()
+            self._journal_ops = 0
+            self._journal_offset = 0
+            if snapshot_stamp is not None:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    for entry in reversed(json.load(f)):
+                        self._apply({"op": "put", "entry": entry})
+            if journal_stamp is not None:
+                self._read_journal(0)
+
+        self._snapshot_stamp = snapshot_stamp
+        self._journal_stamp = journal_stamp
+        self._list = list(reversed(self._entries.values()))  # 新しい順
+
+    def list(self) -> List[Dict]:
+        with self._mutex:
+            self._refresh()
+            return list(self._list)
+
+    def get(self, name: str) -> Optional[Dict]:
+        with self._mutex:
+            self._refresh()
+            return self._entries.get(name)
+
+    # ── 書き込み ──
+
+    def _write_snapshot(self, entries: List[Dict]) -> None:
+        """全件を一時ファイルに書いてから置き換え、履歴を空にする"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        # 履歴を消す前に落ちても、同じ操作をもう一度当てるだけなので結果は変わらない
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def _commit(self, op: Dict) -> None:
+        with self._locked():
+            self._refresh()
+            line = (json.dumps(op, ensure_ascii=False) + "\n").encode("utf-8")
+            with open(self.journal_path, "ab") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._refresh()
+            if self._journal_ops >= self.compact_every:
+                self._write_snapshot(self._list)
+                self._refresh()
+
+    def add(self, entry: Dict) -> None:
+        """同じ名前があれば上書きして先頭へ"""
+        self._commit({"op": "put", "entry": entry})
+
+    def delete(self, name: str) -> None:
+        self._commit({"op": "delete", "name": name})
+
+    def clear(self) -> None:
+        self._commit({"op": "clear"})
+
+    def save_all(self, entries: List[Dict]) -> None:
+        with self._locked():
+            self._write_snapshot(entries)
+            self._refresh()
+
+    def compact(self) -> None:
+        with self._locked():
+            self._refresh()
+            self._write_snapshot(self._list)
+            self._refresh()
+
+
+_store = BookmarkStore()
 
 
 def load_bookmarks() -> List[Dict]:
-    if not os.path.exists(BOOKMARKS_FILE):
-        return []
-    with open(BOOKMARKS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return _store.list()
+
+
+def get_bookmark(name: str) -> Optional[Dict]:
+    return _store.get(name)
 
 
 def save_bookmarks(bookmarks: List[Dict]) -> None:
-    with open(BOOKMARKS_FILE, "w", encoding="utf-8") as f:
-        json.dump(bookmarks, f, ensure_ascii=False, indent=2)
+    _store.save_all(bookmarks)
 
 
 def add_bookmark(new_entry: Dict) -> None:
-    bookmarks = load_bookmarks()
-
     # すでに同じ名前が存在する場合は上書き
-    bookmarks = [b for b in bookmarks if b["name"] != new_entry["name"]]
-
-    bookmarks.insert(0, new_entry)  # 新しいものを先頭に
-    if len(bookmarks) > MAX_BOOKMARKS:
-        bookmarks = bookmarks[:MAX_BOOKMARKS]
-    save_bookmarks(bookmarks)
+    _store.add(new_entry)
 
 
 def delete_bookmark(name: str) -> None:
-    bookmarks = load_bookmarks()
-    bookmarks = [b for b in bookmarks if b["name"] != name]
-    save_bookmarks(bookmarks)
+    _store.delete(name)
 
 
 def clear_all_bookmarks() -> None:
-    save_bookmarks([])
+    _store.clear()
@@ -0,0 +1,288 @@
+# === batch.py（NumPy一括DPS計算） ===
+#
+# run_full_dps_calculation と同じ式を配列演算で評価する。
+# 1行 = 1構成（武器, モンスター, 部位, コンボ, スキル）。
+
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from logic.calculation_interface import WEAPON_COEFFICIENT
+from logic.combo import get_compiled_combo
+from logic.sharpness import get_sharpness_bar
+from logic.skill import get_skill_table, sum_skill_effects
+from logic.damage import (
+    PHYSICAL_SHARPNESS_MODIFIERS,
+    ELEMENTAL_SHARPNESS_MODIFIERS,
+    apply_elemental_sharpness,
+    apply_hitzone_modifier,
+    apply_physical_sharpness,
+    calculate_adjusted_element,
+    calculate_elemental_damage,
+    calculate_expected_physical,
+    effective_sharpness_hits,
+    expected_sharpness_consumption
+)
+from utils import loader
+from utils.data_compiler import get_data_index
+
+SkillInput = Dict[str, Tuple[int, float]]
+
+def _broadcast(values, n: int) -> List:
+    """文字列1つなら n 件に複製、配列ならそのままリスト化"""
+    if isinstance(values, str):
+        return [values] * n
+    values = list(values)
+    if len(values) != n:
+        raise ValueError(f"入力長が一致しません: {len(values)} != {n}")
+    return values
+
+
+def encode_skill_inputs(
+    skill_inputs: Sequence[SkillInput],
+    skill_names: Sequence[str]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    [{スキル名: (Lv, 発動率)}, ...] を Lv行列 (N, S) と発動率行列 (N, S) に変換する。
+    skill_names にないスキルは無視（スカラー版でも効果なし）。Lv0 は未装備扱い。
+    """
+    index = {name: i for i, name in enumerate(skill_names)}
+    levels = np.zeros((len(skill_inputs), len(skill_names)), dtype=np.int64)
+    rates = np.zeros((len(skill_inputs), len(skill_names)), dtype=np.float64)
+    for row, skills in enumerate(skill_inputs):
+        for name, (lv, rate) in skills.items():
+            col = index.get(name)
+            if col is not None:
+                levels[row, col] = lv
+                rates[row, col] = rate
+    return levels, rates
+
+
+def _skill_column(name: str, skill_names: Sequence[str], levels: np.ndarray, rates: np.ndarray):
+    if name in skill_names:
+        i = list(skill_names).index(name)
+        return levels[:, i], rates[:, i]
+    n = levels.shape[0]
+    return np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.float64)
+
+
+# ── ベクトル化カーネル（logic/skill.py と同じ式。ダメージ式は logic/damage.py の関数に配列を渡す） ──
+
+# skill_modifiers_kernel が返すスキル補正の合計値
+#   atk_add / affinity / elem_add: 加算（発動率を掛けた和）
+#   atk_mult / elem_mult: 乗算（倍率 ** 発動率 の積）
+#   crit_mult: 超会心の会心倍率, crit_element_bonus: 会心撃【属性】の倍率
+#   sharpness_add: 匠の追加ヒット数, sharpness_save: 業物の消費無効率（×発動率）
+#   crit_sharpness_save: 達人芸の会心時消費無効率（×発動率）
+#   no_sharpness_time: 剛刃研磨の無消費秒数（×発動率）
+MODIFIER_FIELDS = (
+    "atk_add", "atk_mult", "affinity", "elem_add", "elem_mult",
+    "crit_mult", "crit_element_bonus",
+    "sharpness_add", "sharpness_save", "crit_sharpness_save", "no_sharpness_time",
+)
+
+
+def skill_modifiers_kernel(levels, rates, skill_names, skill_defs) -> Dict[str, np.ndarray]:
+    """apply_skill_modifiers と切れ味・会心系スキルの読み取りを配列でまとめて行う"""
+    table = get_skill_table(skill_defs)
+    ids = table.skill_ids(skill_names)
+    # 発動率0のスキルは未装備扱い（utils.memo の正規化と同じ）
+    raw_levels = np.where(np.asarray(rates) > 0, levels, 0)
+    levels = table.clip_levels(raw_levels)
+
+    def single(name, field):
+        lv, rate = _skill_column(name, skill_names, levels, rates)
+        return table.field(field)[table.skill_id(name), lv], rate
+
+    crit_mult, _ = single("超会心", "crit_mult")
+    crit_element_bonus, _ = single("会心撃【属性】", "crit_element_bonus")
+    takumi, takumi_rate = single("匠", "sharpness_add")
+    gouyou, gouyou_rate = single("業物", "sharpness_reduction_prob")
+    # 達人芸は Lv に関係なく Lv1 の確率を使う
+    lv, tatsujin_rate = _skill_column("達人芸", skill_names, raw_levels, rates)
+    tatsujin = table.field("crit_sharpness_reduction_prob")[table.skill_id("達人芸"), np.minimum(lv, 1)]
+    goken, goken_rate = single("剛刃研磨", "no_sharpness_time")
+
+    return {
+        **sum_skill_effects(levels, rates, table, ids),
+        "crit_mult": crit_mult,
+        "crit_element_bonus": crit_element_bonus,
+        "sharpness_add": np.floor(takumi * takumi_rate),
+        "sharpness_save": gouyou * gouyou_rate,
+        "crit_sharpness_save": tatsujin * tatsujin_rate,
+        "no_sharpness_time": goken * goken_rate,
+    }
+
+
+# ── 一括計算本体 ──
+
+def skill_modifiers_for(
+    skill_inputs: Optional[Sequence[SkillInput]] = None,
+    skill_levels: Optional[np.ndarray] = None,
+    skill_rates: Optional[np.ndarray] = None,
+    skill_names: Optional[Sequence[str]] = None
+) -> Dict[str, np.ndarray]:
+    """
+    スキル構成（dict のリスト、または (N, S) の Lv・発動率配列）→ 構成ごとのスキル補正の合計値（長さ N）。
+    skill_names は配列の列順（省略時は skills.json の定義順）。
+    """
+    skill_defs = loader.get_skills()
+    if skill_names is None:
+        skill_names = tuple(skill_defs.keys())
+    if skill_inputs is not None:
+        skill_levels, skill_rates = encode_skill_inputs(skill_inputs, skill_names)
+    if skill_levels is None or skill_rates is None:
+        raise ValueError("skill_inputs か skill_levels/skill_rates のどちらかが必要です")
+    levels = np.asarray(skill_levels, dtype=np.int64)
+    rates = np.asarray(skill_rates, dtype=np.float64)
+    return skill_modifiers_kernel(levels, rates, skill_names, skill_defs)
+
+def prepare_targets(
+    weapon_names: Sequence[str],
+    monster_names: Sequence[str],
+    part_names: Sequence[str],
+    combo_names: Sequence[str]
+) -> Dict[str, np.ndarray]:
+    """武器・肉質・コンボの値を配列に展開する（スキルに依存しない部分）"""
+    weapons = loader.get_weapons()
+    monsters = loader.get_monsters()
+    motions = loader.get_motion_values()
+    combos = loader.get_combos()
+    index = get_data_index()
+    element_column = {name: i for i, name in enumerate(index["element_types"])}
+
+    weapon_rows = [weapons[w] for w in weapon_names]
+    # run_full_dps_calculation と同じく切れ味ゲージの最上位の色で評価する
+    bars = [get_sharpness_bar(w)[0] for w in weapon_rows]
+    sharpness = [colour for colour, _ in bars]
+    parts = [monsters[m]["parts"][p] for m, p in zip(monster_names, part_names)]
+    part_elements = index["part_elements"]
+
+    # コンボ（コンボ名ごとにコンパイル済みの合計値を使う）
+    combo_stats = {}
+    for name in set(combo_names):
+        compiled = get_compiled_combo(combos[name]["moves"], motions)
+        combo_stats[name] = (
+            compiled.motion_sum, compiled.element_motion_sum, index["combo_hits"][name], combos[name]["time"]
+        )
+    mv_sum, elem_mv_sum, hits_per_combo, combo_time = (
+        np.array(col, dtype=np.float64) for col in zip(*(combo_stats[c] for c in combo_names))
+    )
+
+    return {
+        "display_attack": np.array([w["attack"] for w in weapon_rows], dtype=np.float64),
+        "base_affinity": np.array([w["affinity"] for w in weapon_rows], dtype=np.float64),
+        "base_element": np.array([w["element"]["value"] for w in weapon_rows], dtype=np.float64),
+        "phys_sharp": np.array([PHYSICAL_SHARPNESS_MODIFIERS.get(s, 1.0) for s in sharpness]),
+        "elem_sharp": np.array([ELEMENTAL_SHARPNESS_MODIFIERS.get(s, 1.0) for s in sharpness]),
+        "base_hits": np.array(
+            [w.get("sharpness_hits", hits) for w, (_, hits) in zip(weapon_rows, bars)], dtype=np.int64
+        ),
+        "hitzone": np.array([p["physical"] for p in parts], dtype=np.float64),
+        "element_zone": np.array(
+            [
+                part_elements[m][p][element_column[w["element"]["type"]]]
+                for m, p, w in zip(monster_names, part_names, weapon_rows)
+            ],
+            dtype=np.float64
+        ),
+        "motion_sum": mv_sum,
+        "element_motion_sum": elem_mv_sum,
+        "hits_per_combo": hits_per_combo,
+        "combo_time": combo_time,
+    }
+
+
+def evaluate_modifiers(targets: Mapping[str, np.ndarray], mods: Mapping[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    スキル補正の合計値（skill_modifiers_kernel の戻り値と同じ形）から結果を計算する。
+    targets と mods は長さ N または 1（ブロードキャスト）。
+    """
+    base_attack = targets["display_attack"] * WEAPON_COEFFICIENT
+    attack = base_attack * mods["atk_mult"] + mods["atk_add"]
+    affinity = targets["base_affinity"] + mods["affinity"]
+    element = targets["base_element"] * mods["elem_mult"] + mods["elem_add"]
+
+    # 切れ味は色ごとの補正値（配列）で渡す
+    attack = apply_physical_sharpness(attack, targets["phys_sharp"])
+    element = apply_elemental_sharpness(element, targets["elem_sharp"])
+
+    expected_attack = calculate_expected_physical(attack, affinity, mods["crit_mult"])
+
+    element_zone = targets["element_zone"]
+    effective_attack = apply_hitzone_modifier(expected_attack, targets["hitzone"])
+    effective_element = calculate_elemental_damage(element, element_zone)
+
+    # calculate_combo_damage と同じ（期待値化・切れ味・肉質をコンボ側でも適用）
+    total_physical = calculate_expected_physical(effective_attack, affinity) * targets["motion_sum"]
+    total_element = calculate_adjusted_element(
+        effective_element, targets["elem_sharp"], targets["element_motion_sum"], element_zone, affinity, 0
+    ) * mods["crit_element_bonus"]
+
+    combo_time = targets["combo_time"]
+    phys_dps = total_physical / combo_time
+    elem_dps = total_element / combo_time
+    total_dps = phys_dps + elem_dps
+
+    base_hits = targets["base_hits"]
+    effective_hits = effective_sharpness_hits(
+        base_hits + mods["sharpness_add"],
+        expected_sharpness_consumption(affinity, mods["sharpness_save"], mods["crit_sharpness_save"])
+    )
+    hits_per_combo = targets["hits_per_combo"]
+    has_hits = hits_per_combo > 0
+    safe_hits = np.where(has_hits, hits_per_combo, 1.0)
+    avg_hit_damage = np.where(has_hits, (total_physical + total_element) / safe_hits, 0.0)
+    total_damage = avg_hit_damage * effective_hits
+    combo_count = np.where(has_hits, np.floor(effective_hits / safe_hits), 0).astype(np.int64)
+    total_duration = combo_count * combo_time + mods["no_sharpness_time"]
+
+    return {
+        "攻撃力": attack,
+        "会心率": affinity,
+        "属性値": element,
+        "期待値攻撃力": expected_attack,
+        "物理有効値": effective_attack,
+        "属性有効値": effective_element,
+        "物理合計": total_physical,
+        "属性合計": total_element,
+        "コンボ時間": combo_time,
+        "物理DPS": phys_dps,
+        "属性DPS": elem_dps,
+        "DPS": total_dps,
+        "切れ味Hit": base_hits,
+        "実効Hit": effective_hits,
+        "コンボ回数": combo_count,
+        "維持秒数": total_duration,
+        "平均Hitダメージ": avg_hit_damage,
+        "合計ダメージ": total_damage
+    }
+
+
+def run_batch_dps_calculation(
+    weapon_names: Union[str, Sequence[str]],
+    monster_names: Union[str, Sequence[str]],
+    part_names: Union[str, Sequence[str]],
+    combo_names: Union[str, Sequence[str]],
+    skill_inputs: Optional[Sequence[SkillInput]] = None,
+    skill_levels: Optional[np.ndarray] = None,
+    skill_rates: Optional[np.ndarray] = None,
+    skill_names: Optional[Sequence[str]] = None
+) -> Dict[str, np.ndarray]:
+    """
+    複数構成のDPSを一括計算する。
+    スキルは skill_inputs（dictのリスト）か、skill_levels / skill_rates（(N, S) 配列）で渡す。
+    skill_names は配列の列順（省略時は skills.json の定義順）。
+    名前の引数は文字列1つを渡すと全行に複製される。
+    戻り値のキーは run_full_dps_calculation の結果キーと同じ（値は長さ N の配列）。
+    """
+    mods = skill_modifiers_for(skill_inputs, skill_levels, skill_rates, skill_names)
+    n = len(mods["atk_add"])
+
+    targets = prepare_targets(
+        _broadcast(weapon_names, n),
+        _broadcast(monster_names, n),
+        _broadcast(part_names, n),
+        _broadcast(combo_names, n)
+    )
+    return evaluate_modifiers(targets, mods)
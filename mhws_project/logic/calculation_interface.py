@@ -1,139 +1,467 @@
 # === calculation_interface.py（剛刃研磨対応） ===
 
-import os
-import json
 import math
-from logic.skill import apply_skill_modifiers
+import operator
+import threading
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Hashable, Mapping, Tuple
+
+from logic.skill import apply_skill_modifiers, get_crit_multiplier_from_skill, get_crit_element_bonus
 from logic.damage import (
     apply_physical_sharpness,
     apply_elemental_sharpness,
     calculate_expected_physical,
     apply_hitzone_modifier,
-    calculate_elemental_damage
+    calculate_elemental_damage,
+    calculate_adjusted_element,
+    effective_sharpness_hits,
+    expected_sharpness_consumption
 )
-from logic.combo import calculate_combo_damage, calculate_dps
-from utils.result_logger import log_result_to_csv, log_result_to_csv_readable
-
-# def estimate_effective_sharpness_hits(base_hits, affinity, skills, skills_json):
-#     if "匠" in skills:
-#         lv, rate = skills["匠"]
-#         skill_def = skills_json.get("匠", {}).get(f"Lv{lv}", {})
-#         bonus = skill_def.get("sharpness_add", 0)
-#         base_hits += int(bonus * rate)
-
-#     if "業物" in skills:
-#         lv, rate = skills["業物"]
-#         skill_def = skills_json.get("業物", {}).get(f"Lv{lv}", {})
-#         prob = skill_def.get("sharpness_reduction_prob", 0.0)
-#         base_hits *= (1 + prob * rate)
-
-#     if "達人芸" in skills:
-#         _, rate = skills["達人芸"]
-#         skill_def = skills_json.get("達人芸", {}).get("Lv1", {})
-#         prob = skill_def.get("crit_sharpness_reduction_prob", 0.0)
-#         crit = max(min(affinity, 100), 0) / 100
-#         base_hits *= (1 + prob * crit * rate)
-
-#     return int(base_hits)
-def estimate_effective_sharpness_hits(base_hits, affinity, skills, skills_json):
-    sharpness_consumption = 1.0  # 初期化を忘れずに
-
-    # 匠：切れ味ゲージ自体が伸びる
-    if "匠" in skills:
-        lv, rate = skills["匠"]
-        skill_def = skills_json.get("匠", {}).get(f"Lv{lv}", {})
-        bonus = skill_def.get("sharpness_add", 0)
-        base_hits += int(bonus * rate)
+from logic.combo import calculate_combo_damage, get_compiled_combo, iter_combo_hits
+from logic.sharpness import get_sharpness_bar, build_sharpness_timeline
+from utils import loader, profiling, trace
+from utils.data_compiler import get_data_index
+from utils.memo import get_result_cache, normalize_skills
+from utils.result_logger import get_default_sink
+
+WEAPON_COEFFICIENT = 1.4  # 表示攻撃力 → 内部攻撃力（片手剣）
+
+# 切れ味の持続に効くスキル（切れ味ヒット推定・タイムラインの段階はこれだけをキーにする）
+SHARPNESS_SKILLS = ("匠", "業物", "達人芸", "剛刃研磨")
+
+
+# ── 段階ごとのメモ化 ──
+# 計算は スキル補正 → 切れ味補正 → 会心期待値 → 肉質補正 → コンボダメージ → 切れ味持続 の順につながっている。
+# 重い段階は「その段階の入力だけ」をキーに結果を覚えておくので、部位だけ変えたときはスキル補正を、
+# スキルだけ変えたときはコンパイル済みコンボ（logic/combo.py）と切れ味の段階を使い回せる。
+# 段階の中で読むゲームデータ（skills.json / motion_values.json）は読み取り専用ビューのときだけ対象にし、
+# ビューが読み直されたら（別オブジェクトになったら）全部捨てる。
+
+class _Uncached:
+    """メモ化しないとき（ビューでないデータを渡されたとき）用"""
+
+    def get(self, stage: str, key: Hashable, compute: Callable[[], Any]) -> Any:
+        return compute()
+
+
+class StageCache(_Uncached):
+    # 読み込みはロックなしの dict 参照（GIL 下で安全。競合しても同じ値を2回計算するだけ）
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize  # 段階ごとの上限件数（超えたら古いものから捨てる）
+        self._entries: Dict[str, Dict[Hashable, Any]] = {}
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+        self._sources: Tuple[Mapping, ...] = ()
+        self._lock = threading.Lock()
+
+    def bound(self, *sources: Mapping) -> _Uncached:
+        """sources（段階の中で読むデータ）に対して使えるキャッシュを返す"""
+        current = self._sources
+        if len(sources) == len(current) and all(map(operator.is_, sources, current)):
+            return self
+        if not all(isinstance(source, MappingProxyType) for source in sources):
+            return _UNCACHED
+        with self._lock:
+            self._entries = {}
+            self._sources = sources
+        return self
+
+    def get(self, stage: str, key: Hashable, compute: Callable[[], Any]) -> Any:
+        entries = self._entries.get(stage)
+        if entries is not None:
+            value = entries.get(key, _MISSING)
+            if value is not _MISSING:
+                self._hits[stage] = self._hits.get(stage, 0) + 1
+                return value
+        self._misses[stage] = self._misses.get(stage, 0) + 1
+        value = compute()
+        with self._lock:
+            entries = self._entries.setdefault(stage, {})
+            entries[key] = value
+            if len(entries) > self.maxsize:
+                del entries[next(iter(entries))]
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = {}
+            self._hits.clear()
+            self._misses.clear()
+            self._sources = ()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            stage: {
+                "hits": self._hits.get(stage, 0),
+                "misses": self._misses.get(stage, 0),
+                "size": len(self._entries.get(stage, ())),
+            }
+            for stage in sorted(set(self._hits) | set(self._misses))
+        }
+
+
+_MISSING = object()
+_UNCACHED = _Uncached()
+_stage_cache = StageCache()
+
+
+def get_stage_cache() -> StageCache:
+    return _stage_cache
+
+
+def _skills_key(skill_input: Mapping[str, Tuple[int, float]], names=None) -> tuple:
+    """スキル指定 → 段階キー（names を指定するとそのスキルだけ）"""
+    if names is None:
+        return tuple((name, lv, rate) for name, (lv, rate) in skill_input.items())
+    return tuple(skill_input.get(name) for name in names)
+
+def get_takumi_bonus(skills, skills_json):
+    """匠：切れ味ゲージ自体が伸びる（追加ヒット数）"""
+    if "匠" not in skills:
+        return 0
+    lv, rate = skills["匠"]
+    skill_def = skills_json.get("匠", {}).get(f"Lv{lv}", {})
+    bonus = skill_def.get("sharpness_add", 0)
+    return int(bonus * rate)
+
+def estimate_sharpness_consumption(affinity, skills, skills_json):
+    """1ヒットあたりの期待切れ味消費（業物・達人芸で 1 未満になる）"""
+    save_prob = crit_save_prob = 0.0
 
     # 業物：常時確率で消費無効
     if "業物" in skills:
         lv, rate = skills["業物"]
         skill_def = skills_json.get("業物", {}).get(f"Lv{lv}", {})
-        prob = skill_def.get("sharpness_reduction_prob", 0.0)
-        sharpness_consumption *= (1 - prob * rate)
+        save_prob = skill_def.get("sharpness_reduction_prob", 0.0) * rate
 
     # 達人芸：会心時のみ確率で消費無効
     if "達人芸" in skills:
         _, rate = skills["達人芸"]
         skill_def = skills_json.get("達人芸", {}).get("Lv1", {})
-        prob = skill_def.get("crit_sharpness_reduction_prob", 0.0)
-        crit = max(min(affinity, 100), 0) / 100
-        sharpness_consumption *= (1 - prob * crit * rate)
-
-    if sharpness_consumption <= 0:
-        sharpness_consumption = 0.01  # 安全策：ゼロ除算回避
-
-    return int(base_hits / sharpness_consumption)
-
-def run_full_dps_calculation(weapon_name, monster_name, part_name, combo_name, skill_input):
-    BASE_DIR = os.path.dirname(__file__)
-    DATA_DIR = os.path.join(BASE_DIR, "..", "data")
-
-    def load_json(name):
-        with open(os.path.join(DATA_DIR, name), "r", encoding="utf-8") as f:
-            return json.load(f)
-
-    skills_json = load_json("skills.json")
-    weapons = load_json("weapons.json")
-    monsters = load_json("monsters.json")
-    motions = load_json("motion_values.json")
-    combos = load_json("combos.json")
-
-    weapon = weapons[weapon_name]
-    monster = monsters[monster_name]
-
-    DISPLAY_ATTACK = weapon["attack"]
-    WEAPON_COEFFICIENT = 1.4
-    base_attack = DISPLAY_ATTACK * WEAPON_COEFFICIENT
-
-    attack, affinity, element = apply_skill_modifiers(
-        base_attack=base_attack,
-        base_affinity=weapon["affinity"],
-        base_element=weapon["element"]["value"],
-        skills=skill_input,
-        skill_defs=skills_json
-    )
-
-    sharpness = weapon.get("sharpness", "白")
-    attack = apply_physical_sharpness(attack, sharpness)
-    element = apply_elemental_sharpness(element, sharpness)
-
-    from logic.skill import get_crit_multiplier_from_skill
-
-    crit_lv = skill_input.get("超会心", (0, 0.0))[0]
-    crit_mult = get_crit_multiplier_from_skill("超会心", crit_lv)
+        crit_save_prob = skill_def.get("crit_sharpness_reduction_prob", 0.0) * rate
 
-    expected_attack = calculate_expected_physical(attack, affinity, crit_mult)
-
-    hitzone = monster["parts"][part_name]["physical"]
-    element_zone = monster["parts"][part_name]["element"].get(weapon["element"]["type"], 0)
-
-    effective_attack = apply_hitzone_modifier(expected_attack, hitzone)
-    effective_element = calculate_elemental_damage(element, element_zone)
-
-    combo = combos[combo_name]
-    combo_moves = combo["moves"]
-    combo_time = combo["time"]
+    return expected_sharpness_consumption(affinity, save_prob, crit_save_prob)
 
+def estimate_effective_sharpness_hits(base_hits, affinity, skills, skills_json):
+    base_hits += get_takumi_bonus(skills, skills_json)
+    return effective_sharpness_hits(base_hits, estimate_sharpness_consumption(affinity, skills, skills_json))
+
+def get_no_sharpness_time(skills, skills_json):
+    """剛刃研磨の無消費時間（秒）"""
+    if "剛刃研磨" not in skills:
+        return 0
+    lv, rate = skills["剛刃研磨"]
+    def_ = skills_json.get("剛刃研磨", {}).get(f"Lv{lv}", {})
+    return def_.get("no_sharpness_time", 0) * rate
+
+def _combo_totals(combo_moves, motions, effective_attack, effective_element, sharpness,
+                  element_zone, affinity, crit_element_lv, skills_json):
     total_physical, total_element = calculate_combo_damage(
         combo_moves, motions, effective_attack, effective_element,
         sharpness=sharpness,
         element_zone=element_zone,
         affinity=affinity,
-        crit_element_lv=skill_input.get("会心撃【属性】", (0, 0.0))[0]
+        crit_element_lv=crit_element_lv
     )
-    from logic.skill import get_crit_element_bonus
     # トータル属性補正として「会心撃【属性】」を適用
+    total_element *= get_crit_element_bonus("会心撃【属性】", crit_element_lv, skills_json)
+    return total_physical, total_element
+
+def trace_cycle_hits(weapon, part, combo_moves, motions, skill_input, skills_json, sharpness, stats, weights=None):
+    """
+    calculate_cycle_damage の結果（stats）をヒットごとの (技, ヒット番号, MV, 属性MV, 物理, 属性) に分ける。
+    コンボダメージはモーション値に線形なので、_combo_totals と同じ式を1ヒットのモーション値で評価すればよい
+    （合計は stats の 物理合計 / 属性合計 と一致する）。
+    weights を渡すと part は部位のリスト、stats は calculate_cycle_damage_parts の結果として、部位の重みで混ぜる。
+    """
+    affinity = stats["会心率"]
     crit_element_lv = skill_input.get("会心撃【属性】", (0, 0.0))[0]
-    total_element *= get_crit_element_bonus("会心撃【属性】", crit_element_lv)
+    if weights is None:
+        element_zone = part["element"].get(weapon["element"]["type"], 0)
+        effective = stats
+    else:
+        element_zone = stats["部位別"]["肉質（属性）"]
+        effective = stats["部位別"]
+    physical_per_mv = calculate_expected_physical(effective["物理有効値"], affinity)
+    element_per_mv = calculate_adjusted_element(
+        effective["属性有効値"], sharpness, 1.0, element_zone, affinity, crit_element_lv
+    ) * get_crit_element_bonus("会心撃【属性】", crit_element_lv, skills_json)
+    if weights is not None:
+        physical_per_mv = sum(w * float(x) for w, x in zip(weights, physical_per_mv))
+        element_per_mv = sum(w * float(x) for w, x in zip(weights, element_per_mv))
+    return [
+        (move, hit, mv, emv, physical_per_mv * mv, element_per_mv * emv)
+        for move, hit, mv, emv in iter_combo_hits(combo_moves, motions)
+    ]
+
+def _weapon_stats(weapon, skill_input, skills_json, sharpness, stages):
+    """部位によらない段階（スキル補正 → 切れ味補正 → 会心期待値）。(攻撃力, 会心率, 属性値, 期待値攻撃力) を返す"""
+    base_attack = weapon["attack"] * WEAPON_COEFFICIENT
+    base_affinity = weapon["affinity"]
+    base_element = weapon["element"]["value"]
+
+    with profiling.stage("スキル補正"):
+        attack, affinity, element = stages.get(
+            "スキル補正",
+            (base_attack, base_affinity, base_element, _skills_key(skill_input)),
+            lambda: apply_skill_modifiers(
+                base_attack=base_attack,
+                base_affinity=base_affinity,
+                base_element=base_element,
+                skills=skill_input,
+                skill_defs=skills_json
+            )
+        )
+
+    with profiling.stage("切れ味補正"):
+        attack = apply_physical_sharpness(attack, sharpness)
+        element = apply_elemental_sharpness(element, sharpness)
+
+    with profiling.stage("会心期待値"):
+        crit_lv = skill_input.get("超会心", (0, 0.0))[0]
+        expected_attack = stages.get(
+            "会心期待値",
+            (attack, affinity, crit_lv),
+            lambda: calculate_expected_physical(
+                attack, affinity, get_crit_multiplier_from_skill("超会心", crit_lv, skills_json)
+            )
+        )
+
+    return attack, affinity, element, expected_attack
+
+def calculate_cycle_damage(weapon, part, combo_moves, motions, skill_input, skills_json, sharpness):
+    """
+    切れ味の色を指定して、コンボ1周分の期待ダメージを計算する。
+    戻り値: 補正後ステータスと 物理合計 / 属性合計 の dict
+    """
+    stages = _stage_cache.bound(skills_json, motions)
+    attack, affinity, element, expected_attack = _weapon_stats(weapon, skill_input, skills_json, sharpness, stages)
+
+    with profiling.stage("肉質補正"):
+        hitzone = part["physical"]
+        element_zone = part["element"].get(weapon["element"]["type"], 0)
+
+        effective_attack = apply_hitzone_modifier(expected_attack, hitzone)
+        effective_element = calculate_elemental_damage(element, element_zone)
+
+    with profiling.stage("コンボダメージ"):
+        crit_element_lv = skill_input.get("会心撃【属性】", (0, 0.0))[0]
+        total_physical, total_element = stages.get(
+            "コンボダメージ",
+            (tuple(combo_moves), effective_attack, effective_element, sharpness, element_zone, affinity, crit_element_lv),
+            lambda: _combo_totals(
+                combo_moves, motions, effective_attack, effective_element, sharpness,
+                element_zone, affinity, crit_element_lv, skills_json
+            )
+        )
+
+    return {
+        "攻撃力": attack,
+        "会心率": affinity,
+        "属性値": element,
+        "期待値攻撃力": expected_attack,
+        "物理有効値": effective_attack,
+        "属性有効値": effective_element,
+        "物理合計": total_physical,
+        "属性合計": total_element,
+    }
+
+def calculate_cycle_damage_parts(weapon, parts, weights, combo_moves, motions, skill_input, skills_json, sharpness):
+    """
+    複数部位に重み weights（合計1）で当てたときのコンボ1周分の期待ダメージ。
+    部位によらない段階は1回だけ計算し、肉質補正とコンボダメージは部位ごとの肉質を配列に並べて全部位まとめて計算、
+    重みとの内積で混ぜる。戻り値は calculate_cycle_damage と同じキー（有効値・合計は重み付き平均）に加えて
+    "部位別": {"肉質（物理）", "肉質（属性）", "物理有効値", "属性有効値", "物理合計", "属性合計"}（部位順の配列）。
+    """
+    import numpy as np  # 複数部位のときだけ読み込む（起動時間対策）
+
+    stages = _stage_cache.bound(skills_json, motions)
+    attack, affinity, element, expected_attack = _weapon_stats(weapon, skill_input, skills_json, sharpness, stages)
+
+    with profiling.stage("肉質補正"):
+        hitzone = np.array([part["physical"] for part in parts], dtype=np.float64)
+        element_zone = np.array([part["element"].get(weapon["element"]["type"], 0) for part in parts], dtype=np.float64)
+
+        effective_attack = apply_hitzone_modifier(expected_attack, hitzone)
+        effective_element = calculate_elemental_damage(element, element_zone)
+
+    with profiling.stage("コンボダメージ"):
+        crit_element_lv = skill_input.get("会心撃【属性】", (0, 0.0))[0]
+        total_physical, total_element = _combo_totals(
+            combo_moves, motions, effective_attack, effective_element, sharpness,
+            element_zone, affinity, crit_element_lv, skills_json
+        )
+
+    weights = np.asarray(weights, dtype=np.float64)
+    return {
+        "攻撃力": attack,
+        "会心率": affinity,
+        "属性値": element,
+        "期待値攻撃力": expected_attack,
+        "物理有効値": float(weights @ effective_attack),
+        "属性有効値": float(weights @ effective_element),
+        "物理合計": float(weights @ total_physical),
+        "属性合計": float(weights @ total_element),
+        "部位別": {
+            "肉質（物理）": hitzone,
+            "肉質（属性）": element_zone,
+            "物理有効値": effective_attack,
+            "属性有効値": effective_element,
+            "物理合計": total_physical,
+            "属性合計": total_element,
+        },
+    }
+
+def _cycle_stats(weapon, part, combo_moves, motions, skill_input, skills_json, sharpness, weights=None):
+    """weights がなければ1部位（part）、あれば部位のリスト（part）を重みで混ぜたコンボ1周分"""
+    if weights is None:
+        return calculate_cycle_damage(weapon, part, combo_moves, motions, skill_input, skills_json, sharpness)
+    return calculate_cycle_damage_parts(weapon, part, weights, combo_moves, motions, skill_input, skills_json, sharpness)
+
+def build_timeline_for(weapon, part, combo, motions, skill_input, skills_json, fight_time=None, weights=None):
+    """
+    武器の切れ味ゲージ全体について、色ごとのコンボ1周ダメージからタイムラインを作る。
+    weights を渡すと part は部位のリストで、部位の重みで混ぜたダメージで評価する。
+    """
+    bar = get_sharpness_bar(weapon)
+    cycle_damage = {}
+    affinity = None
+    for colour, _ in bar:
+        stats = _cycle_stats(weapon, part, combo["moves"], motions, skill_input, skills_json, colour, weights)
+        cycle_damage[colour] = (stats["物理合計"], stats["属性合計"])
+        affinity = stats["会心率"]
+    hits_per_combo = get_compiled_combo(combo["moves"], motions).hits
+    key = (
+        tuple(bar), tuple(cycle_damage.items()), hits_per_combo, combo["time"], affinity,
+        _skills_key(skill_input, SHARPNESS_SKILLS), fight_time
+    )
+    return _stage_cache.bound(skills_json, motions).get("切れ味タイムライン", key, lambda: build_sharpness_timeline(
+        bar, cycle_damage,
+        hits_per_combo=hits_per_combo,
+        combo_time=combo["time"],
+        consumption=estimate_sharpness_consumption(affinity, skill_input, skills_json),
+        takumi_bonus=get_takumi_bonus(skill_input, skills_json),
+        no_consumption_time=get_no_sharpness_time(skill_input, skills_json),
+        fight_time=fight_time
+    ))
+
+def normalize_part_weights(monster_name: str, part_weights: Mapping[str, float]) -> Dict[str, float]:
+    """{部位: 重み} を合計1に正規化する（重み0以下の部位は除く。並びは指定順）"""
+    parts = loader.get_monsters()[monster_name]["parts"]
+    weights = {}
+    for part, weight in part_weights.items():
+        if part not in parts:
+            raise KeyError(f"部位「{monster_name} / {part}」がありません")
+        if weight > 0:
+            weights[part] = float(weight)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("部位の重みがすべて0です")
+    return {part: weight / total for part, weight in weights.items()}
+
+def format_part_weights(part_weights: Mapping[str, float]) -> str:
+    """{"頭": 0.6, "脚": 0.4} → "頭60%/脚40%"（ログ・表示用の部位名）"""
+    return "/".join(f"{part}{weight * 100:.0f}%" for part, weight in part_weights.items())
+
+def _part_breakdown(part_weights, by_part, combo_time) -> list:
+    """部位ごとの DPS（その部位だけに当て続けた場合）と、混ぜた DPS への寄与"""
+    rows = []
+    for i, (part, weight) in enumerate(part_weights.items()):
+        physical = float(by_part["物理合計"][i])
+        element = float(by_part["属性合計"][i])
+        dps = (physical + element) / combo_time
+        rows.append({
+            "部位": part,
+            "重み": weight,
+            "肉質（物理）": float(by_part["肉質（物理）"][i]),
+            "肉質（属性）": float(by_part["肉質（属性）"][i]),
+            "物理DPS": physical / combo_time,
+            "属性DPS": element / combo_time,
+            "DPS": dps,
+            "寄与DPS": dps * weight,
+        })
+    return rows
+
+def _check_name(index: Mapping[str, Any], kind: str, label: str, name: str) -> None:
+    if name not in index["ids"][kind]:
+        raise KeyError(f"{label}「{name}」がありません")
+
+def compute_dps(weapon_name, monster_name, part_name, combo_name, skill_input, fight_time=None):
+    """
+    DPS計算本体（ファイル書き込みなどの副作用なし）。
+    fight_time: 切れ味タイムラインを打ち切る秒数（省略時はゲージを使い切るまで）
+    スキルは Lv0・発動率0 を除いて計算する（結果キャッシュ・一括計算と同じ扱い。結果の "スキル" は指定のまま）
+    """
+    requested_skills = skill_input
+    skill_input = normalize_skills(skill_input)
+
+    # プロセス共有キャッシュから取得（ファイル更新時のみ再パース）
+    with profiling.stage("データ読み込み"):
+        skills_json = loader.get_skills()
+        weapons = loader.get_weapons()
+        monsters = loader.get_monsters()
+        motions = loader.get_motion_values()
+        combos = loader.get_combos()
+        # 検証済みのインデックス（データ更新後の初回だけ検証する。不正なデータは DataError）
+        index = get_data_index()
+
+    _check_name(index, "weapons", "武器", weapon_name)
+    _check_name(index, "monsters", "モンスター", monster_name)
+    _check_name(index, "combos", "コンボ", combo_name)
+
+    weapon = weapons[weapon_name]
+    if isinstance(part_name, str):
+        if part_name not in index["part_elements"][monster_name]:
+            raise KeyError(f"部位「{monster_name} / {part_name}」がありません")
+        part_weights = None
+        part = monsters[monster_name]["parts"][part_name]
+        weights = None
+    else:
+        part_weights = normalize_part_weights(monster_name, part_name)
+        part = [monsters[monster_name]["parts"][name] for name in part_weights]
+        weights = tuple(part_weights.values())
+    combo = combos[combo_name]
+    combo_moves = combo["moves"]
+    combo_time = combo["time"]
+
+    # 切れ味は最上位の色で評価（ゲージ全体はタイムラインで評価）
+    bar = get_sharpness_bar(weapon)
+    sharpness = bar[0][0]
+    stats = _cycle_stats(weapon, part, combo_moves, motions, skill_input, skills_json, sharpness, weights)
+    part_label = part_name if part_weights is None else format_part_weights(part_weights)
+    tracer = trace.current()
+    if tracer is not None:
+        tracer.record(
+            {
+                "武器": weapon_name, "モンスター": monster_name, "部位": part_label, "コンボ": combo_name,
+                "切れ味": sharpness, "物理合計": stats["物理合計"], "属性合計": stats["属性合計"],
+            },
+            trace_cycle_hits(
+                weapon, part, combo_moves, motions, skill_input, skills_json, sharpness, stats,
+                weights
+            )
+        )
+    attack = stats["攻撃力"]
+    affinity = stats["会心率"]
+    element = stats["属性値"]
+    expected_attack = stats["期待値攻撃力"]
+    effective_attack = stats["物理有効値"]
+    effective_element = stats["属性有効値"]
+    total_physical = stats["物理合計"]
+    total_element = stats["属性合計"]
 
     phys_dps = total_physical / combo_time
     elem_dps = total_element / combo_time
     total_dps = phys_dps + elem_dps
 
-    base_hits = weapon.get("sharpness_hits", 999)
-    hits_per_combo = sum(len(motions.get(move, {}).get("motion", [1.0])) for move in combo_moves)
-    effective_hits = estimate_effective_sharpness_hits(base_hits, affinity, skill_input, skills_json)
+    with profiling.stage("切れ味ヒット推定"):
+        base_hits = weapon.get("sharpness_hits", bar[0][1])
+        hits_per_combo = index["combo_hits"][combo_name]
+        effective_hits = _stage_cache.bound(skills_json, motions).get(
+            "切れ味ヒット推定",
+            (base_hits, affinity, _skills_key(skill_input, SHARPNESS_SKILLS)),
+            lambda: estimate_effective_sharpness_hits(base_hits, affinity, skill_input, skills_json)
+        )
     # 平均ヒットあたりダメージと切れ味尽きるまでの総ダメージ
     if hits_per_combo:
         avg_hit_damage = (total_physical + total_element) / hits_per_combo
@@ -145,18 +473,20 @@ def run_full_dps_calculation(weapon_name, monster_name, part_name, combo_name, s
     total_duration = combo_count * combo_time
 
     # 剛刃研磨の無消費時間を追加
-    if "剛刃研磨" in skill_input:
-        lv, rate = skill_input["剛刃研磨"]
-        def_ = skills_json.get("剛刃研磨", {}).get(f"Lv{lv}", {})
-        goken_duration = def_.get("no_sharpness_time", 0) * rate
-        total_duration += goken_duration
+    total_duration += get_no_sharpness_time(skill_input, skills_json)
+
+    # ゲージ全体（色が落ちていく）のタイムライン
+    timeline = None
+    if hits_per_combo:
+        with profiling.stage("切れ味タイムライン"):
+            timeline = build_timeline_for(weapon, part, combo, motions, skill_input, skills_json, fight_time, weights)
 
     result = {
         "武器": weapon_name,
         "モンスター": monster_name,
-        "部位": part_name,
+        "部位": part_label,
         "切れ味": sharpness,
-        "スキル": skill_input,
+        "スキル": requested_skills,
         "コンボ": combo_name,
         "攻撃力": attack,
         "会心率": affinity,
@@ -175,58 +505,33 @@ def run_full_dps_calculation(weapon_name, monster_name, part_name, combo_name, s
         "コンボ回数": combo_count,
         "維持秒数": total_duration,
         "平均Hitダメージ": avg_hit_damage,
-        "合計ダメージ": total_damage_until_sharpness_break
+        "合計ダメージ": total_damage_until_sharpness_break,
+        "切れ味タイムライン": timeline
     }
+    if part_weights is not None:
+        result["部位重み"] = part_weights
+        result["部位内訳"] = _part_breakdown(part_weights, stats["部位別"], combo_time)
 
-    # os.makedirs("results", exist_ok=True)
-    RESULTS_DIR = os.path.join(BASE_DIR, "..", "results")
-    os.makedirs(RESULTS_DIR, exist_ok=True)
-    log_result_to_csv(
-        filepath=os.path.join(RESULTS_DIR, "dps_log.csv"),
-        weapon=weapon_name,
-        monster=monster_name,
-        part=part_name,
-        sharpness=sharpness,
-        skills=skill_input,
-        combo_name=combo_name,
-        attack=attack,
-        affinity=affinity,
-        element=element,
-        expected_attack=expected_attack,
-        effective_attack=effective_attack,
-        effective_element=effective_element,
-        total_physical=total_physical,
-        total_element=total_element,
-        combo_time=combo_time,
-        dps=total_dps,
-        base_hits=base_hits,
-        effective_hits=effective_hits,
-        combo_count=combo_count,
-        duration=total_duration
-    )
-
-    log_result_to_csv_readable(
-        filepath=os.path.join(RESULTS_DIR, "dps_log_readable.csv"),
-        weapon=weapon_name,
-        monster=monster_name,
-        part=part_name,
-        sharpness=sharpness,
-        skills=skill_input,
-        combo_name=combo_name,
-        attack=attack,
-        affinity=affinity,
-        element=element,
-        expected_attack=expected_attack,
-        effective_attack=effective_attack,
-        effective_element=effective_element,
-        total_physical=total_physical,
-        total_element=total_element,
-        combo_time=combo_time,
-        dps=total_dps,
-        base_hits=base_hits,
-        effective_hits=effective_hits,
-        combo_count=combo_count,
-        duration=total_duration
-    )
+    return result
 
+def run_full_dps_calculation(weapon_name, monster_name, part_name, combo_name, skill_input, fight_time=None, sink=None, cache=None):
+    """
+    compute_dps の結果を sink に渡して返す。
+    sink 省略時は results/history.sqlite3 の履歴（バックグラウンドでまとめて書き出す）。
+    ログ不要なら NullSink() を渡すか compute_dps を直接使う。
+    cache 省略時はプロセス共通の結果キャッシュ（utils.memo）を使う。
+    内訳を記録しているコンテキスト（utils.trace）では毎回計算し直す（キャッシュから返すと記録が残らないため）。
+    """
+    with profiling.stage("DPS計算（全体）"):
+        if trace.is_enabled():
+            cached = compute_dps(weapon_name, monster_name, part_name, combo_name, skill_input, fight_time)
+        else:
+            cached = (cache or get_result_cache()).get_or_compute(
+                weapon_name, monster_name, part_name, combo_name, skill_input, compute_dps, fight_time
+            )
+    # キャッシュ内の dict は共有なのでコピーし、スキルは呼び出し元の指定を返す
+    result = dict(cached)
+    result["スキル"] = skill_input
+    with profiling.stage("ログ送信"):
+        (sink or get_default_sink()).submit(result)
     return result
@@ -1,6 +1,98 @@
-from typing import List, Dict, Tuple  
+from types import MappingProxyType
+from typing import Dict, Iterator, List, Mapping, NamedTuple, Sequence, Tuple
 from logic.damage import calculate_adjusted_element, calculate_expected_physical
 
+DEFAULT_ELEMENT_MOTION = 0.3  # element 配列が足りないヒットの属性倍率
+
+
+class CompiledMove(NamedTuple):
+    name: str
+    motion_sum: float
+    element_motion_sum: float
+    hits: int
+
+
+class CompiledCombo(NamedTuple):
+    """
+    コンボをモーション値の合計に畳み込んだもの。
+    ダメージはモーション値に線形なので、合計値だけで1コンボ分を計算できる。
+    """
+    moves: Tuple[CompiledMove, ...]  # motion_values.json にある技のみ
+    motion_sum: float                # 物理モーション値の合計
+    element_motion_sum: float        # 属性モーション値の合計
+    hits: int                        # 切れ味消費ヒット数（未定義の技は1ヒット扱い）
+
+
+def compile_combo(combo_moves: Sequence[str], motion_values: Mapping[str, Mapping]) -> CompiledCombo:
+    moves = []
+    hits = 0
+    for move in combo_moves:
+        hits += len(motion_values.get(move, {}).get("motion", [1.0]))
+        if move not in motion_values:
+            continue
+        data = motion_values[move]
+        motion_list = data.get("motion", [])
+        element_list = data.get("element", [DEFAULT_ELEMENT_MOTION] * len(motion_list))
+        element_sum = 0.0
+        for i in range(len(motion_list)):
+            element_sum += element_list[i] if i < len(element_list) else DEFAULT_ELEMENT_MOTION
+        moves.append(CompiledMove(move, float(sum(motion_list)), element_sum, len(motion_list)))
+
+    return CompiledCombo(
+        moves=tuple(moves),
+        motion_sum=sum(m.motion_sum for m in moves),
+        element_motion_sum=sum(m.element_motion_sum for m in moves),
+        hits=hits
+    )
+
+
+def iter_combo_hits(combo_moves: Sequence[str], motion_values: Mapping[str, Mapping]) -> Iterator[Tuple[str, int, float, float]]:
+    """
+    コンボを1ヒットずつ (技名, 技内のヒット番号, 物理モーション値, 属性モーション値) で返す。
+    motion_values.json にない技（motion のない技）は切れ味だけ消費する1ヒット（0, 0）として数える。
+    """
+    for move in combo_moves:
+        data = motion_values.get(move)
+        if data is None or "motion" not in data:
+            yield move, 0, 0.0, 0.0
+            continue
+        motion_list = data["motion"]
+        element_list = data.get("element", [DEFAULT_ELEMENT_MOTION] * len(motion_list))
+        for i, mv in enumerate(motion_list):
+            yield move, i, mv, element_list[i] if i < len(element_list) else DEFAULT_ELEMENT_MOTION
+
+
+def expand_combo_hits(combo_moves: Sequence[str], motion_values: Mapping[str, Mapping]) -> Tuple[List[float], List[float]]:
+    """コンボを1ヒットずつの (物理モーション値, 属性モーション値) に展開する"""
+    motion = []
+    element = []
+    for _, _, mv, emv in iter_combo_hits(combo_moves, motion_values):
+        motion.append(mv)
+        element.append(emv)
+    return motion, element
+
+
+# (技リスト, motion_values) → CompiledCombo
+# 読み取り専用ビュー（utils.loader）のときだけキャッシュする。
+# ビューは再読み込み時に別オブジェクトになるので、参照を保持して同一性で判定する。
+_compiled_cache: Dict[Tuple[str, ...], CompiledCombo] = {}
+_compiled_source: List[Mapping] = []
+
+
+def get_compiled_combo(combo_moves: Sequence[str], motion_values: Mapping[str, Mapping]) -> CompiledCombo:
+    if not isinstance(motion_values, MappingProxyType):
+        return compile_combo(combo_moves, motion_values)
+    if not _compiled_source or _compiled_source[0] is not motion_values:
+        _compiled_cache.clear()
+        _compiled_source[:] = [motion_values]
+    key = tuple(combo_moves)
+    compiled = _compiled_cache.get(key)
+    if compiled is None:
+        compiled = compile_combo(combo_moves, motion_values)
+        _compiled_cache[key] = compiled
+    return compiled
+
+
 def calculate_combo_damage(
     combo_moves: List[str],
     motion_values: Dict[str, Dict],
@@ -11,29 +103,19 @@ def calculate_combo_damage(
     affinity: float = 0.0,
     crit_element_lv: int = 0
 ) -> Tuple[float, float]:
-    total_physical = 0.0
-    total_element = 0.0
+    compiled = get_compiled_combo(combo_moves, motion_values)
 
     expected_attack = calculate_expected_physical(attack, affinity)
-
-    for move in combo_moves:
-        if move not in motion_values:
-            continue
-        data = motion_values[move]
-        motion_list = data.get("motion", [])
-        element_list = data.get("element", [0.3] * len(motion_list))
-
-        for i, mv in enumerate(motion_list):
-            element_motion = element_list[i] if i < len(element_list) else 0.3
-            total_physical += expected_attack * mv
-            total_element += calculate_adjusted_element(
-                base_element=element,
-                sharpness=sharpness,
-                motion_value=element_motion,
-                element_zone=element_zone,
-                affinity=affinity,
-                crit_element_lv=crit_element_lv
-            )
+    total_physical = expected_attack * compiled.motion_sum
+    # 属性ダメージもモーション値に線形なので合計値で1回だけ計算する
+    total_element = calculate_adjusted_element(
+        base_element=element,
+        sharpness=sharpness,
+        motion_value=compiled.element_motion_sum,
+        element_zone=element_zone,
+        affinity=affinity,
+        crit_element_lv=crit_element_lv
+    )
 
     return total_physical, total_element
 
@@ -43,4 +125,4 @@ def calculate_dps(physical: float, elemental: float, time: float) -> float:
     """
     if time <= 0:
         return 0.0
-    return (physical + elemental) / time
\ No newline at end of file
+    return (physical + elemental) / time
@@ -0,0 +1,200 @@
+# === combo_search.py（最適コンボ探索） ===
+#
+# motion_values.json の技ごとの "time"（秒）・"next"（派生できる技）・"start"（納刀・ニュートラルから
+# 出せる技）から技のつながりをグラフにして、DPS の高い技の並びを動的計画法で探す。
+# 技の並びは長さに対して指数的に増えるので全列挙はしない。
+#
+#   search_combo_within(...)  制限時間内で合計ダメージが最大の並び（= その時間内の DPS 最大）
+#   search_combo_loop(...)    繰り返せる並び（最後の技から最初の技へつながる）で DPS 最大
+#
+# 技のダメージはモーション値に線形なので、1技ずつのダメージ（calculate_cycle_damage で計算）を
+# 足すだけで並び全体のダメージになる。どの技も出し終えたら止めてニュートラルに戻れる
+# （次に start の技を出せる）ものとする。切れ味の消費（ヒット数）は考えない。
+
+from typing import Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from logic.calculation_interface import calculate_cycle_damage
+from logic.sharpness import get_sharpness_bar
+from utils import loader
+
+FRAME_RATE = 60  # 時間は 1/60 秒単位で扱う
+MAX_LOOP_ITERATIONS = 50
+
+
+class MoveGraph(NamedTuple):
+    moves: Tuple[str, ...]          # 探索対象の技（time があるもの）
+    frames: Tuple[int, ...]         # 技ごとの所要フレーム
+    damage: Tuple[float, ...]       # 技ごとのダメージ（1回分）
+    follow: Tuple[Tuple[int, ...], ...]  # 技 i の次に出せる技（派生 + ニュートラルからの技）
+    starts: Tuple[int, ...]         # ニュートラルから出せる技
+
+
+class ComboResult(NamedTuple):
+    moves: Tuple[str, ...]
+    time: float      # 並び全体の秒数
+    damage: float    # 並び全体の期待ダメージ
+    dps: float
+
+    def as_combo(self) -> Dict:
+        """combos.json と同じ形"""
+        return {"moves": list(self.moves), "time": round(self.time, 3)}
+
+
+def build_move_graph(
+    weapon: Mapping,
+    part: Mapping,
+    motions: Mapping[str, Mapping],
+    skill_input: Mapping[str, Tuple[int, float]],
+    skills_json: Mapping,
+    sharpness: Optional[str] = None
+) -> MoveGraph:
+    """技ごとのダメージと派生関係を表にする（sharpness 省略時はゲージ最上位の色）"""
+    if sharpness is None:
+        sharpness = get_sharpness_bar(weapon)[0][0]
+    moves = tuple(name for name, data in motions.items() if data.get("time", 0) > 0 and "motion" in data)
+    index = {name: i for i, name in enumerate(moves)}
+    starts = tuple(index[name] for name in moves if motions[name].get("start", True))
+
+    frames = []
+    damage = []
+    follow = []
+    for name in moves:
+        data = motions[name]
+        frames.append(max(1, round(data["time"] * FRAME_RATE)))
+        stats = calculate_cycle_damage(weapon, part, [name], motions, skill_input, skills_json, sharpness)
+        damage.append(stats["物理合計"] + stats["属性合計"])
+        chained = [index[n] for n in data.get("next", ()) if n in index]
+        follow.append(tuple(dict.fromkeys(chained + list(starts))))
+    return MoveGraph(moves, tuple(frames), tuple(damage), tuple(follow), starts)
+
+
+def _result(graph: MoveGraph, path: Sequence[int], window: Optional[float] = None) -> ComboResult:
+    time = sum(graph.frames[i] for i in path) / FRAME_RATE
+    damage = sum(graph.damage[i] for i in path)
+    span = window if window is not None else time
+    return ComboResult(tuple(graph.moves[i] for i in path), time, damage, damage / span if span > 0 else 0.0)
+
+
+def best_within(graph: MoveGraph, time_budget: float) -> ComboResult:
+    """
+    制限時間内のダメージ最大の並び。
+    best[r][i] = 残り r フレームで技 i から始めたときの最大ダメージ
+               = damage[i] + max(0, max_{j ∈ follow[i]} best[r - frames[i]][j])
+    を r の小さい方から埋める（O(フレーム数 × 辺の数)）。
+    """
+    budget = int(time_budget * FRAME_RATE + 1e-9)
+    n = len(graph.moves)
+    if budget <= 0 or not graph.starts:
+        return ComboResult((), 0.0, 0.0, 0.0)
+
+    neg = float("-inf")
+    best = [[neg] * n for _ in range(budget + 1)]
+    choice = [[-1] * n for _ in range(budget + 1)]  # 次の技（-1 = ここで終わり）
+    for r in range(budget + 1):
+        row = best[r]
+        for i in range(n):
+            rest = r - graph.frames[i]
+            if rest < 0:
+                continue
+            after = best[rest]
+            value, nxt = 0.0, -1
+            for j in graph.follow[i]:
+                if after[j] > value:
+                    value, nxt = after[j], j
+            row[i] = graph.damage[i] + value
+            choice[r][i] = nxt
+
+    first = max(graph.starts, key=lambda i: (best[budget][i], -i))
+    if best[budget][first] == neg:
+        return ComboResult((), 0.0, 0.0, 0.0)  # どの技も時間内に収まらない
+    path = []
+    r, i = budget, first
+    while i >= 0:
+        path.append(i)
+        r, i = r - graph.frames[i], choice[r][i]
+    return _result(graph, path, window=time_budget)
+
+
+def _best_closed_walk(graph: MoveGraph, ratio: float, max_moves: int) -> Tuple[float, List[int]]:
+    """
+    重み damage - ratio × 秒数 の合計が最大の「最初の技に戻れる並び」（max_moves 手まで）。
+    walk[k][v] = 技 s から始めて k 手目が v の並びの最大重み、を s ごとに埋める。
+    """
+    n = len(graph.moves)
+    weight = [graph.damage[i] - ratio * graph.frames[i] / FRAME_RATE for i in range(n)]
+    best_value, best_path = float("-inf"), []
+    neg = float("-inf")
+    for s in range(n):
+        walk = [neg] * n
+        walk[s] = weight[s]
+        parents = [[-1] * n]
+        for k in range(1, max_moves + 1):
+            # k 手の並び（最後が v）が s に戻れるか
+            for v in range(n):
+                if walk[v] > best_value and s in graph.follow[v]:
+                    best_value = walk[v]
+                    path = [v]
+                    for step in range(k - 1, 0, -1):
+                        path.append(parents[step][path[-1]])
+                    best_path = path[::-1]
+            if k == max_moves:
+                break
+            nxt = [neg] * n
+            parent = [-1] * n
+            for u in range(n):
+                if walk[u] == neg:
+                    continue
+                for v in graph.follow[u]:
+                    value = walk[u] + weight[v]
+                    if value > nxt[v]:
+                        nxt[v], parent[v] = value, u
+            walk = nxt
+            parents.append(parent)
+    return best_value, best_path
+
+
+def _shortest_period(path: List[int]) -> List[int]:
+    """同じ並びの繰り返し（A B A B）なら1周分（A B）にする（DPS は同じ）"""
+    n = len(path)
+    for period in range(1, n):
+        if n % period == 0 and path == path[:period] * (n // period):
+            return path[:period]
+    return path
+
+
+def best_loop(graph: MoveGraph, max_moves: int = 12) -> ComboResult:
+    """
+    繰り返せる並びのうち DPS（ダメージ / 秒数）最大のもの。
+    比の最大化は Dinkelbach 法: 今の DPS を ratio として damage - ratio × 秒数 の最大の並びを探し、
+    それが 0 を超えなくなるまで ratio を更新する。
+    """
+    if not graph.moves:
+        return ComboResult((), 0.0, 0.0, 0.0)
+    ratio = 0.0
+    best = None
+    for _ in range(MAX_LOOP_ITERATIONS):
+        value, path = _best_closed_walk(graph, ratio, max_moves)
+        if not path:
+            break
+        candidate = _result(graph, _shortest_period(path))
+        if best is not None and (value <= 1e-9 or candidate.dps <= best.dps + 1e-12):
+            break
+        best = candidate
+        ratio = candidate.dps
+    return best or ComboResult((), 0.0, 0.0, 0.0)
+
+
+def _graph_for(weapon_name: str, monster_name: str, part_name: str, skill_input) -> MoveGraph:
+    weapon = loader.get_weapons()[weapon_name]
+    part = loader.get_monsters()[monster_name]["parts"][part_name]
+    return build_move_graph(weapon, part, loader.get_motion_values(), skill_input, loader.get_skills())
+
+
+def search_combo_within(weapon_name, monster_name, part_name, skill_input, time_budget: float) -> ComboResult:
+    """制限時間 time_budget 秒の中で合計ダメージ最大の技の並び（dps は time_budget あたり）"""
+    return best_within(_graph_for(weapon_name, monster_name, part_name, skill_input), time_budget)
+
+
+def search_combo_loop(weapon_name, monster_name, part_name, skill_input, max_moves: int = 12) -> ComboResult:
+    """max_moves 手以内で繰り返せる並びのうち DPS 最大のもの"""
+    return best_loop(_graph_for(weapon_name, monster_name, part_name, skill_input), max_moves)
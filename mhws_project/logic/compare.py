@@ -0,0 +1,119 @@
+# === compare.py（お気に入り構成の一括比較） ===
+#
+# 保存済みの構成（gui/bookmarks.py の形式）を今のデータでまとめて計算し直す。
+# 計算は logic/batch.py の1回の一括呼び出しで行うので、件数が増えてもほぼ一定時間で済む。
+#
+#   - 比較対象（モンスター・部位）を指定すると全構成をその部位で評価する（省略時は各構成の保存時の部位）
+#   - 保存時の値（dps / total_damage / duration）がある構成は、保存時の部位で計算し直した値との差を
+#     「データ更新による変化」として出す（保存後に data/*.json が変わっていなければ 0）
+#   - 複数部位に分けて当てた構成（part_weights）は部位ごとの行に展開して計算し、重みで混ぜる
+#     （DPS・合計ダメージ・維持秒数はどれも部位ごとの値の重み付き和になる）
+
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from logic.batch import run_batch_dps_calculation
+from logic.calculation_interface import format_part_weights, normalize_part_weights
+from utils import loader
+
+# 保存時の値のキー（bookmarks.json） → 結果のキー
+SAVED_FIELDS = {"dps": "DPS", "total_damage": "合計ダメージ", "duration": "維持秒数"}
+
+
+def _missing_reason(build: Mapping, monster: str, parts) -> Optional[str]:
+    """今のデータで計算できない構成なら理由を返す（parts は部位名か {部位: 重み}）"""
+    monsters = loader.get_monsters()
+    if build.get("weapon") not in loader.get_weapons():
+        return f"武器「{build.get('weapon')}」がありません"
+    if build.get("combo") not in loader.get_combos():
+        return f"コンボ「{build.get('combo')}」がありません"
+    for part in [parts] if isinstance(parts, str) else parts:
+        if monster not in monsters or part not in monsters[monster]["parts"]:
+            return f"部位「{monster} / {part}」がありません"
+    return None
+
+
+def compare_builds(
+    builds: Sequence[Mapping],
+    monster_name: Optional[str] = None,
+    part_name: Optional[str] = None
+) -> List[Dict]:
+    """
+    builds: お気に入りの dict のリスト（weapon / monster / part / combo / skills、保存時の値は任意）
+    戻り値: 構成ごとの {"名前", "武器", "モンスター", "部位", "コンボ", "DPS", "合計ダメージ", "維持秒数",
+            "ΔDPS", "Δ合計ダメージ", "Δ維持秒数", "データ更新", "エラー"}
+    Δ は保存時の部位で計算し直した値 − 保存時の値（保存時の値がなければ None）。
+    計算できない構成（武器・部位・コンボが消えたなど）は "エラー" に理由を入れ、値は None。
+    """
+    version = loader.data_version()
+    rows: List[Dict] = []
+    # 一括計算する構成: (rows の位置, 種類, 武器, モンスター, {部位: 重み}, コンボ, スキル)
+    jobs = []
+    for build in builds:
+        monster = monster_name or build.get("monster")
+        # 比較対象を指定しないときは保存時の当て方（複数部位なら割合も）で計算する
+        parts = part_name or build.get("part_weights") or build.get("part")
+        row = {
+            "名前": build.get("name", ""),
+            "武器": build.get("weapon"),
+            "モンスター": monster,
+            "部位": parts if isinstance(parts, str) or parts is None else format_part_weights(parts),
+            "コンボ": build.get("combo"),
+            "DPS": None,
+            "合計ダメージ": None,
+            "維持秒数": None,
+            "ΔDPS": None,
+            "Δ合計ダメージ": None,
+            "Δ維持秒数": None,
+            # 保存後にゲームデータが変わったか（データのバージョンを保存していない古い構成は None）
+            "データ更新": None if build.get("data_version") is None else build["data_version"] != version,
+            "エラー": _missing_reason(build, monster, parts),
+        }
+        rows.append(row)
+        if row["エラー"]:
+            continue
+        if not isinstance(parts, str):
+            parts = normalize_part_weights(monster, parts)
+            row["部位"] = format_part_weights(parts)
+        skills = {name: (lv, rate) for name, (lv, rate) in build.get("skills", {}).items()}
+        jobs.append((len(rows) - 1, "now", build["weapon"], monster, parts, build["combo"], skills))
+        saved_monster = build.get("monster")
+        saved_parts = build.get("part_weights") or build.get("part")
+        if any(key in build for key in SAVED_FIELDS) and not _missing_reason(build, saved_monster, saved_parts):
+            if not isinstance(saved_parts, str):
+                saved_parts = normalize_part_weights(saved_monster, saved_parts)
+            jobs.append((len(rows) - 1, "saved", build["weapon"], saved_monster, saved_parts, build["combo"], skills))
+
+    if not jobs:
+        return rows
+
+    # 部位ごとの行に展開して1回で計算し、構成ごとに重み付き和で戻す
+    expanded = []   # (武器, モンスター, 部位, コンボ, スキル)
+    owner = []      # 展開した行 → jobs の位置
+    weights = []
+    for j, (_, _, weapon, monster, parts, combo, skills) in enumerate(jobs):
+        for part, weight in ({parts: 1.0} if isinstance(parts, str) else parts).items():
+            expanded.append((weapon, monster, part, combo, skills))
+            owner.append(j)
+            weights.append(weight)
+    weapons, monsters, parts, combos, skill_inputs = zip(*expanded)
+    results = run_batch_dps_calculation(weapons, monsters, parts, combos, skill_inputs=skill_inputs)
+    owner = np.array(owner)
+    weights = np.array(weights)
+    blended = {
+        key: np.bincount(owner, weights=weights * results[key], minlength=len(jobs))
+        for key in SAVED_FIELDS.values()
+    }
+
+    for i, (pos, kind, *_rest) in enumerate(jobs):
+        row = rows[pos]
+        build = builds[pos]
+        if kind == "now":
+            for key in SAVED_FIELDS.values():
+                row[key] = float(blended[key][i])
+        else:
+            for saved_key, key in SAVED_FIELDS.items():
+                if build.get(saved_key) is not None:
+                    row[f"Δ{key}"] = float(blended[key][i]) - float(build[saved_key])
+    return rows
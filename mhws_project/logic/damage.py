@@ -1,27 +1,47 @@
 # logic/damage.py
+#
+# ダメージ計算の式。1構成（float）でも一括計算（logic/batch.py の NumPy 配列）でも同じ関数を使う
+# （スカラーのときは NumPy を読み込まない）。
 
 from typing import Dict, List, Tuple
 
+# 切れ味補正（物理／属性）。バッチ計算からも参照する
+PHYSICAL_SHARPNESS_MODIFIERS = {
+    "赤": 0.5, "橙": 0.75, "黄": 1.0,
+    "緑": 1.05, "青": 1.2, "白": 1.32, "紫": 1.39
+}
+ELEMENTAL_SHARPNESS_MODIFIERS = {
+    "赤": 0.25, "橙": 0.5, "黄": 0.75,
+    "緑": 1.0, "青": 1.0625, "白": 1.15, "紫": 1.25
+}
+
+def _clip(value, low, high):
+    if hasattr(value, "clip"):  # NumPy 配列
+        return value.clip(low, high)
+    return max(min(value, high), low)
+
+def _select(condition, if_true, if_false):
+    if hasattr(condition, "shape"):  # NumPy 配列
+        import numpy as np
+        return np.where(condition, if_true, if_false)
+    return if_true if condition else if_false
+
+def _sharpness_modifier(table: Dict[str, float], sharpness):
+    """色の名前 → 補正値。一括計算で行ごとに色が違うときは、補正値（配列）をそのまま渡せる"""
+    if isinstance(sharpness, str):
+        return table.get(sharpness, 1.0)
+    return sharpness
+
 def apply_physical_sharpness(attack: float, sharpness: str) -> float:
-    SHARPNESS_MODIFIERS = {
-        "赤": 0.5, "橙": 0.75, "黄": 1.0,
-        "緑": 1.05, "青": 1.2, "白": 1.32, "紫": 1.39
-    }
-    return attack * SHARPNESS_MODIFIERS.get(sharpness, 1.0)
+    return attack * _sharpness_modifier(PHYSICAL_SHARPNESS_MODIFIERS, sharpness)
 
 def apply_elemental_sharpness(element: float, sharpness: str) -> float:
-    SHARPNESS_MODIFIERS = {
-        "赤": 0.25, "橙": 0.5, "黄": 0.75,
-        "緑": 1.0, "青": 1.0625, "白": 1.15, "紫": 1.25
-    }
-    return element * SHARPNESS_MODIFIERS.get(sharpness, 1.0)
+    return element * _sharpness_modifier(ELEMENTAL_SHARPNESS_MODIFIERS, sharpness)
 
 def calculate_expected_physical(attack: float, affinity: float, crit_mult: float = 1.25) -> float:
-    affinity = max(min(affinity, 100), -100)
-    if affinity >= 0:
-        return attack * (1 + (affinity / 100.0) * (crit_mult - 1))
-    else:
-        return attack * (1 + (affinity / 100.0) * (0.75 - 1))
+    affinity = _clip(affinity, -100, 100)
+    # マイナス会心は 0.75 倍
+    return attack * (1 + (affinity / 100.0) * _select(affinity >= 0, crit_mult - 1, 0.75 - 1))
 
 def apply_hitzone_modifier(attack: float, hitzone: float) -> float:
     return attack * (hitzone / 100.0)
@@ -29,20 +49,16 @@ def apply_hitzone_modifier(attack: float, hitzone: float) -> float:
 def calculate_elemental_damage(element: float, element_zone: float) -> float:
     return element * (element_zone / 100.0)
 
-from logic.skill import get_crit_element_bonus
-
 def calculate_elemental_crit_multiplier(
     affinity: float,
     skill_lv: int,
     skill_name: str = "会心撃【属性】"
 ) -> float:
     """
-    スキル名とLvに応じた属性会心倍率を skills.json から取得する
+    ヒットごとの属性会心倍率。会心撃【属性】はトータル属性ダメージに別途補正する
+    （get_crit_element_bonus）ので、ここでは常に 1.0
     """
-    crit_rate = max(min(affinity, 100), 0) / 100
-    bonus = get_crit_element_bonus(skill_name, skill_lv)
-    # return 1 + crit_rate * (bonus - 1)
-    return 1.0  # トータル属性ダメージに別途補正するためここでは無効化
+    return 1.0
 
 
 def calculate_adjusted_element(
@@ -63,6 +79,23 @@ def calculate_adjusted_element(
     element *= calculate_elemental_crit_multiplier(affinity, crit_element_lv, skill_name="会心撃【属性】")
     return element
 
+def expected_sharpness_consumption(affinity: float, save_prob: float, crit_save_prob: float) -> float:
+    """
+    1ヒットあたりの期待切れ味消費。
+    save_prob: 常に消費しない確率（業物 × 発動率）、crit_save_prob: 会心時に消費しない確率（達人芸 × 発動率）
+    """
+    crit = _clip(affinity, 0, 100) / 100
+    consumption = 1.0 * (1 - save_prob) * (1 - crit_save_prob * crit)
+    return _select(consumption <= 0, 0.01, consumption)  # 安全策：ゼロ除算回避
+
+def effective_sharpness_hits(base_hits: float, consumption: float) -> int:
+    """切れ味ゲージのヒット数 → 期待消費で割った実効ヒット数（切り捨て）"""
+    hits = base_hits / consumption
+    if hasattr(hits, "astype"):  # NumPy 配列
+        import numpy as np
+        return np.floor(hits).astype(np.int64)
+    return int(hits)
+
 def simulate_combo_damage(
     combo: Dict,
     motion_data: Dict,
@@ -0,0 +1,283 @@
+# === hunt.py（討伐時間シミュレーション） ===
+#
+# モンスターの体力（monsters.json の "hp"）を削り切るまでの時間を期待値で求める。
+# "hp_placeholder": true のモンスターは体力・フェーズが出典のない仮の値なので、結果は目安にしかならない。
+#   - 部位の狙い分け: {部位: 重み}。ヒットが重みの割合で各部位に当たるものとして、部位ごとのダメージを平均する
+#   - コンボのローテーション: コンボ名のリストを順に繰り返す（1周 = 全コンボの 技・時間 の合計）
+#   - 切れ味: ゲージを上の色から消費し、sharpen_below の色を下回ったら研ぐ（研ぎ中は攻撃しない。
+#     研ぐとゲージは満タンに戻り、剛刃研磨の無消費時間も始まり直す）
+#   - フェーズ: 残り体力の割合が "phases" の hp_below 以下になると、その部位の肉質が変わる（前のフェーズに上書き）
+#
+# ダメージは logic/batch.py のカーネル（run_full_dps_calculation と同じ式）で「フェーズ × 色 × 部位」ごとに
+# コンボ1周分を求め、その後は区間ごとの閉じた式で進める（DPS一定の区間 = フェーズも色も変わらない間）。
+# スキル構成は長さ N の配列のまま全構成を同時に進めるので、スキルの総当たりをまとめて討伐時間で並べられる。
+
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from logic.batch import SkillInput, evaluate_modifiers, skill_modifiers_for
+from logic.calculation_interface import normalize_part_weights
+from logic.combo import get_compiled_combo
+from logic.damage import ELEMENTAL_SHARPNESS_MODIFIERS, PHYSICAL_SHARPNESS_MODIFIERS, expected_sharpness_consumption
+from logic.sharpness import get_sharpness_bar
+from utils import loader
+from utils.data_compiler import get_data_index
+
+SHARPEN_TIME = 3.0          # 砥石で研ぐのにかかる秒数
+TIME_LIMIT = 50 * 60.0      # クエストの制限時間（これを過ぎたら討伐失敗）
+MAX_EVENTS = 100000         # 区間の打ち切り数（研ぎが極端に多い構成の保険）
+
+
+def is_placeholder_hp(monster_name: str) -> bool:
+    """体力・フェーズが仮の値（monsters.json の hp_placeholder）か"""
+    return bool(loader.get_monsters()[monster_name].get("hp_placeholder", False))
+
+
+def monster_phases(monster_name: str) -> List[Tuple[str, float, Dict[str, Mapping]]]:
+    """
+    [(フェーズ名, 開始する残り体力の割合, {部位: 肉質}), ...]（通常状態 = 割合 1.0 から順に）。
+    肉質は phases の指定を前のフェーズの値に上書きしたもの。
+    """
+    monster = loader.get_monsters()[monster_name]
+    current = {part: {"physical": data["physical"], "element": dict(data["element"])}
+               for part, data in monster["parts"].items()}
+    phases = [("通常", 1.0, current)]
+    for phase in sorted(monster.get("phases", ()), key=lambda p: -p["hp_below"]):
+        current = {part: {"physical": data["physical"], "element": dict(data["element"])}
+                   for part, data in current.items()}
+        for part, change in phase["parts"].items():
+            if "physical" in change:
+                current[part]["physical"] = change["physical"]
+            current[part]["element"].update(change.get("element", {}))
+        phases.append((phase["name"], phase["hp_below"], current))
+    return phases
+
+
+def _rotation(combo_names: Sequence[str]) -> Dict[str, float]:
+    """コンボのローテーション1周分の モーション値合計・ヒット数・秒数"""
+    combos = loader.get_combos()
+    motions = loader.get_motion_values()
+    combo_hits = get_data_index()["combo_hits"]
+    totals = {"motion_sum": 0.0, "element_motion_sum": 0.0, "hits": 0, "time": 0.0}
+    for name in combo_names:
+        if name not in combos:
+            raise KeyError(f"コンボ「{name}」がありません")
+        compiled = get_compiled_combo(combos[name]["moves"], motions)
+        totals["motion_sum"] += compiled.motion_sum
+        totals["element_motion_sum"] += compiled.element_motion_sum
+        totals["hits"] += combo_hits[name]
+        totals["time"] += combos[name]["time"]
+    if totals["time"] <= 0:
+        raise ValueError("コンボのローテーションが空です")
+    return totals
+
+
+def _cycle_dps(weapon: Mapping, hitzones: Mapping[str, Mapping], weights: Mapping[str, float],
+               colour: str, rotation: Mapping[str, float], mods: Mapping[str, np.ndarray]) -> np.ndarray:
+    """1フェーズ・1色での、部位の重みで平均した DPS（長さ N）"""
+    dps = 0.0
+    for part, weight in weights.items():
+        targets = {
+            "display_attack": np.array([weapon["attack"]], dtype=np.float64),
+            "base_affinity": np.array([weapon["affinity"]], dtype=np.float64),
+            "base_element": np.array([weapon["element"]["value"]], dtype=np.float64),
+            "phys_sharp": np.array([PHYSICAL_SHARPNESS_MODIFIERS.get(colour, 1.0)]),
+            "elem_sharp": np.array([ELEMENTAL_SHARPNESS_MODIFIERS.get(colour, 1.0)]),
+            "base_hits": np.array([0], dtype=np.int64),  # 切れ味の持続はここでは使わない
+            "hitzone": np.array([hitzones[part]["physical"]], dtype=np.float64),
+            "element_zone": np.array([hitzones[part]["element"].get(weapon["element"]["type"], 0)], dtype=np.float64),
+            "motion_sum": np.array([rotation["motion_sum"]]),
+            "element_motion_sum": np.array([rotation["element_motion_sum"]]),
+            "hits_per_combo": np.array([rotation["hits"]], dtype=np.float64),
+            "combo_time": np.array([rotation["time"]]),
+        }
+        dps = dps + weight * evaluate_modifiers(targets, mods)["DPS"]
+    return dps
+
+
+def simulate_hunt_batch(
+    weapon_name: str,
+    monster_name: str,
+    part_weights: Mapping[str, float],
+    combo_names: Union[str, Sequence[str]],
+    skill_inputs: Optional[Sequence[SkillInput]] = None,
+    skill_levels: Optional[np.ndarray] = None,
+    skill_rates: Optional[np.ndarray] = None,
+    skill_names: Optional[Sequence[str]] = None,
+    sharpen_below: Optional[str] = None,
+    sharpen_time: float = SHARPEN_TIME,
+    time_limit: float = TIME_LIMIT,
+    _record: Optional[List[Dict]] = None
+) -> Dict[str, np.ndarray]:
+    """
+    N 個のスキル構成それぞれの討伐時間を求める（スキルの渡し方は logic.batch.run_batch_dps_calculation と同じ）。
+    sharpen_below: この色から下の色に落ちたら研ぐ（省略時はゲージ最上位の色 = 色が落ちたらすぐ研ぐ）
+    戻り値（長さ N の配列）:
+      "討伐時間" 秒（討伐できなければ time_limit）, "討伐" bool, "攻撃時間", "研ぎ回数", "研ぎ時間",
+      "平均DPS"（与えたダメージ / 経過秒）, "残り体力"
+    """
+    weapon = loader.get_weapons()[weapon_name]
+    monster = loader.get_monsters()[monster_name]
+    if "hp" not in monster:
+        raise ValueError(f"モンスター「{monster_name}」の体力（hp）が {loader.MONSTERS_FILE} にありません")
+    hp = float(monster["hp"])
+    weights = normalize_part_weights(monster_name, part_weights)
+    rotation = _rotation([combo_names] if isinstance(combo_names, str) else combo_names)
+    phases = monster_phases(monster_name)
+
+    bar = get_sharpness_bar(weapon)
+    colours = [colour for colour, _ in bar]
+    if sharpen_below is None:
+        sharpen_below = colours[0]
+    if sharpen_below not in colours:
+        raise ValueError(f"切れ味「{sharpen_below}」はこの武器のゲージにありません: {colours}")
+    last_colour = colours.index(sharpen_below)  # これより下の色には落とさない
+
+    mods = skill_modifiers_for(skill_inputs, skill_levels, skill_rates, skill_names)
+    n = len(mods["atk_add"])
+    rows = np.arange(n)
+
+    # dps[フェーズ, 色, 構成]
+    dps = np.array([
+        [np.broadcast_to(_cycle_dps(weapon, hitzones, weights, colour, rotation, mods), (n,)) for colour in colours]
+        for _, _, hitzones in phases
+    ])
+    # 次のフェーズが始まる残り体力（最後のフェーズは 0 = 討伐）
+    thresholds = np.array([hp * ratio for _, ratio, _ in phases[1:]] + [0.0])
+
+    # 1秒あたりの切れ味消費（ヒット数）
+    affinity = np.asarray(weapon["affinity"] + mods["affinity"], dtype=np.float64)
+    consumption = np.broadcast_to(
+        expected_sharpness_consumption(affinity, mods["sharpness_save"], mods["crit_sharpness_save"]), (n,)
+    )
+    drain_rate = rotation["hits"] / rotation["time"] * consumption
+    colour_hits = np.array([hits for _, hits in bar], dtype=np.float64)
+    top_hits = np.broadcast_to(colour_hits[0] + mods["sharpness_add"], (n,)).astype(np.float64)
+    free_time = np.broadcast_to(mods["no_sharpness_time"], (n,)).astype(np.float64)
+
+    hp_left = np.full(n, hp)
+    now = np.zeros(n)
+    attack_time = np.zeros(n)
+    sharpen_count = np.zeros(n, dtype=np.int64)
+    phase = np.zeros(n, dtype=np.int64)
+    colour = np.zeros(n, dtype=np.int64)
+    gauge = top_hits.copy()       # 今の色の残りヒット数
+    free = free_time.copy()       # 剛刃研磨の残り無消費秒数
+    killed = np.zeros(n, dtype=bool)
+    active = np.ones(n, dtype=bool)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for _ in range(MAX_EVENTS):
+            if not active.any():
+                break
+            rate = dps[phase, colour, rows]
+            drain = np.where(free > 0, 0.0, drain_rate)
+            to_phase = np.where(rate > 0, (hp_left - thresholds[phase]) / rate, np.inf)
+            to_gauge = np.where(free > 0, free, np.where(drain > 0, gauge / drain, np.inf))
+            to_limit = time_limit - now
+            step = np.where(active, np.minimum(np.minimum(to_phase, to_gauge), to_limit), 0.0)
+
+            if _record is not None and active[0] and step[0] > 0:
+                _record.append({
+                    "開始秒": float(now[0]), "終了秒": float(now[0] + step[0]),
+                    "フェーズ": phases[phase[0]][0], "色": colours[colour[0]],
+                    "ダメージ": float(rate[0] * step[0]), "残り体力": float(hp_left[0] - rate[0] * step[0]),
+                })
+
+            hp_left = hp_left - rate * step
+            now = now + step
+            attack_time = attack_time + step
+            gauge = gauge - drain * step
+            free = np.maximum(free - step, 0.0)
+
+            # 体力: 次のフェーズへ、または討伐
+            hit_phase = active & (step >= to_phase)
+            hp_left = np.where(hit_phase, thresholds[phase], hp_left)
+            done = hit_phase & (phase == len(phases) - 1)
+            killed |= done
+            phase = np.where(hit_phase & ~done, phase + 1, phase)
+            active &= ~done
+
+            # 切れ味: 次の色へ、または研ぐ（剛刃研磨の無消費時間が終わっただけのときは何もしない）
+            broke = active & (drain > 0) & (step >= to_gauge)
+            sharpen = broke & (colour >= last_colour)
+            drop = broke & ~sharpen
+            colour = np.where(drop, colour + 1, colour)
+            gauge = np.where(drop, colour_hits[colour], gauge)
+            if _record is not None and sharpen[0]:
+                _record.append({
+                    "開始秒": float(now[0]), "終了秒": float(now[0] + sharpen_time),
+                    "フェーズ": phases[phase[0]][0], "色": "研ぎ", "ダメージ": 0.0, "残り体力": float(hp_left[0]),
+                })
+            now = np.where(sharpen, now + sharpen_time, now)
+            sharpen_count = sharpen_count + sharpen
+            colour = np.where(sharpen, 0, colour)
+            gauge = np.where(sharpen, top_hits, gauge)
+            free = np.where(sharpen, free_time, free)
+
+            # 制限時間
+            active &= now < time_limit
+
+    elapsed = np.minimum(now, time_limit)
+    return {
+        "討伐時間": np.where(killed, now, time_limit),
+        "討伐": killed,
+        "攻撃時間": attack_time,
+        "研ぎ回数": sharpen_count,
+        "研ぎ時間": sharpen_count * sharpen_time,
+        "平均DPS": np.where(elapsed > 0, (hp - hp_left) / np.where(elapsed > 0, elapsed, 1.0), 0.0),
+        "残り体力": hp_left,
+    }
+
+
+def simulate_hunt(
+    weapon_name: str,
+    monster_name: str,
+    part_weights: Mapping[str, float],
+    combo_names: Union[str, Sequence[str]],
+    skill_input: SkillInput,
+    sharpen_below: Optional[str] = None,
+    sharpen_time: float = SHARPEN_TIME,
+    time_limit: float = TIME_LIMIT
+) -> Dict:
+    """
+    1構成の討伐時間。simulate_hunt_batch の結果（スカラー）に加えて
+    "区間": [{"開始秒", "終了秒", "フェーズ", "色"（研ぎ中は "研ぎ"）, "ダメージ", "残り体力"}, ...] を返す。
+    """
+    segments: List[Dict] = []
+    result = simulate_hunt_batch(
+        weapon_name, monster_name, part_weights, combo_names, skill_inputs=[skill_input],
+        sharpen_below=sharpen_below, sharpen_time=sharpen_time, time_limit=time_limit, _record=segments
+    )
+    summary = {key: values[0].item() for key, values in result.items()}
+    summary["区間"] = segments
+    return summary
+
+
+def rank_by_time_to_kill(
+    weapon_name: str,
+    monster_name: str,
+    part_weights: Mapping[str, float],
+    combo_names: Union[str, Sequence[str]],
+    skill_inputs: Sequence[SkillInput],
+    top: Optional[int] = None,
+    **options
+) -> List[Dict]:
+    """スキル構成の候補を討伐時間の短い順に並べる（options は simulate_hunt_batch へ）"""
+    result = simulate_hunt_batch(weapon_name, monster_name, part_weights, combo_names,
+                                 skill_inputs=skill_inputs, **options)
+    order = np.lexsort((-result["平均DPS"], result["討伐時間"]))
+    if top is not None:
+        order = order[:top]
+    return [
+        {
+            "順位": rank + 1,
+            "討伐時間": float(result["討伐時間"][i]),
+            "討伐": bool(result["討伐"][i]),
+            "研ぎ回数": int(result["研ぎ回数"][i]),
+            "平均DPS": float(result["平均DPS"][i]),
+            "スキル": dict(skill_inputs[i]),
+        }
+        for rank, i in enumerate(order)
+    ]
@@ -0,0 +1,185 @@
+# === matrix.py（全武器 × 全モンスター部位の DPS 表） ===
+#
+# スキル構成とコンボを固定して、weapons.json の全武器を monsters.json の全部位に
+# 当てたときの DPS / 合計ダメージを logic/batch.py で一括計算する。
+#
+# 結果は cache/ に npz で保存する。ファイルはコンボ・スキル構成と、全体に効くデータ
+# （skills.json / motion_values.json / combos.json）の内容ハッシュごとに分ける。
+# 中には武器ごと・モンスターごとのデータのハッシュも入れておき、読み込み時に
+# ハッシュが変わった武器の行・モンスターの列（と新しく増えたもの）だけ計算し直す。
+# ファイルは最近使った MAX_CACHED_MATRICES 個まで残し、古いものから消す。
+
+import hashlib
+import json
+import os
+import tempfile
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from logic.batch import run_batch_dps_calculation
+from utils import loader
+from utils.memo import normalize_skills
+
+CACHE_DIR = os.path.join(loader.BASE_DIR, "cache")
+MAX_CACHED_MATRICES = 64  # cache/ に残す DPS 表の数（コンボ・スキル構成の組み合わせ）
+
+# どの武器・モンスターにも効くデータ（変わったら全部計算し直し）
+_SHARED_FILES = (loader.SKILLS_FILE, loader.MOTION_VALUES_FILE, loader.COMBOS_FILE)
+
+
+class DpsMatrix(NamedTuple):
+    """dps[i, j] = 武器 weapons[i] で部位 targets[j]（(モンスター, 部位)）を攻撃したときの DPS"""
+    weapons: Tuple[str, ...]
+    targets: Tuple[Tuple[str, str], ...]
+    dps: np.ndarray           # (武器数, 部位数)
+    total_damage: np.ndarray  # (武器数, 部位数) 切れ味が尽きるまでの合計ダメージ
+    recomputed: int           # 今回計算したマス数（残りはキャッシュから）
+
+    def best_weapons(self, monster: str, part: str, top: int = 3) -> List[Tuple[str, float]]:
+        """その部位に DPS の高い武器を上位 top 件"""
+        j = self.targets.index((monster, part))
+        order = np.argsort(-self.dps[:, j])[:top]
+        return [(self.weapons[i], float(self.dps[i, j])) for i in order]
+
+    def records(self) -> List[Dict]:
+        """ヒートマップ・表示用の1マス1行の形"""
+        return [
+            {
+                "武器": weapon,
+                "モンスター": monster,
+                "部位": part,
+                "DPS": float(self.dps[i, j]),
+                "合計ダメージ": float(self.total_damage[i, j]),
+            }
+            for i, weapon in enumerate(self.weapons)
+            for j, (monster, part) in enumerate(self.targets)
+        ]
+
+
+def _entry_hash(entry: Mapping) -> str:
+    text = json.dumps(loader.thaw(entry), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _matrix_key(combo_name: str, skill_input: Mapping[str, Tuple[int, float]]) -> str:
+    payload = [
+        combo_name,
+        [[name, lv, round(rate, 6)] for name, (lv, rate) in normalize_skills(skill_input).items()],
+        [loader.file_digest(f) for f in _SHARED_FILES],
+    ]
+    text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:20]
+
+
+def _load_cached(path: str) -> Optional[Dict[str, np.ndarray]]:
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as f:
+            cached = {key: f[key] for key in f.files}
+        os.utime(path)  # 最近使った順に残すため
+        return cached
+    except (OSError, ValueError, KeyError):
+        return None  # 壊れたキャッシュは使わない
+
+
+def _save_cached(path: str, arrays: Mapping[str, np.ndarray]) -> None:
+    """
+    一時ファイル（同じディレクトリに一意の名前）に書いてから置き換える。
+    同時に書く他のセッション・プロセスと一時ファイルがぶつからない。キャッシュなので書けなくても続ける
+    """
+    cache_dir = os.path.dirname(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix="dps_matrix_", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        return
+    _prune_cache(cache_dir)
+
+
+def _prune_cache(cache_dir: str, keep: int = MAX_CACHED_MATRICES) -> None:
+    """最近使った keep 個を残して DPS 表のキャッシュを消す"""
+    files = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.startswith("dps_matrix_") and entry.name.endswith(".npz"):
+            try:
+                files.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                continue  # 他のプロセスが消した
+    files.sort(reverse=True)
+    for _, path in files[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def build_dps_matrix(
+    combo_name: str,
+    skill_input: Mapping[str, Tuple[int, float]],
+    cache_dir: Optional[str] = CACHE_DIR
+) -> DpsMatrix:
+    """
+    全武器 × 全モンスター部位の DPS 表を作る。
+    cache_dir=None ならキャッシュを使わず全部計算する。
+    """
+    weapons = loader.get_weapons()
+    monsters = loader.get_monsters()
+    weapon_names = tuple(weapons.keys())
+    targets = tuple((m, p) for m, monster in monsters.items() for p in monster["parts"])
+
+    weapon_hashes = np.array([_entry_hash(weapons[w]) for w in weapon_names])
+    monster_hashes = {m: _entry_hash(monster) for m, monster in monsters.items()}
+    target_hashes = np.array([monster_hashes[m] for m, _ in targets])
+
+    dps = np.zeros((len(weapon_names), len(targets)))
+    total = np.zeros((len(weapon_names), len(targets)))
+    todo = np.ones(dps.shape, dtype=bool)
+
+    path = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, f"dps_matrix_{_matrix_key(combo_name, skill_input)}.npz")
+        cached = _load_cached(path)
+        if cached is not None:
+            # 名前とハッシュがどちらも一致する行・列だけ使い回す
+            row_of = {(w, h): i for i, (w, h) in enumerate(zip(cached["weapons"], cached["weapon_hashes"]))}
+            col_of = {(m, p, h): j for j, ((m, p), h) in enumerate(zip(cached["targets"], cached["target_hashes"]))}
+            rows = np.array([row_of.get((w, h), -1) for w, h in zip(weapon_names, weapon_hashes)])
+            cols = np.array([col_of.get((m, p, h), -1) for (m, p), h in zip(targets, target_hashes)])
+            hit = (rows[:, None] >= 0) & (cols[None, :] >= 0)
+            src = np.ix_(np.maximum(rows, 0), np.maximum(cols, 0))
+            dps = np.where(hit, cached["dps"][src], 0.0)
+            total = np.where(hit, cached["total_damage"][src], 0.0)
+            todo = ~hit
+
+    wi, ti = np.nonzero(todo)
+    if len(wi):
+        results = run_batch_dps_calculation(
+            [weapon_names[i] for i in wi],
+            [targets[j][0] for j in ti],
+            [targets[j][1] for j in ti],
+            combo_name,
+            skill_inputs=[dict(skill_input)] * len(wi)
+        )
+        dps[wi, ti] = results["DPS"]
+        total[wi, ti] = results["合計ダメージ"]
+
+        if path is not None:
+            _save_cached(path, {
+                "weapons": np.array(weapon_names),
+                "weapon_hashes": weapon_hashes,
+                "targets": np.array(targets).reshape(-1, 2),
+                "target_hashes": target_hashes,
+                "dps": dps,
+                "total_damage": total,
+            })
+
+    return DpsMatrix(weapon_names, targets, dps, total, int(len(wi)))
@@ -0,0 +1,351 @@
+# === optimizer.py（スキル構成の探索） ===
+#
+# 武器・部位・コンボを固定して、スキルポイント（Lvの合計）の上限内で DPS
+# （または切れ味が尽きるまでの合計ダメージ）が最大になるスキル構成を上位K件探す。
+#
+# スキルを1つずつ Lv 決めしていく分枝限定法。1段ごとに候補をまとめて
+# logic/batch.py で評価する。
+#   - 上界: apply_skill_modifiers の補正は add/affinity が加算、mult が乗算。
+#           残りスキルで増やせる量を項目ごとに
+#             min(各スキルの最大増分の和, 残りポイント × 1ポイントあたり最大増分)
+#           で見積もり、今の補正値に足して評価する。どの補正も大きいほど
+#           ダメージは減らないので、実際の構成の値を超えない。
+#   - 支配: 下位Lvより補正がどれも大きくないLvは候補から外す（蒼雷一閃Lv2など）。
+#           補正が全く同じスキル（属性攻撃強化の5種など）は Lv の並びを1通りに固定する。
+#           評価値に効かないスキル（DPS最大化での匠など）は最初に外す。
+
+import heapq
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from logic.batch import MODIFIER_FIELDS, evaluate_modifiers, prepare_targets, skill_modifiers_kernel
+from utils import loader
+
+OBJECTIVES = {
+    "dps": "DPS",
+    "total_damage": "合計ダメージ",
+}
+
+# 乗算で効く補正（上界は log で足し合わせる）
+_MULT_FIELDS = ("atk_mult", "elem_mult")
+
+TopList = List[Tuple[float, Tuple[int, ...]]]
+
+CHUNK_SIZE = 4096  # 1回のバッチ評価で展開する候補数の目安
+
+
+def _level_numbers(levels: Mapping) -> List[int]:
+    return sorted(int(key[2:]) for key in levels if key.startswith("Lv") and key[2:].isdigit())
+
+
+def _to_bound_space(mods: Mapping[str, np.ndarray]) -> np.ndarray:
+    """補正値を (N, 項目) 配列に。乗算項目は log にして全項目を加算で扱えるようにする"""
+    return np.stack(
+        [np.log(mods[f]) if f in _MULT_FIELDS else np.asarray(mods[f], dtype=np.float64)
+         for f in MODIFIER_FIELDS],
+        axis=1
+    )
+
+
+def _from_bound_space(values: np.ndarray) -> Dict[str, np.ndarray]:
+    return {
+        f: np.exp(values[:, i]) if f in _MULT_FIELDS else values[:, i]
+        for i, f in enumerate(MODIFIER_FIELDS)
+    }
+
+
+class _SearchSpace:
+    """探索条件。ワーカープロセスにも pickle で渡す"""
+
+    def __init__(self, targets, names, rates, allowed, base_levels, twins, budget, objective, top_k):
+        self.targets = targets
+        self.names = list(names)
+        self.rates = np.asarray(rates, dtype=np.float64)
+        self.allowed = allowed
+        self.base_levels = np.asarray(base_levels, dtype=np.int64)
+        self.twins = twins          # 補正が同一で前にあるスキルの列番号（なければ -1）
+        self.budget = budget        # 必須スキル分を除いた残りポイント
+        self.objective = objective
+        self.top_k = top_k
+        self._prepare_bounds()
+
+    def mods(self, levels: np.ndarray) -> Dict[str, np.ndarray]:
+        rates = np.broadcast_to(self.rates, levels.shape)
+        return skill_modifiers_kernel(levels, rates, self.names, loader.get_skills())
+
+    def evaluate(self, levels: np.ndarray, key: Optional[str] = None) -> np.ndarray:
+        if len(levels) == 0:
+            return np.zeros(0)
+        return evaluate_modifiers(self.targets, self.mods(levels))[key or OBJECTIVES[self.objective]]
+
+    def extra_points(self, levels: np.ndarray) -> np.ndarray:
+        return (levels - self.base_levels).sum(axis=1)
+
+    def _prepare_bounds(self) -> None:
+        """列ごとの「Lvを上げたときの補正増分」から、残り列での増分の上限表を作る"""
+        n = len(self.names)
+        fields = len(MODIFIER_FIELDS)
+        self.max_gain = np.zeros((n, fields))
+        self.max_ratio = np.zeros((n, fields))
+        base_space = _to_bound_space(self.mods(self.base_levels[None, :]))[0]
+        for col in range(n):
+            options = [lv for lv in self.allowed[col] if lv > self.base_levels[col]]
+            if not options:
+                continue
+            rows = np.repeat(self.base_levels[None, :], len(options), axis=0)
+            rows[:, col] = options
+            gain = np.maximum(_to_bound_space(self.mods(rows)) - base_space, 0.0)
+            cost = (np.array(options) - self.base_levels[col])[:, None]
+            self.max_gain[col] = gain.max(axis=0)
+            self.max_ratio[col] = (gain / cost).max(axis=0)
+        # suffix[d] = 列 d 以降についての合計・最大
+        self.suffix_gain = np.vstack([np.cumsum(self.max_gain[::-1], axis=0)[::-1], np.zeros(fields)])
+        self.suffix_ratio = np.vstack([
+            np.maximum.accumulate(self.max_ratio[::-1], axis=0)[::-1], np.zeros(fields)
+        ])
+
+    def bound(self, levels: np.ndarray, depth: int) -> np.ndarray:
+        """depth 以降の列を自由に選んだときの評価値の上界"""
+        if len(levels) == 0:
+            return np.zeros(0)
+        remaining = np.maximum(self.budget - self.extra_points(levels), 0)[:, None]
+        gain = np.minimum(self.suffix_gain[depth][None, :], remaining * self.suffix_ratio[depth][None, :])
+        mods = _from_bound_space(_to_bound_space(self.mods(levels)) + gain)
+        return evaluate_modifiers(self.targets, mods)[OBJECTIVES[self.objective]]
+
+
+def _merge_top(top: TopList, scores, levels, k: int) -> None:
+    for score, row in zip(scores, levels):
+        item = (float(score), tuple(int(v) for v in row))
+        if len(top) < k:
+            heapq.heappush(top, item)
+        elif item[0] > top[0][0]:
+            heapq.heapreplace(top, item)
+
+
+def _expand(space: _SearchSpace, frontier: np.ndarray, col: int, top: TopList, threshold: float):
+    """
+    frontier の各構成について col 列目の Lv を振った子構成を作る。
+    Lv を変えた子は実際に評価して top に入れ、上界が閾値以下の子は捨てる。
+    戻り値: (子構成, 子の上界, 更新後の閾値)
+    """
+    remaining = space.budget - space.extra_points(frontier)
+    twin = space.twins[col]
+    children = []
+    for lv in space.allowed[col]:
+        keep = remaining >= lv - space.base_levels[col]
+        if twin >= 0:
+            keep &= frontier[:, twin] >= lv
+        rows = frontier[keep].copy()
+        rows[:, col] = lv
+        children.append(rows)
+    children = np.concatenate(children)
+
+    # Lv を変えた構成だけ評価する（変えていない構成は親と同じ）
+    new_rows = children[children[:, col] != space.base_levels[col]]
+    _merge_top(top, space.evaluate(new_rows), new_rows, space.top_k)
+    if len(top) == space.top_k:
+        threshold = max(threshold, top[0][0])
+
+    bounds = space.bound(children, col + 1)
+    keep = bounds > threshold
+    return children[keep], bounds[keep], threshold
+
+
+# ワーカー間で共有する閾値（各ワーカーの上位K件目の最大値 = 全体の上位K件目の下限）
+_shared_threshold = None
+
+
+def _init_worker(shared) -> None:
+    global _shared_threshold
+    _shared_threshold = shared
+
+
+def _sync_threshold(threshold: float) -> float:
+    if _shared_threshold is None:
+        return threshold
+    with _shared_threshold.get_lock():
+        if threshold > _shared_threshold.value:
+            _shared_threshold.value = threshold
+        return _shared_threshold.value
+
+
+def _search(space: _SearchSpace, frontier: np.ndarray, bounds: np.ndarray, depth: int,
+            threshold: float) -> TopList:
+    """
+    depth 列目以降を展開・評価・枝刈りする。
+    候補は上界の高い順に CHUNK_SIZE 件ずつ深さ優先で処理し、メモリを抑えつつ
+    早く良い構成を見つけて閾値（上位K件目の値）を上げる。
+    """
+    top: TopList = []
+    stack = [(frontier, bounds, depth)]
+    while stack:
+        frontier, bounds, col = stack.pop()
+        threshold = _sync_threshold(threshold)
+        frontier = frontier[bounds > threshold]
+        if col >= len(space.names) or len(frontier) == 0:
+            continue
+
+        children, child_bounds, threshold = _expand(space, frontier, col, top, threshold)
+        # 上界の低い塊から積む → 高い塊から取り出される
+        order = np.argsort(child_bounds, kind="stable")
+        for start in range(0, len(order), CHUNK_SIZE):
+            idx = order[start:start + CHUNK_SIZE]
+            stack.append((children[idx], child_bounds[idx], col + 1))
+    return top
+
+
+def _search_worker(args) -> TopList:
+    return _search(*args)
+
+
+def optimize_skills(
+    weapon_name: str,
+    monster_name: str,
+    part_name: str,
+    combo_name: str,
+    max_total_points: int = 20,
+    required_skills: Optional[Dict[str, int]] = None,
+    fixed_uptimes: Optional[Dict[str, float]] = None,
+    categories: Optional[Sequence[str]] = None,
+    objective: str = "dps",
+    top_k: int = 5,
+    processes: int = 1
+) -> List[Dict]:
+    """
+    スキル構成の上位 top_k 件を返す。
+    max_total_points: スキルLvの合計上限
+    required_skills: {スキル名: 最低Lv}（必ず含める）
+    fixed_uptimes: {スキル名: 発動率}（省略したスキルは 1.0）
+    categories: skills_category.json のカテゴリ名で候補を絞る（省略時は全スキル）
+    objective: "dps" または "total_damage"（切れ味が尽きるまでの合計ダメージ）
+    processes: 2以上で探索を複数プロセスに分割する
+    戻り値: [{"スキル": {名前: (Lv, 発動率)}, "DPS", "合計ダメージ", "スキルポイント"}, ...]
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"objective は {list(OBJECTIVES)} のいずれか: {objective}")
+    if top_k < 1:
+        raise ValueError(f"top_k は1以上にしてください: {top_k}")
+    required_skills = dict(required_skills or {})
+    fixed_uptimes = dict(fixed_uptimes or {})
+    skill_defs = loader.get_skills()
+
+    if categories is None:
+        names = list(skill_defs.keys())
+    else:
+        skills_category = loader.get_skills_category()
+        unknown = [c for c in categories if c not in skills_category]
+        if unknown:
+            raise ValueError(f"skills_category.json に存在しないカテゴリ: {unknown}")
+        names = [n for c in categories for n in skills_category[c] if n in skill_defs]
+    names += [n for n in required_skills if n not in names]
+    unknown = [n for n in names if n not in skill_defs]
+    if unknown:
+        raise ValueError(f"skills.json に存在しないスキル: {unknown}")
+    too_high = {
+        n: lv for n, lv in required_skills.items() if lv > max(_level_numbers(skill_defs[n]), default=0)
+    }
+    if too_high:
+        raise ValueError(
+            "必須スキルの Lv が最大 Lv を超えています: "
+            + ", ".join(f"{n} Lv{lv}（最大 Lv{max(_level_numbers(skill_defs[n]), default=0)}）"
+                        for n, lv in too_high.items())
+        )
+
+    base = np.array([required_skills.get(n, 0) for n in names], dtype=np.int64)
+    if base.sum() > max_total_points:
+        raise ValueError(f"必須スキルだけで {base.sum()} ポイントあり、上限 {max_total_points} を超えています")
+    extra_budget = max_total_points - int(base.sum())
+    rates = np.array([fixed_uptimes.get(n, 1.0) for n in names], dtype=np.float64)
+    targets = prepare_targets([weapon_name], [monster_name], [part_name], [combo_name])
+
+    # 各スキル単体での補正（Lvごと）を求め、下位Lvに支配されるLvを外す
+    allowed = []
+    signatures = []
+    for col, name in enumerate(names):
+        lvs = [lv for lv in _level_numbers(skill_defs[name]) if lv >= base[col]]
+        rows = np.zeros((len(lvs), len(names)), dtype=np.int64)
+        rows[:, col] = lvs
+        vecs = _to_bound_space(skill_modifiers_kernel(rows, np.broadcast_to(rates, rows.shape), names, skill_defs))
+        keep = [0] if base[col] == 0 else []
+        kept_vecs = []
+        for lv, vec in zip(lvs, vecs):
+            if lv > base[col] and any(np.all(k >= vec) for k in kept_vecs):
+                continue
+            kept_vecs.append(vec)
+            keep.append(lv)
+        allowed.append(keep)
+        signatures.append((tuple(keep), tuple(map(tuple, np.round(kept_vecs, 12))), base[col]))
+
+    space = _SearchSpace(targets, names, rates, allowed, base, [-1] * len(names),
+                         extra_budget, objective, top_k)
+
+    # 必須構成に足しても、全部積んだ上界から抜いても評価値が変わらないスキルは外す。
+    # 残りは必須構成に足したときの増分が大きい順に並べる
+    root = base[None, :]
+    root_space = _to_bound_space(space.mods(root))
+    singles = root_space + space.max_gain
+    full = root_space + space.max_gain.sum(axis=0)
+    all_but_one = full - space.max_gain
+    key = OBJECTIVES[objective]
+    root_value = evaluate_modifiers(targets, _from_bound_space(root_space))[key][0]
+    gain = evaluate_modifiers(targets, _from_bound_space(singles))[key] - root_value
+    loss = evaluate_modifiers(targets, _from_bound_space(full))[key][0] \
+        - evaluate_modifiers(targets, _from_bound_space(all_but_one))[key]
+    order = [
+        i for i in np.argsort(-gain, kind="stable")
+        if gain[i] > 1e-9 or loss[i] > 1e-9 or base[i] > 0
+    ]
+
+    # 補正が同一のスキルは前のものより Lv を上げない（並べ替えただけの重複構成を作らない）
+    twins = []
+    for pos, i in enumerate(order):
+        prev = [p for p in range(pos) if signatures[order[p]] == signatures[i]]
+        twins.append(prev[-1] if prev else -1)
+
+    space = _SearchSpace(targets, [names[i] for i in order], rates[order], [allowed[i] for i in order],
+                         base[order], twins, extra_budget, objective, top_k)
+    root = base[order][None, :]
+
+    top: TopList = []
+    _merge_top(top, [root_value], root, top_k)
+
+    frontier, bounds, depth = root, np.full(1, np.inf), 0
+    threshold = -np.inf
+    if processes > 1:
+        # 候補がプロセス数の数倍になるまで親で展開してから、上界の高い順に振り分ける
+        while depth < len(space.names) and 0 < len(frontier) < 4 * processes:
+            frontier, bounds, threshold = _expand(space, frontier, depth, top, threshold)
+            depth += 1
+        groups = [g for g in (np.argsort(-bounds)[i::4 * processes] for i in range(4 * processes)) if len(g)]
+        if depth < len(space.names) and groups:
+            shared = multiprocessing.Value("d", threshold)
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                     initargs=(shared,)) as pool:
+                jobs = [(space, frontier[g], bounds[g], depth, threshold) for g in groups]
+                for part_top in pool.map(_search_worker, jobs):
+                    _merge_top(top, [s for s, _ in part_top], [lv for _, lv in part_top], top_k)
+    else:
+        part_top = _search(space, frontier, bounds, depth, threshold)
+        _merge_top(top, [s for s, _ in part_top], [lv for _, lv in part_top], top_k)
+
+    best = sorted(top, reverse=True)
+    best_levels = np.array([levels for _, levels in best], dtype=np.int64)
+    result = evaluate_modifiers(targets, space.mods(best_levels))
+
+    builds = []
+    for i, row in enumerate(best_levels):
+        skills = {
+            name: (int(lv), float(rate))
+            for name, lv, rate in zip(space.names, row, space.rates) if lv > 0
+        }
+        builds.append({
+            "スキル": skills,
+            "DPS": float(result["DPS"][i]),
+            "合計ダメージ": float(result["合計ダメージ"][i]),
+            "スキルポイント": int(row.sum()),
+        })
+    return builds
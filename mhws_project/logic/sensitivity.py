@@ -0,0 +1,118 @@
+# === sensitivity.py（スキルの価値・感度分析） ===
+#
+# 今の構成から1か所だけ変えた構成
+#   - 各スキル Lv+1 / Lv-1（未装備スキルの Lv1 追加も含む。発動率は100%）
+#   - 装備中スキルの発動率 ±10%
+# をまとめて作り、logic/batch.py で1回のバッチ評価にかける。
+# あわせて会心率の上限（calculate_expected_physical は ±100% で頭打ち）までの余裕と、
+# 会心率 +1% あたりの DPS を出して、会心を盛っても意味がなくなる点を示す。
+
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from logic.batch import evaluate_modifiers, prepare_targets, skill_modifiers_kernel
+from logic.skill import get_skill_table
+from utils import loader
+
+RATE_STEP = 0.1       # 発動率を動かす幅
+AFFINITY_CAP = 100.0  # 期待値計算での会心率の上限
+
+
+def _max_levels(table) -> Dict[str, int]:
+    """スキルごとの定義済み最大Lv"""
+    max_levels = {}
+    for name, lv in table.rows:
+        max_levels[name] = max(lv, max_levels.get(name, 0))
+    return max_levels
+
+
+def _perturbations(table, levels: np.ndarray, rates: np.ndarray) -> List[Tuple[str, str, int, float]]:
+    """(スキル名, 変更, 変更後Lv, 変更後発動率) の一覧"""
+    max_levels = _max_levels(table)
+    changes = []
+    for i, name in enumerate(table.names):
+        lv, rate = int(levels[i]), float(rates[i])
+        if lv < max_levels.get(name, 0):
+            changes.append((name, "Lv+1", lv + 1, rate if lv > 0 else 1.0))
+        if lv > 0:
+            changes.append((name, "Lv-1", lv - 1, rate if lv > 1 else 0.0))
+            up = min(rate + RATE_STEP, 1.0)
+            down = max(rate - RATE_STEP, 0.0)
+            if up != rate:
+                changes.append((name, f"発動率+{RATE_STEP:.0%}", lv, up))
+            if down != rate:
+                changes.append((name, f"発動率-{RATE_STEP:.0%}", lv, down))
+    return changes
+
+
+def skill_sensitivity(
+    weapon_name: str,
+    monster_name: str,
+    part_name: str,
+    combo_name: str,
+    skill_input: Mapping[str, Tuple[int, float]],
+    skill_defs: Optional[Mapping] = None
+) -> Dict:
+    """
+    構成の各スキルを1段階動かしたときの DPS・合計ダメージの増減を返す。
+    戻り値:
+      "基準": {"DPS", "合計ダメージ", "会心率"}
+      "スキル": [{"スキル", "変更", "Lv", "発動率", "DPS", "ΔDPS", "合計ダメージ", "Δ合計ダメージ",
+                  "会心率", "会心率超過"}, ...]（ΔDPS の大きい順）
+      "会心": {"会心率", "上限までの余裕", "会心率+1%あたりのΔDPS", "会心率+1%あたりのΔ合計ダメージ"}
+    """
+    if skill_defs is None:
+        skill_defs = loader.get_skills()
+    table = get_skill_table(skill_defs)
+    base_levels, base_rates = table.encode(skill_input)
+
+    changes = _perturbations(table, base_levels, base_rates)
+    n = len(changes) + 1
+    levels = np.repeat(base_levels[None, :], n, axis=0)
+    rates = np.repeat(base_rates[None, :], n, axis=0)
+    for row, (name, _, lv, rate) in enumerate(changes, start=1):
+        col = table.index[name]
+        levels[row, col] = lv
+        rates[row, col] = rate
+
+    targets = prepare_targets([weapon_name], [monster_name], [part_name], [combo_name])
+    mods = skill_modifiers_kernel(levels, rates, table.names, skill_defs)
+    # 最後の2行: 基準構成の会心率 +1%（スキルとは別に会心1点の価値を見る）
+    for key in mods:
+        mods[key] = np.concatenate([mods[key], mods[key][:1], mods[key][:1]])
+    mods["affinity"][-1] += 1.0
+    results = evaluate_modifiers(targets, mods)
+
+    dps = results["DPS"]
+    total = results["合計ダメージ"]
+    affinity = results["会心率"]
+    base_affinity = float(affinity[0])
+
+    rows = []
+    for row, (name, change, lv, rate) in enumerate(changes, start=1):
+        rows.append({
+            "スキル": name,
+            "変更": change,
+            "Lv": lv,
+            "発動率": rate,
+            "DPS": float(dps[row]),
+            "ΔDPS": float(dps[row] - dps[0]),
+            "合計ダメージ": float(total[row]),
+            "Δ合計ダメージ": float(total[row] - total[0]),
+            "会心率": float(affinity[row]),
+            # 上限を超えた分は期待値に効かない
+            "会心率超過": float(max(affinity[row] - AFFINITY_CAP, 0.0)),
+        })
+    rows.sort(key=lambda r: r["ΔDPS"], reverse=True)
+
+    return {
+        "基準": {"DPS": float(dps[0]), "合計ダメージ": float(total[0]), "会心率": base_affinity},
+        "スキル": rows,
+        "会心": {
+            "会心率": base_affinity,
+            "上限までの余裕": max(AFFINITY_CAP - base_affinity, 0.0),
+            "会心率+1%あたりのΔDPS": float(dps[-1] - dps[-2]),
+            "会心率+1%あたりのΔ合計ダメージ": float(total[-1] - total[-2]),
+        },
+    }
@@ -0,0 +1,106 @@
+# === sharpness.py（切れ味ゲージのタイムライン） ===
+#
+# 武器の切れ味ゲージ（色ごとのヒット数）を上の色から順に消費していき、
+# 色ごとの区間でコンボを何周できるか・何ダメージ出るかを求める。
+# 1区間の中では切れ味補正が変わらないので、ヒットごとではなく
+#   周回数 = 色のヒット数 / 1ヒットあたりの期待消費 / コンボのヒット数
+# の閉じた式で区間全体をまとめて計算する。
+
+from typing import Dict, List, Mapping, Optional, Tuple
+
+# 上位の色から順に
+SHARPNESS_ORDER = ("紫", "白", "青", "緑", "黄", "橙", "赤")
+
+
+def get_sharpness_bar(weapon: Mapping) -> List[Tuple[str, int]]:
+    """
+    武器の切れ味ゲージを [(色, ヒット数), ...]（上位の色から）で返す。
+    weapons.json に "sharpness_bar": {"白": 80, "青": 60, ...} があればそれを使い、
+    なければ従来の "sharpness" / "sharpness_hits" の1色だけのゲージとみなす。
+    """
+    bar = weapon.get("sharpness_bar")
+    if bar:
+        unknown = [c for c in bar if c not in SHARPNESS_ORDER]
+        if unknown:
+            raise ValueError(f"不明な切れ味の色: {unknown}")
+        return [(c, int(bar[c])) for c in SHARPNESS_ORDER if bar.get(c, 0) > 0]
+    return [(weapon.get("sharpness", "白"), weapon.get("sharpness_hits", 999))]
+
+
+def _segment(colour: str, start: float, cycles: float, hits: float, combo_time: float,
+             cycle_damage: Mapping[str, Tuple[float, float]], consumes: bool) -> Dict:
+    physical, element = cycle_damage[colour]
+    return {
+        "色": colour,
+        "開始秒": start,
+        "終了秒": start + cycles * combo_time,
+        "ヒット数": hits,
+        "コンボ回数": cycles,
+        "物理": physical * cycles,
+        "属性": element * cycles,
+        "ダメージ": (physical + element) * cycles,
+        "消費あり": consumes,
+    }
+
+
+def build_sharpness_timeline(
+    bar: List[Tuple[str, int]],
+    cycle_damage: Mapping[str, Tuple[float, float]],
+    hits_per_combo: int,
+    combo_time: float,
+    consumption: float = 1.0,
+    takumi_bonus: int = 0,
+    no_consumption_time: float = 0.0,
+    fight_time: Optional[float] = None
+) -> Dict:
+    """
+    bar: get_sharpness_bar() の戻り値
+    cycle_damage: {色: (コンボ1周の物理ダメージ, 属性ダメージ)}
+    consumption: 1ヒットあたりの期待消費（業物・達人芸で 1 未満）
+    takumi_bonus: 匠で最上位の色に足すヒット数
+    no_consumption_time: 剛刃研磨の無消費時間（開始直後に最上位の色で消費なし）
+    fight_time: 指定すると、その秒数で打ち切る。ゲージを使い切った後は最後の色のまま攻撃を続ける
+    戻り値: {"区間": [...], "合計ダメージ", "秒数", "DPS", "切れ味持続秒"}
+    """
+    if not bar:
+        raise ValueError("切れ味ゲージが空です")
+    if hits_per_combo <= 0 or consumption <= 0:
+        raise ValueError("切れ味を消費しないコンボ・構成はタイムラインにできません")
+    bar = [(bar[0][0], bar[0][1] + takumi_bonus)] + list(bar[1:])
+    limit = float("inf") if fight_time is None else fight_time
+
+    segments = []
+    now = 0.0
+
+    def add(colour: str, cycles: float, hits: float, consumes: bool) -> None:
+        nonlocal now
+        if limit - now <= 0 or cycles <= 0:
+            return
+        if now + cycles * combo_time > limit:
+            ratio = (limit - now) / (cycles * combo_time)
+            cycles, hits = cycles * ratio, hits * ratio
+        segments.append(_segment(colour, now, cycles, hits, combo_time, cycle_damage, consumes))
+        now = segments[-1]["終了秒"]
+
+    top = bar[0][0]
+    add(top, no_consumption_time / combo_time, no_consumption_time / combo_time * hits_per_combo, False)
+    for colour, hits in bar:
+        thrown = hits / consumption
+        add(colour, thrown / hits_per_combo, thrown, True)
+    # 最上位の色が落ちた時刻（1色だけのゲージなら使い切った時刻）
+    break_time = next((s["開始秒"] for s in segments if s["色"] != top), now)
+
+    # ゲージを使い切った後は最後の色のまま
+    if fight_time is not None and now < fight_time:
+        last = bar[-1][0]
+        cycles = (fight_time - now) / combo_time
+        add(last, cycles, cycles * hits_per_combo, False)
+
+    total = sum(s["ダメージ"] for s in segments)
+    return {
+        "区間": segments,
+        "合計ダメージ": total,
+        "秒数": now,
+        "DPS": total / now if now > 0 else 0.0,
+        "切れ味持続秒": break_time,
+    }
@@ -1,37 +1,194 @@
-
 import json
 import os
-from typing import Dict, Tuple
+import re
+from functools import cached_property
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from utils.loader import DATA_DIR, get_skills
+
+DATA_PATH = os.path.join(DATA_DIR, "skills.json")
+
+# 効果項目と「未発動時」の値（表の Lv0 列・未定義Lv・未知のスキルはこの値）
+EFFECT_DEFAULTS = {
+    "add": 0.0,
+    "mult": 1.0,
+    "affinity": 0.0,
+    "element_add": 0.0,
+    "element_mult": 1.0,
+    "crit_mult": 1.25,
+    "crit_element_bonus": 1.0,
+    "sharpness_add": 0.0,
+    "sharpness_reduction_prob": 0.0,
+    "crit_sharpness_reduction_prob": 0.0,
+    "no_sharpness_time": 0.0,
+}
+EFFECT_FIELDS = tuple(EFFECT_DEFAULTS)
+_FIELD_INDEX = {field: i for i, field in enumerate(EFFECT_FIELDS)}
+_ADD, _MULT, _AFFINITY, _ELEMENT_ADD, _ELEMENT_MULT = (
+    _FIELD_INDEX[f] for f in ("add", "mult", "affinity", "element_add", "element_mult")
+)
+
+_LEVEL_KEY = re.compile(r"^Lv(\d+)$")
+
+# numpy は配列版（一括計算・最適化）でだけ使うので、1構成の計算では読み込まない（起動時間対策）
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class SkillTable:
+    """
+    skills.json を (項目, スキルID, Lv) の密な配列にしたもの。
+    values[f, i, lv] = スキル i の Lv lv での項目 f の値。
+    最後の行（ID = len(names)）は未知のスキル用で全て既定値。
+    values（numpy 配列）は初めて使うときに作る。
+    """
+
+    def __init__(
+        self,
+        names: Tuple[str, ...],
+        index: Mapping[str, int],
+        max_lv: int,
+        rows: Mapping[Tuple[str, int], Tuple[float, ...]]
+    ):
+        self.names = names
+        self.index = index
+        self.max_lv = max_lv
+        # (スキル名, Lv) → 項目値のタプル（定義のある Lv のみ）。1構成だけの計算用
+        self.rows = rows
+
+    @property
+    def unknown_id(self) -> int:
+        return len(self.names)
+
+    @cached_property
+    def values(self) -> "np.ndarray":
+        """(項目数, スキル数 + 1, max_lv + 1)"""
+        import numpy as np
+
+        defaults = np.array([EFFECT_DEFAULTS[f] for f in EFFECT_FIELDS], dtype=np.float64)
+        values = np.empty((len(EFFECT_FIELDS), len(self.names) + 1, self.max_lv + 1), dtype=np.float64)
+        values[:] = defaults[:, None, None]
+        for (name, lv), row in self.rows.items():
+            values[:, self.index[name], lv] = row
+        return values
+
+    def skill_id(self, name: str) -> int:
+        return self.index.get(name, self.unknown_id)
+
+    def skill_ids(self, names: Sequence[str]) -> "np.ndarray":
+        import numpy as np
+        return np.array([self.skill_id(n) for n in names], dtype=np.int64)
 
-# # skills.json を読み込む
-# def load_skills(path="data/skills.json"):
-#     with open(path, "r", encoding="utf-8") as f:
-#         return json.load(f)
+    def field(self, field: str) -> "np.ndarray":
+        """項目1つ分の (スキル数 + 1, max_lv + 1) 表"""
+        return self.values[_FIELD_INDEX[field]]
 
-# skill.pyのある場所を基準に絶対パスを構築
-# BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-# DATA_PATH = os.path.join(BASE_DIR, "../../data/skills.json")
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))  # mhws_project/
-DATA_PATH = os.path.join(BASE_DIR, "data", "skills.json")
+    def clip_levels(self, levels):
+        """表にない Lv（0 以下・max_lv 超）は Lv0 列（既定値）に寄せる"""
+        import numpy as np
+        levels = np.asarray(levels, dtype=np.int64)
+        return np.where((levels >= 0) & (levels <= self.max_lv), levels, 0)
+
+    def value(self, name: str, level: int, field: str) -> float:
+        row = self.rows.get((name, level))
+        if row is None:
+            return EFFECT_DEFAULTS[field]
+        return row[_FIELD_INDEX[field]]
+
+    def encode(self, skills: Mapping[str, Tuple[int, float]]) -> Tuple["np.ndarray", "np.ndarray"]:
+        """{スキル名: (Lv, 発動率)} → 全スキル分の Lv ベクトルと発動率ベクトル（表のスキルID順）"""
+        import numpy as np
+        levels = np.zeros(len(self.names), dtype=np.int64)
+        rates = np.zeros(len(self.names), dtype=np.float64)
+        for name, (lv, rate) in skills.items():
+            i = self.index.get(name)
+            if i is not None:
+                levels[i] = lv
+                rates[i] = rate
+        return levels, rates
+
+
+def compile_skill_table(skill_defs: Mapping[str, Mapping]) -> SkillTable:
+    names = tuple(skill_defs.keys())
+    levels = {}
+    for name in names:
+        for key in skill_defs[name]:
+            m = _LEVEL_KEY.match(key)
+            if m:
+                levels[(name, int(m.group(1)))] = skill_defs[name][key]
+    max_lv = max([lv for _, lv in levels] + [1])
+
+    rows = {}
+    for name in names:
+        for lv in range(1, max_lv + 1):
+            effect = levels.get((name, lv))
+            if not effect:
+                continue
+            rows[(name, lv)] = tuple(float(effect.get(field, EFFECT_DEFAULTS[field])) for field in EFFECT_FIELDS)
+
+    return SkillTable(names, MappingProxyType({n: i for i, n in enumerate(names)}), max_lv, MappingProxyType(rows))
+
+
+def sum_skill_effects(levels, rates, table: SkillTable, ids: Optional["np.ndarray"] = None) -> Dict[str, "np.ndarray"]:
+    """
+    apply_skill_modifiers の配列版。levels / rates は (..., スキル数) で、最後の軸がスキル。
+    ids は各列のスキルID（省略時は表のスキルID順 = encode() の並び）。
+    戻り値: atk_add / atk_mult / affinity / elem_add / elem_mult の合計（先頭の軸ごと）
+    """
+    import numpy as np
+
+    if ids is None:
+        ids = np.arange(len(table.names))
+    levels = table.clip_levels(levels)
+    rates = np.asarray(rates, dtype=np.float64)
+    effects = table.values[:, ids, levels]  # (項目数, ..., スキル数)
+    return {
+        "atk_add": (effects[_ADD] * rates).sum(axis=-1),
+        "atk_mult": np.prod(effects[_MULT] ** rates, axis=-1),
+        "affinity": (effects[_AFFINITY] * rates).sum(axis=-1),
+        "elem_add": (effects[_ELEMENT_ADD] * rates).sum(axis=-1),
+        "elem_mult": np.prod(effects[_ELEMENT_MULT] ** rates, axis=-1),
+    }
+
+
+# skills.json（読み取り専用ビュー）→ SkillTable
+# combo.py のコンパイル済みコンボと同じく、ビューの同一性で作り直しを判定する。
+_table_cache: List[Tuple[Mapping, SkillTable]] = []
+
+
+def get_skill_table(skill_defs: Optional[Mapping] = None) -> SkillTable:
+    if skill_defs is None:
+        skill_defs = get_skills()
+    if not isinstance(skill_defs, MappingProxyType):
+        return compile_skill_table(skill_defs)
+    if _table_cache and _table_cache[0][0] is skill_defs:
+        return _table_cache[0][1]
+    table = compile_skill_table(skill_defs)
+    _table_cache[:] = [(skill_defs, table)]
+    return table
 
 def load_skills(path=DATA_PATH):
+    """skills.json を返す（既定パスならプロセス共有キャッシュの読み取り専用ビュー）"""
+    if os.path.abspath(path) == os.path.abspath(DATA_PATH):
+        return get_skills()
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
-SKILL_DATA = load_skills()
-
 def apply_skill_modifiers(
     base_attack: float,
     base_affinity: float,
     base_element: float,
     skills: Dict[str, Tuple[int, float]],
-    skill_defs: Dict = SKILL_DATA
+    skill_defs: Optional[Dict] = None
 ) -> Tuple[float, float, float]:
     '''
     skills: {スキル名: (Lv, 発動率)}
     skill_defs: skills.jsonの辞書（省略時はデフォルトロード）
     出力: 補正後の attack, affinity, element
     '''
+    # 1構成だけなら配列演算より、コンパイル済みの行をたどる方が速い（配列版は sum_skill_effects）
+    rows = get_skill_table(skill_defs).rows
     atk_add = 0.0
     atk_mult = 1.0
     affinity = base_affinity
@@ -39,27 +196,25 @@ def apply_skill_modifiers(
     elem_mult = 1.0
 
     for name, (lv, rate) in skills.items():
-        effect = skill_defs.get(name, {}).get(f"Lv{lv}", {})
-        if not effect:
+        effect = rows.get((name, lv))
+        if effect is None:
             continue
 
-        atk_add += effect.get("add", 0) * rate
-        atk_mult *= effect.get("mult", 1.0) ** rate
-        affinity += effect.get("affinity", 0) * rate
-        elem_add += effect.get("element_add", 0) * rate
-        elem_mult *= effect.get("element_mult", 1.0) ** rate
+        atk_add += effect[_ADD] * rate
+        atk_mult *= effect[_MULT] ** rate
+        affinity += effect[_AFFINITY] * rate
+        elem_add += effect[_ELEMENT_ADD] * rate
+        elem_mult *= effect[_ELEMENT_MULT] ** rate
 
     final_attack = base_attack * atk_mult + atk_add
     final_element = base_element * elem_mult + elem_add
 
     return final_attack, affinity, final_element
 
-def get_crit_multiplier_from_skill(skill_name: str, level: int, skill_defs: Dict = SKILL_DATA) -> float:
+def get_crit_multiplier_from_skill(skill_name: str, level: int, skill_defs: Optional[Dict] = None) -> float:
     """クリティカル時の物理補正倍率（超会心など）"""
-    data = skill_defs.get(skill_name, {}).get(f"Lv{level}", {})
-    return data.get("crit_mult", 1.25)  # デフォルト1.25倍
+    return get_skill_table(skill_defs).value(skill_name, level, "crit_mult")  # デフォルト1.25倍
 
-def get_crit_element_bonus(skill_name: str, level: int, skill_defs: Dict = SKILL_DATA) -> float:
+def get_crit_element_bonus(skill_name: str, level: int, skill_defs: Optional[Dict] = None) -> float:
     """クリティカル時の属性補正倍率（会心撃【属性】）"""
-    data = skill_defs.get(skill_name, {}).get(f"Lv{level}", {})
-    return data.get("crit_element_bonus", 1.0)  # デフォルト補正なし
\ No newline at end of file
+    return get_skill_table(skill_defs).value(skill_name, level, "crit_element_bonus")  # デフォルト補正なし
\ No newline at end of file
@@ -0,0 +1,25 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from api_server import CalculationService, LocalClient
+
+
+@pytest.fixture
+def client():
+    service = CalculationService(executor=ThreadPoolExecutor(max_workers=1))
+    yield LocalClient(service)
+    service.close()
+
+
+@pytest.mark.parametrize("skills", [[1], 3, '["攻撃"]'])
+def test_invalid_skills_is_client_error(client, skills):
+    body = {"weapon": "x", "monster": "x", "part": "頭", "combo": "x", "skills": skills}
+    status, result = asyncio.run(client.post("/v1/dps", body))
+    assert status == 400
+    assert "スキル指定" in result["error"]
+
+    status, result = asyncio.run(client.post("/v1/batch", {"scenarios": [body]}))
+    assert status == 200
+    assert "スキル指定" in result["results"][0]["エラー"]
@@ -0,0 +1,50 @@
+from gui import bookmarks
+from gui.bookmarks import BookmarkStore
+
+
+def _entry(name):
+    return {"name": name, "weapon": "テスト"}
+
+
+def test_journal_removed_between_stat_and_read(tmp_path, monkeypatch):
+    path = str(tmp_path / "bookmarks.json")
+    writer = BookmarkStore(path)
+    reader = BookmarkStore(path)
+    writer.add(_entry("a"))
+    assert [e["name"] for e in reader.list()] == ["a"]
+    writer.add(_entry("b"))
+
+    # reader が履歴を stat した直後に、別プロセス（writer）がまとめ直して履歴を消す
+    stamp = bookmarks._stamp
+    compacted = []
+
+    def stamp_then_compact(p):
+        result = stamp(p)
+        if p == reader.journal_path and not compacted:
+            compacted.append(True)
+            writer.compact()
+        return result
+
+    monkeypatch.setattr(bookmarks, "_stamp", stamp_then_compact)
+    assert [e["name"] for e in reader.list()] == ["b", "a"]
+    assert compacted
+
+
+def test_reads_under_lock_when_journal_keeps_disappearing(tmp_path, monkeypatch):
+    path = str(tmp_path / "bookmarks.json")
+    writer = BookmarkStore(path)
+    reader = BookmarkStore(path)
+    writer.add(_entry("a"))
+
+    read_journal = BookmarkStore._read_journal
+    calls = []
+
+    def flaky_read_journal(self, offset):
+        calls.append(offset)
+        if len(calls) <= bookmarks.REFRESH_RETRIES:
+            raise FileNotFoundError(self.journal_path)
+        return read_journal(self, offset)
+
+    monkeypatch.setattr(BookmarkStore, "_read_journal", flaky_read_journal)
+    assert reader.get("a") == _entry("a")
+    assert len(calls) == bookmarks.REFRESH_RETRIES + 1
@@ -0,0 +1,23 @@
+import pytest
+
+from utils import loader
+from utils.simulator import simulate_hunts
+
+
+def _target():
+    weapon = next(iter(loader.get_weapons()))
+    monster, data = next(iter(loader.get_monsters().items()))
+    part = next(iter(data["parts"]))
+    combo = next(iter(loader.get_combos()))
+    return weapon, monster, part, combo
+
+
+@pytest.mark.parametrize("kwargs", [{"trials": 0}, {"trials": -1}, {"chunk_size": 0}])
+def test_simulate_hunts_rejects_empty_runs(kwargs):
+    with pytest.raises(ValueError, match="1以上"):
+        simulate_hunts(*_target(), {}, **kwargs)
+
+
+def test_simulate_hunts_single_trial():
+    result = simulate_hunts(*_target(), {}, trials=1, chunk_size=1)
+    assert len(result["samples"]["DPS"]) == 1
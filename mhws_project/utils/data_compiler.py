@@ -0,0 +1,300 @@
+# === data_compiler.py（ゲームデータの検証と派生インデックス） ===
+#
+# data/*.json をまとめて検証し（JSON Schema + ファイル間の参照チェック）、計算・GUI で使う
+# 派生インデックスを作る。結果はデータのバージョン（utils.loader.data_version）ごとに
+# cache/ に保存するので、検証はデータが変わったときに1回だけ行われる。
+#
+#   python -m utils.data_compiler   # （mhws_project/ で実行）検証 + スナップショット・インデックス作成（デプロイ時用）
+#
+# 不正なデータは DataError（全件の問題をまとめたメッセージ）になり、計算の途中の
+# KeyError にはならない。
+
+import marshal
+import os
+import sys
+from typing import Any, Dict, List, Mapping
+
+from utils import loader
+
+INDEX_FORMAT = 1
+INDEX_FILE = os.path.join(
+    loader.BASE_DIR, "cache", f"data_index.py{sys.version_info[0]}{sys.version_info[1]}.marshal"
+)
+
+SHARPNESS_COLOURS = ["紫", "白", "青", "緑", "黄", "橙", "赤"]
+
+_NUMBER = {"type": "number"}
+_NUMBER_LIST = {"type": "array", "items": _NUMBER}
+
+
+def _named(entry_schema: Dict) -> Dict:
+    """{名前: entry} の形のファイル"""
+    return {"type": "object", "additionalProperties": entry_schema}
+
+
+SCHEMAS = {
+    loader.WEAPONS_FILE: _named({
+        "type": "object",
+        "required": ["attack", "affinity", "element"],
+        "properties": {
+            "attack": {"type": "number", "minimum": 0},
+            "affinity": {"type": "number", "minimum": -100, "maximum": 100},
+            "element": {
+                "type": "object",
+                "required": ["type", "value"],
+                "properties": {"type": {"type": "string"}, "value": {"type": "number", "minimum": 0}},
+            },
+            "sharpness": {"enum": SHARPNESS_COLOURS},
+            "sharpness_hits": {"type": "integer", "minimum": 0},
+            "sharpness_bar": {
+                "type": "object",
+                "propertyNames": {"enum": SHARPNESS_COLOURS},
+                "additionalProperties": {"type": "integer", "minimum": 0},
+            },
+        },
+    }),
+    loader.MONSTERS_FILE: _named({
+        "type": "object",
+        "required": ["parts"],
+        "properties": {
+            "hp": {"type": "number", "exclusiveMinimum": 0},
+            # true のとき hp と phases は出典のない仮の値（討伐時間は目安。GUI・API でもそう表示する）
+            "hp_placeholder": {"type": "boolean"},
+            "parts": _named({
+                "type": "object",
+                "required": ["physical", "element"],
+                "properties": {
+                    "physical": {"type": "number", "minimum": 0},
+                    "element": {"type": "object", "additionalProperties": _NUMBER},
+                },
+            }),
+            # 残り体力の割合が hp_below 以下になると parts の肉質（書いた値だけ）が変わる
+            "phases": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "required": ["name", "hp_below", "parts"],
+                    "properties": {
+                        "name": {"type": "string"},
+                        "hp_below": {"type": "number", "exclusiveMinimum": 0, "exclusiveMaximum": 1},
+                        "parts": _named({
+                            "type": "object",
+                            "properties": {
+                                "physical": {"type": "number", "minimum": 0},
+                                "element": {"type": "object", "additionalProperties": _NUMBER},
+                            },
+                        }),
+                    },
+                },
+            },
+        },
+    }),
+    loader.MOTION_VALUES_FILE: _named({
+        "type": "object",
+        "required": ["motion"],
+        "properties": {
+            "motion": _NUMBER_LIST,
+            "element": _NUMBER_LIST,
+            "stun": _NUMBER_LIST,
+            "time": {"type": "number", "exclusiveMinimum": 0},
+            "start": {"type": "boolean"},
+            "next": {"type": "array", "items": {"type": "string"}},
+        },
+    }),
+    loader.COMBOS_FILE: _named({
+        "type": "object",
+        "required": ["moves", "time"],
+        "properties": {
+            "moves": {"type": "array", "items": {"type": "string"}, "minItems": 1},
+            "time": {"type": "number", "exclusiveMinimum": 0},
+        },
+    }),
+    loader.SKILLS_FILE: _named({
+        "type": "object",
+        "propertyNames": {"pattern": r"^Lv[1-9][0-9]*$"},
+        "additionalProperties": {
+            "type": "object",
+            # 属性攻撃強化の "element" だけは対象の属性名
+            "properties": {"element": {"type": "string"}},
+            "additionalProperties": _NUMBER,
+        },
+    }),
+    loader.SKILLS_CATEGORY_FILE: _named({"type": "array", "items": {"type": "string"}}),
+}
+
+
+class DataError(ValueError):
+    """ゲームデータの問題（errors に1件ずつのメッセージ）"""
+
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        super().__init__(f"ゲームデータに {len(errors)} 件の問題があります:\n" + "\n".join(f"- {e}" for e in errors))
+
+
+def _schema_errors(data: Mapping[str, Any]) -> List[str]:
+    import jsonschema  # 検証するときだけ読み込む（起動時間対策）
+
+    errors = []
+    for filename, schema in SCHEMAS.items():
+        validator = jsonschema.Draft7Validator(schema)
+        for error in sorted(validator.iter_errors(data[filename]), key=lambda e: list(map(str, e.absolute_path))):
+            where = " / ".join(str(p) for p in error.absolute_path) or "(全体)"
+            errors.append(f"{filename}: {where}: {error.message}")
+    return errors
+
+
+def _reference_errors(data: Mapping[str, Any]) -> List[str]:
+    """ファイルをまたいだ名前の参照"""
+    errors = []
+    weapons = data[loader.WEAPONS_FILE]
+    monsters = data[loader.MONSTERS_FILE]
+    motions = data[loader.MOTION_VALUES_FILE]
+    combos = data[loader.COMBOS_FILE]
+    skills = data[loader.SKILLS_FILE]
+
+    element_types = sorted({w["element"]["type"] for w in weapons.values()})
+    for monster, monster_data in monsters.items():
+        for part, part_data in monster_data["parts"].items():
+            for element in element_types:
+                if element not in part_data["element"]:
+                    errors.append(f"{loader.MONSTERS_FILE}: {monster} / {part}: 属性「{element}」の肉質がありません")
+        for phase in monster_data.get("phases", []):
+            for part in phase["parts"]:
+                if part not in monster_data["parts"]:
+                    errors.append(f"{loader.MONSTERS_FILE}: {monster} / {phase['name']}: 部位「{part}」がありません")
+    for combo, combo_data in combos.items():
+        for move in combo_data["moves"]:
+            if move not in motions:
+                errors.append(f"{loader.COMBOS_FILE}: {combo}: 技「{move}」が {loader.MOTION_VALUES_FILE} にありません")
+    for move, move_data in motions.items():
+        if len(move_data.get("element", [])) > len(move_data["motion"]):
+            errors.append(f"{loader.MOTION_VALUES_FILE}: {move}: element が motion より長いです")
+        for follow in move_data.get("next", []):
+            if follow not in motions:
+                errors.append(f"{loader.MOTION_VALUES_FILE}: {move}: 派生先「{follow}」がありません")
+    for category, names in data[loader.SKILLS_CATEGORY_FILE].items():
+        for name in names:
+            if name not in skills:
+                errors.append(f"{loader.SKILLS_CATEGORY_FILE}: {category}: スキル「{name}」が {loader.SKILLS_FILE} にありません")
+    return errors
+
+
+def validate(data: Mapping[str, Any]) -> List[str]:
+    """{ファイル名: 中身} を検証して問題のメッセージを返す（空なら問題なし）"""
+    errors = _schema_errors(data)
+    if errors:
+        return errors  # 形が崩れていると参照チェックが KeyError になるので先に返す
+    return _reference_errors(data)
+
+
+def build_index(data: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    検証済みデータから派生インデックスを作る:
+      ids               種類ごとの 名前 → 番号（weapons / monsters / skills / combos / moves）
+      element_types     属性の種類（part_elements の並び順）
+      part_elements     モンスター → 部位 → 属性肉質の配列（element_types 順）
+      combo_hits        コンボ → 切れ味消費ヒット数（logic.combo.compile_combo と同じ数え方）
+      skill_category    スキル → カテゴリ（skills_category.json）
+      uncategorized_skills  どのカテゴリにもないスキル（名前順）
+    """
+    weapons = data[loader.WEAPONS_FILE]
+    monsters = data[loader.MONSTERS_FILE]
+    motions = data[loader.MOTION_VALUES_FILE]
+    combos = data[loader.COMBOS_FILE]
+    skills = data[loader.SKILLS_FILE]
+
+    element_types = sorted(
+        {w["element"]["type"] for w in weapons.values()}
+        | {e for m in monsters.values() for p in m["parts"].values() for e in p["element"]}
+    )
+    skill_category = {
+        name: category for category, names in data[loader.SKILLS_CATEGORY_FILE].items() for name in names
+    }
+    return {
+        "ids": {
+            "weapons": {name: i for i, name in enumerate(weapons)},
+            "monsters": {name: i for i, name in enumerate(monsters)},
+            "skills": {name: i for i, name in enumerate(skills)},
+            "combos": {name: i for i, name in enumerate(combos)},
+            "moves": {name: i for i, name in enumerate(motions)},
+        },
+        "element_types": element_types,
+        "part_elements": {
+            monster: {
+                part: [part_data["element"].get(e, 0) for e in element_types]
+                for part, part_data in monster_data["parts"].items()
+            }
+            for monster, monster_data in monsters.items()
+        },
+        "combo_hits": {
+            combo: sum(len(motions.get(move, {}).get("motion", [1.0])) for move in combo_data["moves"])
+            for combo, combo_data in combos.items()
+        },
+        "skill_category": skill_category,
+        "uncategorized_skills": sorted(name for name in skills if name not in skill_category),
+    }
+
+
+def compile_data() -> Dict[str, Any]:
+    """今の data/*.json を検証してインデックスを作る（不正なら DataError）"""
+    data = {filename: loader.thaw(loader.load_data(filename)) for filename in loader.GAME_DATA_FILES}
+    errors = validate(data)
+    if errors:
+        raise DataError(errors)
+    return build_index(data)
+
+
+# (データのバージョン, 読み取り専用インデックス)
+_index_cache: List = []
+
+
+def _read_saved(version: str):
+    try:
+        with open(INDEX_FILE, "rb") as f:
+            saved = marshal.load(f)
+        if saved.get("format") == INDEX_FORMAT and saved.get("version") == version:
+            return saved["index"]
+    except (OSError, EOFError, ValueError, TypeError, AttributeError):
+        pass
+    return None
+
+
+def _write_saved(version: str, index: Dict[str, Any]) -> None:
+    try:
+        os.makedirs(os.path.dirname(INDEX_FILE), exist_ok=True)
+        tmp_path = f"{INDEX_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            marshal.dump({"format": INDEX_FORMAT, "version": version, "index": index}, f)
+        os.replace(tmp_path, INDEX_FILE)
+    except OSError:
+        pass
+
+
+def get_data_index() -> Mapping[str, Any]:
+    """
+    検証済みデータの派生インデックス（読み取り専用）。
+    データが変わったときだけ検証・作成し直し、不正なデータなら DataError を出す。
+    """
+    version = loader.data_version()
+    cached = _index_cache
+    if cached and cached[0] == version:
+        return cached[1]
+    index = _read_saved(version)
+    if index is None:
+        index = compile_data()
+        _write_saved(version, index)
+    frozen = loader.freeze(index)
+    _index_cache[:] = [version, frozen]
+    return frozen
+
+
+if __name__ == "__main__":
+    try:
+        loader.build_snapshot()
+        index = compile_data()
+    except DataError as e:
+        print(e)
+        sys.exit(1)
+    _write_saved(loader.data_version(), index)
+    counts = ", ".join(f"{kind} {len(names)}" for kind, names in index["ids"].items())
+    print(f"データに問題はありません（{counts}）")
@@ -0,0 +1,235 @@
+# === history.py（計算結果の履歴ストア） ===
+#
+# run_full_dps_calculation の結果を SQLite（WAL モード）に1行ずつ貯める。
+# 武器・モンスター・部位・コンボ名・時刻に索引があるので、件数が増えても絞り込みは速く、
+# グラフ用には必要な列だけ（query）や、間引いた要約（downsample）を取り出せる。
+#
+#   store = get_history_store()                       # results/history.sqlite3
+#   store.query(["時刻", "DPS"], where={"武器": "アーティア"}, limit=5, newest_first=True)
+#   store.downsample("DPS", points=200)               # 全履歴を200区間の 平均/最小/最大 に
+#
+# 保持期間（RetentionPolicy）を超えた古い行は、書き込みのたびに上限件数ずつ消す
+# （一度に全件を消して書き込みを待たせない）。
+
+import csv
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence
+
+TEXT_COLUMNS = ("武器", "モンスター", "部位", "切れ味", "スキル構成", "コンボ名")
+NUMBER_COLUMNS = (
+    "補正攻撃力", "会心率", "補正属性", "期待値攻撃", "物理肉質後", "属性肉質後",
+    "物理合計", "属性合計", "コンボ時間", "DPS", "元切れ味Hit", "実効Hit", "コンボ回数", "維持秒数",
+)
+COLUMNS = ("id", "時刻") + TEXT_COLUMNS + NUMBER_COLUMNS
+INDEXED_COLUMNS = ("武器", "モンスター", "部位", "コンボ名")
+
+SCHEMA_VERSION = 1
+DEFAULT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "results", "history.sqlite3"))
+
+
+class RetentionPolicy(NamedTuple):
+    """履歴の保持方針（None は無制限）。batch は1回の書き込みで消す最大件数"""
+    max_rows: Optional[int] = 100_000
+    max_age_days: Optional[float] = None
+    batch: int = 1000
+
+
+def _quote(column: str) -> str:
+    if column not in COLUMNS:
+        raise KeyError(f"履歴に列「{column}」はありません")
+    return f'"{column}"'
+
+
+class HistoryStore:
+    """
+    計算結果の履歴（1行 = 1回の計算）。スレッド間で共有してよい。
+    書き込みは1プロセスから、読み込みは別プロセス（GUI など）からも同時にできる（WAL）。
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, retention: RetentionPolicy = RetentionPolicy()):
+        import sqlite3  # 履歴を使うときだけ読み込む（起動時間対策）
+
+        self.path = path
+        self.retention = retention
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create()
+
+    def _create(self) -> None:
+        columns = ", ".join(
+            ['id INTEGER PRIMARY KEY', '"時刻" REAL NOT NULL']
+            + [f'"{c}" TEXT' for c in TEXT_COLUMNS]
+            + [f'"{c}" REAL' for c in NUMBER_COLUMNS]
+        )
+        with self._lock:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS runs ({columns})")
+            self._conn.execute('CREATE INDEX IF NOT EXISTS runs_time ON runs ("時刻")')
+            for i, column in enumerate(INDEXED_COLUMNS):
+                # 「この武器の最近の結果」を索引だけで引けるよう、時刻を後ろに付ける
+                self._conn.execute(f'CREATE INDEX IF NOT EXISTS runs_key{i} ON runs ("{column}", "時刻")')
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ── 書き込み ──
+
+    def append(self, rows: Iterable[Mapping[str, Any]]) -> int:
+        """行（{列名: 値}、時刻省略時は今）を追加し、保持方針を超えた分を少し消す。追加件数を返す"""
+        names = ("時刻",) + TEXT_COLUMNS + NUMBER_COLUMNS
+        now = time.time()
+        values = [tuple(row.get(name, now) if name == "時刻" else row.get(name) for name in names) for row in rows]
+        if not values:
+            return 0
+        sql = f"INSERT INTO runs ({', '.join(map(_quote, names))}) VALUES ({', '.join('?' * len(names))})"
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(sql, values)
+                self._prune(self.retention.batch)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(values)
+
+    def _prune(self, limit: Optional[int]) -> int:
+        """保持方針を超えた古い行を最大 limit 件（方針ごと）消す。ロック・トランザクション内で呼ぶ"""
+        deleted = 0
+        cap = -1 if limit is None else limit
+        policy = self.retention
+        if policy.max_rows is not None:
+            # id は追加順の連番なので、最新 max_rows 件より前の id を主キーの範囲で消せる
+            (newest,) = self._conn.execute("SELECT MAX(id) FROM runs").fetchone()
+            if newest is not None:
+                deleted += self._conn.execute(
+                    "DELETE FROM runs WHERE id IN (SELECT id FROM runs WHERE id <= ? ORDER BY id LIMIT ?)",
+                    (newest - policy.max_rows, cap)
+                ).rowcount
+        if policy.max_age_days is not None:
+            cutoff = time.time() - policy.max_age_days * 86400
+            deleted += self._conn.execute(
+                'DELETE FROM runs WHERE id IN (SELECT id FROM runs WHERE "時刻" < ? ORDER BY "時刻" LIMIT ?)',
+                (cutoff, cap)
+            ).rowcount
+        return deleted
+
+    def prune(self) -> int:
+        """保持方針を超えた行をすべて消す（メンテナンス用）。消した件数を返す"""
+        with self._lock:
+            return self._prune(None)
+
+    def import_csv(self, filepath: str) -> int:
+        """
+        以前の results/dps_log.csv（ヘッダー行あり・なしどちらも可）を取り込む。
+        時刻はファイルの更新時刻（行の順序は保つ）。
+        """
+        if not os.path.exists(filepath):
+            return 0
+        mtime = os.path.getmtime(filepath)
+        columns = TEXT_COLUMNS + NUMBER_COLUMNS
+        with open(filepath, newline="", encoding="utf-8") as f:
+            rows = [
+                {"時刻": mtime, **dict(zip(columns, row))}
+                for row in csv.reader(f)
+                if len(row) == len(columns) and row[0] != "武器"
+            ]
+        return self.append(rows)
+
+    # ── 読み込み ──
+
+    @staticmethod
+    def _where(where: Optional[Mapping[str, Any]], since: Optional[float], until: Optional[float]):
+        clauses = []
+        params: List[Any] = []
+        for column, value in (where or {}).items():
+            clauses.append(f"{_quote(column)} = ?")
+            params.append(value)
+        if since is not None:
+            clauses.append('"時刻" >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('"時刻" < ?')
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def count(self, where: Optional[Mapping[str, Any]] = None,
+              since: Optional[float] = None, until: Optional[float] = None) -> int:
+        sql, params = self._where(where, since, until)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM runs{sql}", params).fetchone()[0]
+
+    def query(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        where: Optional[Mapping[str, Any]] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None,
+        newest_first: bool = False
+    ) -> Dict[str, list]:
+        """
+        指定した列だけを {列名: 値のリスト} で返す（そのまま DataFrame にできる）。
+        where は {列名: 値} の一致条件、since / until は時刻（time.time() の秒）の範囲。
+        """
+        columns = list(columns or COLUMNS)
+        sql, params = self._where(where, since, until)
+        order = "DESC" if newest_first else "ASC"
+        sql = f"SELECT {', '.join(map(_quote, columns))} FROM runs{sql} ORDER BY id {order}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return {column: [row[i] for row in rows] for i, column in enumerate(columns)}
+
+    def downsample(
+        self,
+        column: str,
+        points: int = 500,
+        where: Optional[Mapping[str, Any]] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None
+    ) -> Dict[str, list]:
+        """
+        条件に合う行を古い順に最大 points 区間へ分け、区間ごとの 件数 / 平均 / 最小 / 最大 と
+        区間の最初の id・最後の時刻を返す。集計は SQLite の中で行い、行そのものは読み込まない。
+        """
+        value = _quote(column)
+        sql, params = self._where(where, since, until)
+        with self._lock:
+            first, last = self._conn.execute(f"SELECT MIN(id), MAX(id) FROM runs{sql}", params).fetchone()
+            if first is None:
+                rows = []
+            else:
+                span = last - first + 1
+                rows = self._conn.execute(
+                    f'SELECT MIN(id), MAX("時刻"), COUNT(*), AVG({value}), MIN({value}), MAX({value}) '
+                    f"FROM runs{sql} GROUP BY (id - ?) * ? / ? ORDER BY 1",
+                    params + [first, max(1, int(points)), span]
+                ).fetchall()
+        keys = ("id", "時刻", "件数", "平均", "最小", "最大")
+        return {key: [row[i] for row in rows] for i, key in enumerate(keys)}
+
+
+_default_store: Optional[HistoryStore] = None
+_default_lock = threading.Lock()
+
+
+def get_history_store() -> HistoryStore:
+    """results/history.sqlite3 のプロセス共通のストア（初回は以前の dps_log.csv を取り込む）"""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            is_new = not os.path.exists(DEFAULT_PATH)
+            _default_store = HistoryStore(DEFAULT_PATH)
+            if is_new:
+                _default_store.import_csv(os.path.join(os.path.dirname(DEFAULT_PATH), "dps_log.csv"))
+        return _default_store
@@ -0,0 +1,40 @@
+# === lazy.py（重いモジュールの遅延 import） ===
+#
+#   pd = lazy_import("pandas")
+#   ...
+#   pd.DataFrame(...)   # ここで初めて pandas を import する
+#
+# GUI の初回表示で使わない pandas / altair などの読み込みを後回しにして起動を速くする。
+
+import importlib
+from types import ModuleType
+from typing import Optional
+
+
+class LazyModule:
+    """属性に初めて触れたときに import するモジュールの代理"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str):
+        # _name / _module は __init__ で設定済みなのでここには来ない
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
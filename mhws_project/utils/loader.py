@@ -1 +1,240 @@
-# JSON/YAMLの読み込み
\ No newline at end of file
+# === loader.py（JSON読み込み・プロセス共有キャッシュ） ===
+
+import hashlib
+import json
+import marshal
+import os
+import sys
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Tuple
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))  # mhws_project/
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+SKILLS_FILE = "skills.json"
+WEAPONS_FILE = "weapons.json"
+MONSTERS_FILE = "monsters.json"
+MOTION_VALUES_FILE = "motion_values.json"
+COMBOS_FILE = "combos.json"
+SKILLS_CATEGORY_FILE = "skills_category.json"
+
+GAME_DATA_FILES = (
+    SKILLS_FILE,
+    WEAPONS_FILE,
+    MONSTERS_FILE,
+    MOTION_VALUES_FILE,
+    COMBOS_FILE,
+    SKILLS_CATEGORY_FILE,
+)
+
+# 起動を速くするため、パース済みの JSON を marshal 形式でまとめて保存しておく（cache/ は git 管理外）。
+# 中身: {"format": SNAPSHOT_FORMAT, "files": {ファイル名: {"stamp": (mtime_ns, size), "sha256": ..., "data": ...}}}
+# stamp が一致すればそのまま、違っても内容の sha256 が一致すれば使う。どちらも違えば JSON を
+# 読み直してスナップショットを書き直す。marshal の形式は Python のバージョンで変わるので
+# ファイル名にバージョンを入れる。
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_FILE = os.path.join(
+    BASE_DIR, "cache", f"data_snapshot.py{sys.version_info[0]}{sys.version_info[1]}.marshal"
+)
+
+# ファイルの更新確認（stat）は同じファイルについて RECHECK_INTERVAL 秒に1回まで。
+# 計算1回ごとに全ファイルを stat しないためで、data/*.json の変更は最大この秒数遅れて反映される。
+RECHECK_INTERVAL = 1.0
+
+# ファイル名 → ((mtime_ns, size), 読み取り専用データ)
+_cache: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+# ファイル名 → ((mtime_ns, size), 内容の sha256)
+_digests: Dict[str, Tuple[Tuple[int, int], str]] = {}
+# ファイル名 → 最後に stat した時刻（time.monotonic）。_cache 用と _digests 用で別々に持つ
+_checked: Dict[str, float] = {}
+_digest_checked: Dict[str, float] = {}
+# (全ファイルの sha256, data_version の値)
+_version: Tuple[Tuple[str, ...], str] = ((), "")
+_lock = threading.Lock()
+# 読み込んだスナップショットの "files"（None = まだ読んでいない）
+_snapshot: Any = None
+
+
+def freeze(obj: Any) -> Any:
+    """dict → MappingProxyType、list → tuple に再帰変換して読み取り専用にする"""
+    if isinstance(obj, dict):
+        return MappingProxyType({k: freeze(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return tuple(freeze(v) for v in obj)
+    return obj
+
+
+def thaw(obj: Any) -> Any:
+    """freeze() の逆変換（書き換え可能なコピーが必要なとき用）"""
+    if isinstance(obj, Mapping):
+        return {k: thaw(v) for k, v in obj.items()}
+    if isinstance(obj, tuple):
+        return [thaw(v) for v in obj]
+    return obj
+
+
+def _file_stamp(path: str) -> Tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _recently_checked(checked: Dict[str, float], filename: str, now: float) -> bool:
+    return now - checked.get(filename, -RECHECK_INTERVAL) < RECHECK_INTERVAL
+
+
+def _read_snapshot() -> Dict[str, Dict]:
+    global _snapshot
+    if _snapshot is None:
+        _snapshot = {}
+        try:
+            with open(SNAPSHOT_FILE, "rb") as f:
+                saved = marshal.load(f)
+            if isinstance(saved, dict) and saved.get("format") == SNAPSHOT_FORMAT:
+                _snapshot = saved["files"]
+        except (OSError, EOFError, ValueError, TypeError, KeyError):
+            pass  # ないか壊れていれば JSON から作り直す
+    return _snapshot
+
+
+def _write_snapshot() -> None:
+    try:
+        os.makedirs(os.path.dirname(SNAPSHOT_FILE), exist_ok=True)
+        tmp_path = f"{SNAPSHOT_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            marshal.dump({"format": SNAPSHOT_FORMAT, "files": _snapshot}, f)
+        os.replace(tmp_path, SNAPSHOT_FILE)
+    except OSError:
+        pass  # 書けない環境（読み取り専用など）では毎回 JSON を読むだけ
+
+
+def _load_raw(filename: str, path: str, stamp: Tuple[int, int]) -> Any:
+    """スナップショットが最新ならそこから、古ければ JSON から読む（_lock 内で呼ぶ）"""
+    snapshot = _read_snapshot()
+    entry = snapshot.get(filename)
+    if entry is not None and tuple(entry["stamp"]) == stamp:
+        _digests[filename] = (stamp, entry["sha256"])
+        return entry["data"]
+
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+    _digests[filename] = (stamp, digest)
+    if entry is not None and entry["sha256"] == digest:
+        data = entry["data"]  # 触っただけで中身は同じ
+    else:
+        data = json.loads(raw.decode("utf-8"))
+    snapshot[filename] = {"stamp": stamp, "sha256": digest, "data": data}
+    _write_snapshot()
+    return data
+
+
+def load_data(filename: str) -> Any:
+    """
+    data/ 以下のJSONを読み込む（プロセス内で1回だけパース）。
+    mtime/サイズが変わっていれば読み直す。戻り値は読み取り専用ビュー。
+    """
+    now = time.monotonic()
+    entry = _cache.get(filename)
+    if entry is not None and _recently_checked(_checked, filename, now):
+        return entry[1]
+    path = os.path.join(DATA_DIR, filename)
+    stamp = _file_stamp(path)
+    if entry is not None and entry[0] == stamp:
+        _checked[filename] = now
+        return entry[1]
+
+    with _lock:
+        entry = _cache.get(filename)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        data = freeze(_load_raw(filename, path, stamp))
+        _cache[filename] = (stamp, data)
+        _checked[filename] = now
+        return data
+
+
+def build_snapshot() -> str:
+    """全ゲームデータのスナップショットを作り直す（デプロイ時に先に作っておく用）。戻り値は保存先"""
+    global _snapshot
+    with _lock:
+        _snapshot = {}
+        for filename in GAME_DATA_FILES:
+            path = os.path.join(DATA_DIR, filename)
+            _load_raw(filename, path, _file_stamp(path))
+    return SNAPSHOT_FILE
+
+
+def file_digest(filename: str) -> str:
+    """data/ 以下のファイル内容の sha256（mtime/サイズが変わったときだけ計算し直す）"""
+    now = time.monotonic()
+    entry = _digests.get(filename)
+    if entry is not None and _recently_checked(_digest_checked, filename, now):
+        return entry[1]
+    path = os.path.join(DATA_DIR, filename)
+    stamp = _file_stamp(path)
+    if entry is None or entry[0] != stamp:
+        with open(path, "rb") as f:
+            entry = (stamp, hashlib.sha256(f.read()).hexdigest())
+        _digests[filename] = entry
+    _digest_checked[filename] = now
+    return entry[1]
+
+
+def data_version() -> str:
+    """
+    ゲームデータ全体のバージョン（全ファイルの内容ハッシュをまとめたもの）。
+    どれか1つでも中身が変われば別の値になる。計算結果キャッシュのキー用。
+    """
+    global _version
+    digests = tuple(file_digest(filename) for filename in GAME_DATA_FILES)
+    if _version[0] == digests:
+        return _version[1]
+    h = hashlib.sha256()
+    for filename, digest in zip(GAME_DATA_FILES, digests):
+        h.update(filename.encode("utf-8"))
+        h.update(digest.encode("ascii"))
+    _version = (digests, h.hexdigest()[:16])
+    return _version[1]
+
+
+def clear_cache() -> None:
+    """キャッシュを破棄する（テスト・データ差し替え用）"""
+    global _snapshot, _version
+    with _lock:
+        _cache.clear()
+        _digests.clear()
+        _checked.clear()
+        _digest_checked.clear()
+        _version = ((), "")
+        _snapshot = None
+
+
+def get_skills() -> Mapping[str, Mapping]:
+    return load_data(SKILLS_FILE)
+
+
+def get_weapons() -> Mapping[str, Mapping]:
+    return load_data(WEAPONS_FILE)
+
+
+def get_monsters() -> Mapping[str, Mapping]:
+    return load_data(MONSTERS_FILE)
+
+
+def get_motion_values() -> Mapping[str, Mapping]:
+    return load_data(MOTION_VALUES_FILE)
+
+
+def get_combos() -> Mapping[str, Mapping]:
+    return load_data(COMBOS_FILE)
+
+
+def get_skills_category() -> Mapping[str, Tuple[str, ...]]:
+    return load_data(SKILLS_CATEGORY_FILE)
+
+
+if __name__ == "__main__":
+    # python utils/loader.py でスナップショットを作る
+    print(f"スナップショットを作成しました: {build_snapshot()}")
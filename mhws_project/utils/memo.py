@@ -0,0 +1,176 @@
+# === memo.py（計算結果のメモ化キャッシュ） ===
+#
+# 同じ構成（武器・モンスター・部位・コンボ・スキル）の計算結果を使い回す。
+# キーはスキルの並び順や Lv0 / 発動率0 のスキルに左右されない正規化済みの指紋で、
+# ゲームデータのバージョン（utils.loader.data_version）を含むので、
+# data/*.json が変わると自動的に別キーになり、古い結果は捨てられる。
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple, Union
+
+from utils import loader, profiling
+
+DEFAULT_MAXSIZE = 1024
+
+
+def normalize_skills(skills: Mapping[str, Tuple[int, float]]) -> Dict[str, Tuple[int, float]]:
+    """Lv0・発動率0 のスキルを除き、スキル名順に並べる"""
+    normalized = {}
+    for name in sorted(skills):
+        lv, rate = skills[name]
+        if int(lv) <= 0 or float(rate) <= 0:
+            continue
+        normalized[name] = (int(lv), float(rate))
+    return normalized
+
+
+def build_fingerprint(
+    weapon_name: str,
+    monster_name: str,
+    part_name: Union[str, Mapping[str, float]],
+    combo_name: str,
+    skills: Mapping[str, Tuple[int, float]],
+    fight_time: Optional[float] = None,
+    data_version: Optional[str] = None
+) -> str:
+    """構成の正規化済みハッシュ。data_version 省略時は現在のデータのバージョンを使う"""
+    payload = [
+        data_version or loader.data_version(),
+        weapon_name, monster_name,
+        # 部位の重み（{部位: 重み}）は指定順のまま（結果の部位名の並びが変わるため）
+        part_name if isinstance(part_name, str) else [[part, round(float(w), 6)] for part, w in part_name.items()],
+        combo_name,
+        [[name, lv, round(rate, 6)] for name, (lv, rate) in normalize_skills(skills).items()],
+        fight_time,
+    ]
+    text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    件数上限つき LRU キャッシュ。スレッドセーフ。
+    path を指定すると JSON ファイルに保存・復元する（保存は save() かプロセス終了時）。
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+            atexit.register(self.save)
+
+    def _check_version(self, version: str) -> None:
+        # データが変わったら古いバージョンの結果は二度と当たらないので全部捨てる
+        if self._version != version:
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key: str, version: str) -> Optional[Any]:
+        with self._lock:
+            self._check_version(version)
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, version: str, value: Any) -> None:
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(
+        self,
+        weapon_name: str,
+        monster_name: str,
+        part_name: Union[str, Mapping[str, float]],
+        combo_name: str,
+        skills: Mapping[str, Tuple[int, float]],
+        compute: Callable[..., Any],
+        fight_time: Optional[float] = None
+    ) -> Any:
+        """
+        キャッシュにあればそれを、なければ compute(武器, モンスター, 部位, コンボ, 正規化スキル, fight_time) を返す。
+        戻り値はキャッシュと共有なので書き換えないこと。
+        """
+        with profiling.stage("結果キャッシュ照合"):
+            version = loader.data_version()
+            key = build_fingerprint(weapon_name, monster_name, part_name, combo_name, skills, fight_time, version)
+            value = self.get(key, version)
+        if value is None:
+            value = compute(weapon_name, monster_name, part_name, combo_name, normalize_skills(skills), fight_time)
+            self.put(key, version, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    # ── 永続化 ──
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return  # 壊れたキャッシュは使わない
+        if saved.get("version") != loader.data_version():
+            return
+        self._version = saved["version"]
+        for key, value in saved.get("entries", [])[-self.maxsize:]:
+            self._entries[key] = value
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            saved = {"version": self._version, "entries": list(self._entries.items())}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(saved, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+_default_cache: Optional[ResultCache] = None
+_default_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """プロセス共通のメモリ上のキャッシュ"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache()
+        return _default_cache
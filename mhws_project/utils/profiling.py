@@ -0,0 +1,144 @@
+# === profiling.py（処理段階ごとの時間計測） ===
+#
+#   with profiling.stage("スキル補正"):
+#       ...
+# のように囲んだ区間の経過時間と呼び出し回数を段階名ごとに集計する。
+# 無効時（既定）は何もしない共有オブジェクトを返すだけなので、ほぼコストはかからない。
+# 集計はプロセス全体で共有（スレッドセーフ）。
+#
+# オン/オフは2段階:
+#   enable() / disable()   プロセス全体の既定（ベンチマーク・スクリプト用）
+#   set_local(True/False)  今のコンテキストだけ（Streamlit ではセッションの1回の実行。他のセッションには影響しない）
+
+import json
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# ヒストグラムの区切り（秒）: 1µs から 2 倍ずつ約 17 分まで
+HISTOGRAM_EDGES = tuple(1e-6 * 2 ** i for i in range(31))
+
+_enabled = False
+# None ならプロセス全体の既定（_enabled）に従う
+_local_enabled: ContextVar[Optional[bool]] = ContextVar("profiling_enabled", default=None)
+_lock = threading.Lock()
+_stats: Dict[str, Dict] = {}
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def stage(name: str):
+    """区間を計測するコンテキストマネージャ（無効時は何もしない）"""
+    if not is_enabled():
+        return _NULL_STAGE
+    return _Stage(name)
+
+
+def _bucket(seconds: float) -> int:
+    if seconds <= HISTOGRAM_EDGES[0]:
+        return 0
+    return min(int(math.ceil(math.log2(seconds / HISTOGRAM_EDGES[0]))), len(HISTOGRAM_EDGES) - 1)
+
+
+def record(name: str, seconds: float) -> None:
+    """計測値を1件追加する"""
+    with _lock:
+        entry = _stats.get(name)
+        if entry is None:
+            entry = _stats[name] = {
+                "count": 0, "total": 0.0, "min": math.inf, "max": 0.0,
+                "histogram": [0] * len(HISTOGRAM_EDGES),
+            }
+        entry["count"] += 1
+        entry["total"] += seconds
+        entry["min"] = min(entry["min"], seconds)
+        entry["max"] = max(entry["max"], seconds)
+        entry["histogram"][_bucket(seconds)] += 1
+
+
+def enable() -> None:
+    """プロセス全体で計測する（set_local で決めたコンテキストは除く）"""
+    global _enabled
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def set_local(enabled: Optional[bool]) -> None:
+    """今のコンテキストだけ計測のオン/オフを決める（None でプロセス全体の既定に戻す）"""
+    _local_enabled.set(enabled)
+
+
+def is_enabled() -> bool:
+    local = _local_enabled.get()
+    return _enabled if local is None else local
+
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
+
+
+def snapshot() -> Dict[str, Dict]:
+    """
+    段階名 → {"count", "total", "mean", "min", "max", "histogram"}（秒）。
+    histogram は {区切りの上限（秒）: 件数}（件数0の区間は省く）。
+    """
+    with _lock:
+        result = {}
+        for name, entry in _stats.items():
+            result[name] = {
+                "count": entry["count"],
+                "total": entry["total"],
+                "mean": entry["total"] / entry["count"],
+                "min": entry["min"],
+                "max": entry["max"],
+                "histogram": {
+                    HISTOGRAM_EDGES[i]: n for i, n in enumerate(entry["histogram"]) if n
+                },
+            }
+        return result
+
+
+def export_json(path: Optional[str] = None) -> str:
+    """集計を JSON 文字列にする（path を指定するとファイルにも書く）"""
+    data = {
+        name: {**entry, "histogram": [[edge, n] for edge, n in entry["histogram"].items()]}
+        for name, entry in snapshot().items()
+    }
+    text = json.dumps(data, ensure_ascii=False, indent=2)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+    return text
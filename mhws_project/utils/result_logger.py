@@ -1,26 +1,80 @@
+import atexit
 import csv
 import os
-from typing import Dict, Tuple
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
 
-def rotate_csv(filepath: str, max_rows: int = 10):
+from utils import profiling
+from utils.history import HistoryStore, get_history_store
+
+MAX_ROWS = 10  # CSVログに残す最新件数
+
+STRUCTURED_HEADER = [
+    "武器", "モンスター", "部位", "切れ味", "スキル構成", "コンボ名",
+    "補正攻撃力", "会心率", "補正属性", "期待値攻撃", "物理肉質後", "属性肉質後",
+    "物理合計", "属性合計", "コンボ時間", "DPS",
+    "元切れ味Hit", "実効Hit", "コンボ回数", "切れ味持続秒"
+]
+READABLE_HEADER = ["結果概要"]
+
+# 同じプロセス内（Streamlit のセッション同士）でのファイル書き込みの競合防止
+_file_lock = threading.Lock()
+
+
+def append_rows_rotated(filepath: str, header: Sequence[str], rows: List[List], max_rows: int = MAX_ROWS):
     """
-    CSVファイルを最大 max_rows 件にローテーションする（ヘッダー行は除く）。
-    古い行を削除して最新 max_rows 件を残す。
+    rows をまとめて追記し、最新 max_rows 件にローテーションする。
+    読み込み1回・書き込み1回で済ませ、一時ファイルから置き換えるので途中の状態は見えない。
     """
-    if not os.path.exists(filepath):
+    if not rows:
         return
-    with open(filepath, mode="r", newline="", encoding="utf-8") as f:
-        reader = csv.reader(f)
-        rows = list(reader)
-    if len(rows) <= max_rows + 1:
-        return
-    header = rows[0]
-    data = rows[1:]
-    new_data = data[-max_rows:]
-    with open(filepath, mode="w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(header)
-        writer.writerows(new_data)
+    with _file_lock:
+        existing = []
+        if os.path.exists(filepath):
+            with open(filepath, mode="r", newline="", encoding="utf-8") as f:
+                existing = list(csv.reader(f))
+        file_header = existing[0] if existing else list(header)
+        data = (existing[1:] + rows)[-max_rows:]
+
+        tmp_path = f"{filepath}.tmp"
+        with open(tmp_path, mode="w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(file_header)
+            writer.writerows(data)
+        os.replace(tmp_path, filepath)
+
+
+def _skill_str(skills: Mapping[str, Tuple[int, float]]) -> str:
+    return "|".join([f"{name}Lv{lv}({int(rate*100)}%)" for name, (lv, rate) in skills.items()])
+
+
+def _structured_row(weapon, monster, part, sharpness, skills, combo_name, attack, affinity, element,
+                    expected_attack, effective_attack, effective_element, total_physical, total_element,
+                    combo_time, dps, base_hits, effective_hits, combo_count, duration) -> List:
+    return [
+        weapon, monster, part, sharpness, _skill_str(skills), combo_name,
+        f"{attack:.1f}", f"{affinity:.1f}", f"{element:.1f}", f"{expected_attack:.1f}",
+        f"{effective_attack:.1f}", f"{effective_element:.1f}",
+        f"{total_physical:.1f}", f"{total_element:.1f}", f"{combo_time:.2f}", f"{dps:.2f}",
+        base_hits, effective_hits, combo_count, f"{duration:.1f}"
+    ]
+
+
+def _readable_row(weapon, monster, part, sharpness, skills, combo_name, attack, affinity, element,
+                  expected_attack, effective_attack, effective_element, total_physical, total_element,
+                  combo_time, dps, base_hits, effective_hits, combo_count, duration) -> List:
+    return [
+        f"武器: {weapon}", f"モンスター: {monster}", f"部位: {part}",
+        f"切れ味: {sharpness}", f"スキル構成: {_skill_str(skills)}", f"コンボ名: {combo_name}",
+        f"攻撃力: {attack:.1f}", f"会心率: {affinity:.1f}%", f"属性値: {element:.1f}",
+        f"期待値攻撃力: {expected_attack:.1f}", f"物理肉質後: {effective_attack:.1f}", f"属性肉質後: {effective_element:.1f}",
+        f"物理合計: {total_physical:.1f}", f"属性合計: {total_element:.1f}", f"コンボ時間: {combo_time:.2f}",
+        f"DPS: {dps:.2f}", f"切れ味ヒット数: {base_hits}", f"実効Hit: {effective_hits}",
+        f"コンボ回数: {combo_count}", f"切れ味持続: {duration:.1f}秒"
+    ]
+
 
 def log_result_to_csv(
     filepath: str,
@@ -48,28 +102,12 @@ def log_result_to_csv(
     """
     構造化CSV出力（数値だけ、データ処理用）＋最新10件にローテーション
     """
-    file_exists = os.path.exists(filepath)
-    skill_str = "|".join([f"{name}Lv{lv}({int(rate*100)}%)" for name, (lv, rate) in skills.items()])
-
-    with open(filepath, mode="a", newline="", encoding="utf-8") as csvfile:
-        writer = csv.writer(csvfile)
-        if not file_exists:
-            writer.writerow([
-                "武器", "モンスター", "部位", "切れ味", "スキル構成", "コンボ名",
-                "補正攻撃力", "会心率", "補正属性", "期待値攻撃", "物理肉質後", "属性肉質後",
-                "物理合計", "属性合計", "コンボ時間", "DPS",
-                "元切れ味Hit", "実効Hit", "コンボ回数", "切れ味持続秒"
-            ])
-        writer.writerow([
-            weapon, monster, part, sharpness, skill_str, combo_name,
-            f"{attack:.1f}", f"{affinity:.1f}", f"{element:.1f}", f"{expected_attack:.1f}",
-            f"{effective_attack:.1f}", f"{effective_element:.1f}",
-            f"{total_physical:.1f}", f"{total_element:.1f}", f"{combo_time:.2f}", f"{dps:.2f}",
-            base_hits, effective_hits, combo_count, f"{duration:.1f}"
-        ])
-
-    # ローテーション
-    rotate_csv(filepath, max_rows=10)
+    row = _structured_row(
+        weapon, monster, part, sharpness, skills, combo_name, attack, affinity, element,
+        expected_attack, effective_attack, effective_element, total_physical, total_element,
+        combo_time, dps, base_hits, effective_hits, combo_count, duration
+    )
+    append_rows_rotated(filepath, STRUCTURED_HEADER, [row])
 
 def log_result_to_csv_readable(
     filepath: str,
@@ -97,24 +135,233 @@ def log_result_to_csv_readable(
     """
     人間読みやすいCSV出力（ラベル付き）＋最新10件にローテーション
     """
-    file_exists = os.path.exists(filepath)
-    skill_str = "|".join([f"{name}Lv{lv}({int(rate*100)}%)" for name, (lv, rate) in skills.items()])
+    row = _readable_row(
+        weapon, monster, part, sharpness, skills, combo_name, attack, affinity, element,
+        expected_attack, effective_attack, effective_element, total_physical, total_element,
+        combo_time, dps, base_hits, effective_hits, combo_count, duration
+    )
+    append_rows_rotated(filepath, READABLE_HEADER, [row])
 
-    row = [
-        f"武器: {weapon}", f"モンスター: {monster}", f"部位: {part}",
-        f"切れ味: {sharpness}", f"スキル構成: {skill_str}", f"コンボ名: {combo_name}",
-        f"攻撃力: {attack:.1f}", f"会心率: {affinity:.1f}%", f"属性値: {element:.1f}",
-        f"期待値攻撃力: {expected_attack:.1f}", f"物理肉質後: {effective_attack:.1f}", f"属性肉質後: {effective_element:.1f}",
-        f"物理合計: {total_physical:.1f}", f"属性合計: {total_element:.1f}", f"コンボ時間: {combo_time:.2f}",
-        f"DPS: {dps:.2f}", f"切れ味ヒット数: {base_hits}", f"実効Hit: {effective_hits}",
-        f"コンボ回数: {combo_count}", f"切れ味持続: {duration:.1f}秒"
-    ]
 
-    with open(filepath, mode="a", newline="", encoding="utf-8") as csvfile:
-        writer = csv.writer(csvfile)
-        if not file_exists:
-            writer.writerow(["結果概要"])
-        writer.writerow(row)
+def _fields_from_result(result: Mapping) -> tuple:
+    """run_full_dps_calculation の結果 dict → 行フォーマット関数の引数"""
+    return (
+        result["武器"], result["モンスター"], result["部位"], result["切れ味"], result["スキル"], result["コンボ"],
+        result["攻撃力"], result["会心率"], result["属性値"], result["期待値攻撃力"],
+        result["物理有効値"], result["属性有効値"], result["物理合計"], result["属性合計"],
+        result["コンボ時間"], result["DPS"], result["切れ味Hit"], result["実効Hit"],
+        result["コンボ回数"], result["維持秒数"]
+    )
+
+
+# ── 結果の出力先（sink） ──
+
+class ResultSink:
+    """計算結果の受け取り口。submit() は呼び出し元を待たせないこと"""
+
+    def submit(self, result: Mapping) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+
+class NullSink(ResultSink):
+    """何も書かない（一括計算・ベンチマーク用）"""
+
+    def submit(self, result: Mapping) -> None:
+        pass
+
+
+class BufferedResultSink(ResultSink):
+    """
+    submit() はバッファに積むだけで、バックグラウンドスレッドが
+    batch_size 件たまるか flush_interval 秒ごとにまとめて _write() する sink。
+    _write() が失敗してもスレッドは止めず、標準エラーに出して max_retries 回まで次の書き出しで再試行し、
+    それでも失敗した分は捨てる。バッファは max_buffer 件までで、あふれた分は古い順に捨てる。
+    """
+
+    def __init__(self, batch_size: int = 32, flush_interval: float = 1.0,
+                 max_retries: int = 3, max_buffer: int = 10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.max_buffer = max_buffer
+        self.errors = 0      # _write() の失敗回数
+        self.dropped = 0     # 書けずに捨てた件数
+        self.last_error: Optional[BaseException] = None
+
+        self._buffer: List[Any] = []
+        self._attempts = 0
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def _convert(self, result: Mapping) -> Any:
+        """結果 dict → バッファに積む形（呼び出し元のスレッドで実行）"""
+        return _fields_from_result(result)
+
+    def _write(self, batch: List[Any]) -> None:
+        raise NotImplementedError
+
+    def _trim(self) -> None:
+        """バッファを max_buffer 件に収める（_cond を持って呼ぶ）"""
+        excess = len(self._buffer) - self.max_buffer
+        if excess > 0:
+            del self._buffer[:excess]
+            self.dropped += excess
+
+    def submit(self, result: Mapping) -> None:
+        item = self._convert(result)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("close() 済みの sink です")
+            if not self._thread.is_alive():
+                # 書き出しスレッドが止まっていたら積まない（メモリが増え続けないように）
+                self.dropped += 1
+                return
+            self._buffer.append(item)
+            self._trim()
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+
+    def _take(self) -> List[Any]:
+        with self._cond:
+            batch, self._buffer = self._buffer, []
+        return batch
+
+    def _write_safely(self, batch: List[Any], final: bool = False) -> bool:
+        """batch を書く。失敗したらバッファの先頭に戻す（final か再試行の上限なら捨てる）。成功したかを返す"""
+        if not batch:
+            return True
+        try:
+            self._write(batch)
+        except Exception as e:
+            self.errors += 1
+            self.last_error = e
+            self._attempts += 1
+            name = type(self).__name__
+            if final or self._attempts > self.max_retries:
+                self._attempts = 0
+                self.dropped += len(batch)
+                print(f"[{name}] 書き出しに失敗したため {len(batch)} 件を捨てました: {type(e).__name__}: {e}",
+                      file=sys.stderr)
+            else:
+                print(f"[{name}] 書き出しに失敗しました（{self._attempts} 回目。次の書き出しで再試行）: "
+                      f"{type(e).__name__}: {e}", file=sys.stderr)
+                with self._cond:
+                    self._buffer[:0] = batch
+                    self._trim()
+            return False
+        self._attempts = 0
+        return True
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._closed and len(self._buffer) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            with self._write_lock:
+                ok = self._write_safely(self._take())
+            if closed:
+                return
+            if not ok:
+                # 失敗直後はすぐに再試行しない（ロック待ちなどが解けるのを待つ）
+                with self._cond:
+                    if not self._closed:
+                        self._cond.wait(self.flush_interval)
+
+    def flush(self) -> None:
+        """バッファを今すぐ書き出す（書き終わるまで待つ。失敗した分は再試行に回す）"""
+        with self._write_lock:
+            self._write_safely(self._take())
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        with self._write_lock:
+            self._write_safely(self._take(), final=True)
+
+
+class HistoryResultSink(BufferedResultSink):
+    """履歴ストア（utils.history、既定は results/history.sqlite3）へ書く sink。件数は保持方針まで残る"""
+
+    def __init__(self, store: Optional[HistoryStore] = None, batch_size: int = 32, flush_interval: float = 1.0):
+        self.store = store or get_history_store()
+        super().__init__(batch_size, flush_interval)
+
+    def _convert(self, result: Mapping) -> Dict[str, Any]:
+        (weapon, monster, part, sharpness, skills, combo_name, attack, affinity, element, expected_attack,
+         effective_attack, effective_element, total_physical, total_element, combo_time, dps,
+         base_hits, effective_hits, combo_count, duration) = _fields_from_result(result)
+        return {
+            "時刻": time.time(), "武器": weapon, "モンスター": monster, "部位": part, "切れ味": sharpness,
+            "スキル構成": _skill_str(skills), "コンボ名": combo_name,
+            "補正攻撃力": attack, "会心率": affinity, "補正属性": element, "期待値攻撃": expected_attack,
+            "物理肉質後": effective_attack, "属性肉質後": effective_element,
+            "物理合計": total_physical, "属性合計": total_element, "コンボ時間": combo_time, "DPS": dps,
+            "元切れ味Hit": base_hits, "実効Hit": effective_hits, "コンボ回数": combo_count, "維持秒数": duration,
+        }
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        with profiling.stage("履歴書き出し"):
+            self.store.append(batch)
+
+
+class CsvResultSink(BufferedResultSink):
+    """
+    2つのCSV（構造化・読みやすい版）へ最新 max_rows 件だけ書く sink（手で見る・共有する用）。
+    """
+
+    def __init__(self, results_dir: str, batch_size: int = 32, flush_interval: float = 1.0, max_rows: int = MAX_ROWS):
+        self.structured_path = os.path.join(results_dir, "dps_log.csv")
+        self.readable_path = os.path.join(results_dir, "dps_log_readable.csv")
+        self.results_dir = results_dir
+        self.max_rows = max_rows
+        super().__init__(batch_size, flush_interval)
+
+    def _write(self, batch: List[tuple]) -> None:
+        if not batch:
+            return
+        os.makedirs(self.results_dir, exist_ok=True)
+        # 最新 max_rows 件しか残らないので、それより古い分は書かない
+        batch = batch[-self.max_rows:]
+        with profiling.stage("CSVログ書き出し"):
+            append_rows_rotated(self.structured_path, STRUCTURED_HEADER,
+                                [_structured_row(*f) for f in batch], self.max_rows)
+            append_rows_rotated(self.readable_path, READABLE_HEADER,
+                                [_readable_row(*f) for f in batch], self.max_rows)
+
+
+_default_sink: Optional[ResultSink] = None
+_default_lock = threading.Lock()
+
+
+def get_default_sink() -> ResultSink:
+    """履歴ストア（results/history.sqlite3）に書くプロセス共通の sink（終了時に書き出す）"""
+    global _default_sink
+    with _default_lock:
+        if _default_sink is None:
+            _default_sink = HistoryResultSink()
+            atexit.register(_default_sink.close)
+        return _default_sink
+
 
-    # ローテーション
-    rotate_csv(filepath, max_rows=10)
\ No newline at end of file
+def set_default_sink(sink: Optional[ResultSink]) -> Optional[ResultSink]:
+    """既定の sink を差し替える（ベンチマークなどで results/ に書かせないとき用）。戻り値は元の sink"""
+    global _default_sink
+    with _default_lock:
+        previous, _default_sink = _default_sink, sink
+        return previous
@@ -1 +1,217 @@
-# シミュレーション処理（期待値・ランダム化）
\ No newline at end of file
+# === simulator.py（モンテカルロ戦闘シミュレーション） ===
+#
+# コンボを繰り返し当て続けたとき、1ヒットごとに
+#   - 会心（会心率、マイナス会心は0.75倍）
+#   - 業物（確率で切れ味消費なし）
+#   - 達人芸（会心時に確率で切れ味消費なし）
+# を乱数で判定し、切れ味が尽きるまでのダメージと時間の分布を求める。
+# 切れ味ゲージは logic/sharpness.get_sharpness_bar（討伐時間シミュレーション logic/hunt.py と同じ）で、
+# 消費が色の境目を越えるたびに次の色の切れ味補正（物理・属性）に切り替わる。匠は最上位の色に足す。
+#
+# 期待値計算（logic/calculation_interface.py）とは違い、会心・肉質・切れ味補正は
+# 1ヒットにつき1回だけ掛ける。発動率つきのスキル（渾身など）は期待値と同じく
+# 効果 × 発動率 で扱い、乱数判定はしない。
+#
+# 試行は chunk_size 件ずつ SeedSequence から派生させた乱数で計算するので、
+# seed が同じならプロセス数に関係なく同じ結果になる。
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from logic.calculation_interface import WEAPON_COEFFICIENT
+from logic.combo import expand_combo_hits
+from logic.sharpness import get_sharpness_bar
+from logic.damage import (
+    apply_physical_sharpness,
+    apply_elemental_sharpness,
+    apply_hitzone_modifier,
+    calculate_elemental_damage
+)
+from logic.skill import apply_skill_modifiers, get_crit_multiplier_from_skill, get_crit_element_bonus
+from utils import loader
+
+PERCENTILES = (5, 25, 50, 75, 95)
+HIT_BLOCK = 256           # 1回に乱数を振るヒット数
+DEFAULT_MAX_HITS = 100000  # 切れ味が減らない構成での打ち切り
+
+
+def _skill_value(skills, skill_defs, name: str, field: str, default: float = 0.0, fixed_lv: Optional[int] = None) -> float:
+    """スキルの効果値 × 発動率（未装備なら 0）"""
+    if name not in skills:
+        return 0.0
+    lv, rate = skills[name]
+    effect = skill_defs.get(name, {}).get(f"Lv{fixed_lv or lv}", {})
+    return effect.get(field, default) * rate
+
+
+def build_hunt_params(weapon_name: str, monster_name: str, part_name: str, combo_name: str,
+                      skill_input: Dict[str, Tuple[int, float]]) -> Dict:
+    """1ヒットごとの判定に必要な値をまとめる（ワーカープロセスへ渡せる形）"""
+    skill_defs = loader.get_skills()
+    weapon = loader.get_weapons()[weapon_name]
+    part = loader.get_monsters()[monster_name]["parts"][part_name]
+    combo = loader.get_combos()[combo_name]
+
+    attack, affinity, element = apply_skill_modifiers(
+        base_attack=weapon["attack"] * WEAPON_COEFFICIENT,
+        base_affinity=weapon["affinity"],
+        base_element=weapon["element"]["value"],
+        skills=skill_input,
+        skill_defs=skill_defs
+    )
+    bar = get_sharpness_bar(weapon)
+    takumi = int(_skill_value(skill_input, skill_defs, "匠", "sharpness_add"))
+    bar = [(bar[0][0], bar[0][1] + takumi)] + bar[1:]
+    element_zone = part["element"].get(weapon["element"]["type"], 0)
+    motion, element_motion = expand_combo_hits(combo["moves"], loader.get_motion_values())
+
+    crit_lv = skill_input.get("超会心", (0, 0.0))[0]
+    crit_element_lv = skill_input.get("会心撃【属性】", (0, 0.0))[0]
+
+    return {
+        # 切れ味の色ごと（上位の色から）の肉質補正後の値と、色が変わる累積消費量
+        "colours": [colour for colour, _ in bar],
+        "physical": np.array([
+            apply_hitzone_modifier(apply_physical_sharpness(attack, colour), part["physical"]) for colour, _ in bar
+        ]),
+        "element": np.array([
+            calculate_elemental_damage(apply_elemental_sharpness(element, colour), element_zone) for colour, _ in bar
+        ]),
+        "colour_edges": np.cumsum([hits for _, hits in bar], dtype=np.float64),
+        "affinity": affinity,
+        "crit_mult": get_crit_multiplier_from_skill("超会心", crit_lv, skill_defs),
+        "crit_element_bonus": get_crit_element_bonus("会心撃【属性】", crit_element_lv, skill_defs),
+        "motion": np.array(motion, dtype=np.float64),
+        "element_motion": np.array(element_motion, dtype=np.float64),
+        "combo_time": combo["time"],
+        "save_prob": _skill_value(skill_input, skill_defs, "業物", "sharpness_reduction_prob"),
+        "crit_save_prob": _skill_value(skill_input, skill_defs, "達人芸", "crit_sharpness_reduction_prob", fixed_lv=1),
+        "no_sharpness_time": _skill_value(skill_input, skill_defs, "剛刃研磨", "no_sharpness_time"),
+    }
+
+
+def _simulate_chunk(params: Dict, trials: int, seed: np.random.SeedSequence, max_hits: int):
+    """trials 回分の狩猟を、試行方向にベクトル化して HIT_BLOCK ヒットずつ進める"""
+    rng = np.random.default_rng(seed)
+    motion = params["motion"]
+    element_motion = params["element_motion"]
+    hits_per_combo = len(motion)
+    if hits_per_combo == 0:
+        raise ValueError("ヒットのないコンボはシミュレーションできません")
+    combo_time = params["combo_time"]
+    affinity = params["affinity"]
+    crit_prob = min(abs(affinity), 100) / 100.0
+    crit_value = params["crit_mult"] if affinity >= 0 else 0.75
+
+    damage = np.zeros(trials)
+    consumed = np.zeros(trials)
+    break_hit = np.full(trials, -1, dtype=np.int64)
+    edges = params["colour_edges"]
+    gauge = edges[-1]
+    last_colour = len(edges) - 1
+
+    for start in range(0, max_hits, HIT_BLOCK):
+        alive = break_hit < 0
+        if not alive.any():
+            break
+        idx = np.arange(start, min(start + HIT_BLOCK, max_hits))
+        n_alive = int(alive.sum())
+        crit = rng.random((n_alive, len(idx))) < crit_prob
+        save = rng.random((n_alive, len(idx)))
+        save_crit = rng.random((n_alive, len(idx)))
+
+        mv = motion[idx % hits_per_combo]
+        emv = element_motion[idx % hits_per_combo]
+        hit_time = (idx // hits_per_combo) * combo_time + combo_time * (idx % hits_per_combo + 1) / hits_per_combo
+
+        saved = (save < params["save_prob"]) | (crit & (save_crit < params["crit_save_prob"]))
+        cost = np.where(saved | (hit_time < params["no_sharpness_time"]), 0.0, 1.0)
+        total_cost = consumed[alive][:, None] + np.cumsum(cost, axis=1)
+
+        # ヒットの色はそのヒットの前までの消費量で決まる
+        colour = np.minimum(np.searchsorted(edges, total_cost - cost, side="right"), last_colour)
+        phys = params["physical"][colour] * mv * np.where(crit, crit_value, 1.0)
+        elem = params["element"][colour] * emv * np.where(crit & (affinity >= 0), params["crit_element_bonus"], 1.0)
+
+        # 切れ味が尽きたヒットまで（そのヒットを含む）を数える
+        broken = total_cost >= gauge
+        first_break = np.where(broken.any(axis=1), broken.argmax(axis=1), -1)
+        counted = np.arange(len(idx))[None, :] <= np.where(first_break >= 0, first_break, len(idx))[:, None]
+
+        rows = np.flatnonzero(alive)
+        damage[rows] += ((phys + elem) * counted).sum(axis=1)
+        consumed[rows] = total_cost[:, -1]
+        just_broke = first_break >= 0
+        break_hit[rows[just_broke]] = idx[first_break[just_broke]]
+
+    broke = break_hit >= 0
+    last_hit = np.where(broke, break_hit, max_hits - 1)
+    duration = (last_hit // hits_per_combo) * combo_time + combo_time * (last_hit % hits_per_combo + 1) / hits_per_combo
+    return damage, duration, broke
+
+
+def _simulate_chunk_worker(args):
+    return _simulate_chunk(*args)
+
+
+def _summary(values: np.ndarray) -> Dict[str, float]:
+    summary = {
+        "mean": float(values.mean()),
+        "var": float(values.var()),
+        "std": float(values.std()),
+        "min": float(values.min()),
+        "max": float(values.max()),
+    }
+    for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f"p{p}"] = float(v)
+    return summary
+
+
+def simulate_hunts(
+    weapon_name: str,
+    monster_name: str,
+    part_name: str,
+    combo_name: str,
+    skill_input: Dict[str, Tuple[int, float]],
+    trials: int = 10000,
+    seed: int = 0,
+    processes: int = 1,
+    chunk_size: int = 2000,
+    max_hits: int = DEFAULT_MAX_HITS
+) -> Dict:
+    """
+    切れ味が尽きるまで攻撃し続ける狩猟を trials 回シミュレーションする。
+    戻り値:
+      "DPS" / "合計ダメージ" / "切れ味持続秒": 各統計量（mean, var, std, min, max, p5〜p95）
+      "切れ味切れ率": max_hits までに切れ味が尽きた試行の割合
+      "samples": 試行ごとの {"DPS", "合計ダメージ", "切れ味持続秒"} 配列
+    """
+    if trials < 1:
+        raise ValueError(f"trials は1以上にしてください: {trials}")
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size は1以上にしてください: {chunk_size}")
+    params = build_hunt_params(weapon_name, monster_name, part_name, combo_name, skill_input)
+    sizes = [min(chunk_size, trials - start) for start in range(0, trials, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(params, n, s, max_hits) for n, s in zip(sizes, seeds)]
+
+    if processes > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            parts = list(pool.map(_simulate_chunk_worker, jobs))
+    else:
+        parts = [_simulate_chunk(*job) for job in jobs]
+
+    damage = np.concatenate([p[0] for p in parts])
+    duration = np.concatenate([p[1] for p in parts])
+    broke = np.concatenate([p[2] for p in parts])
+    dps = damage / duration
+
+    return {
+        "DPS": _summary(dps),
+        "合計ダメージ": _summary(damage),
+        "切れ味持続秒": _summary(duration),
+        "切れ味切れ率": float(broke.mean()),
+        "samples": {"DPS": dps, "合計ダメージ": damage, "切れ味持続秒": duration},
+    }
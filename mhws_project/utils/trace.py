@@ -0,0 +1,89 @@
+# === trace.py（ヒットごとのダメージ内訳の記録） ===
+#
+#   buffer = trace.enable()     # 今のコンテキストで記録を始める（記録先を返す）
+#   compute_dps(...)            # 計算の途中でヒットごとの 物理 / 属性 を記録する
+#   buffer.columns()            # {"計算": [...], "技": [...], "物理": [...], ...}（そのまま DataFrame にできる）
+#
+# 記録は本物の計算（logic/calculation_interface.py）の中で行うので、表示される値は DPS と必ず一致する。
+# 無効時（既定）は current() が None を返すだけなので、計算側のコストは分岐1つ。
+# 記録先はコンテキストごと（Streamlit ではセッションごとの記録先を enable に渡す）なので、
+# 他のセッションの計算は混ざらず、オン/オフも他のセッションに影響しない。
+# 記録先は最新 max_calls 回分の計算だけを残す。
+
+import threading
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+# ヒットの列（columns() のキー）
+HIT_COLUMNS = ("計算", "技", "ヒット", "モーション値", "属性モーション値", "物理", "属性")
+
+DEFAULT_MAX_CALLS = 50
+
+
+class TraceBuffer:
+    """計算ごとの見出し（calls）とヒットの一覧。古い計算から捨てて最新 max_calls 回分を持つ"""
+
+    def __init__(self, max_calls: int = DEFAULT_MAX_CALLS):
+        # (見出し, ヒットのタプル) を計算ごとに1つ
+        self._entries: deque = deque(maxlen=max_calls)
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """残っているヒット数"""
+        with self._lock:
+            return sum(len(hits) for _, hits in self._entries)
+
+    def record(self, info: Mapping, hits: Iterable[Tuple[str, int, float, float, float, float]]) -> int:
+        """
+        計算1回分を追加して計算番号を返す（番号は古い計算を捨てても振り直さない）。
+        info: 見出し（武器・部位・物理合計など）、hits: (技, 技内のヒット番号, モーション値, 属性モーション値, 物理, 属性)
+        """
+        hits = tuple(hits)
+        with self._lock:
+            calc = self._next
+            self._next += 1
+            self._entries.append(({"計算": calc, **info}, hits))
+        return calc
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def calls(self) -> List[Dict]:
+        """残っている計算の見出し（計算番号順）"""
+        with self._lock:
+            return [dict(call) for call, _ in self._entries]
+
+    def columns(self) -> Dict[str, list]:
+        """残っているヒットを列ごとのリストで返す"""
+        with self._lock:
+            rows = [(call["計算"],) + hit for call, hits in self._entries for hit in hits]
+        if not rows:
+            return {column: [] for column in HIT_COLUMNS}
+        return {column: list(values) for column, values in zip(HIT_COLUMNS, zip(*rows))}
+
+
+_current: ContextVar[Optional[TraceBuffer]] = ContextVar("trace_buffer", default=None)
+
+
+def current() -> Optional[TraceBuffer]:
+    """今のコンテキストの記録先（無効時は None）"""
+    return _current.get()
+
+
+def enable(buffer: Optional[TraceBuffer] = None) -> TraceBuffer:
+    """今のコンテキストで buffer（省略時は新しい記録先）に記録する"""
+    if buffer is None:
+        buffer = TraceBuffer()
+    _current.set(buffer)
+    return buffer
+
+
+def disable() -> None:
+    _current.set(None)
+
+
+def is_enabled() -> bool:
+    return _current.get() is not None